@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'agromanager.settings')
+# Os workers do servidor disputam a liderança dos jobs agendados
+os.environ.setdefault('JOBS_HABILITADOS', '1')
 
 application = get_asgi_application()
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -130,3 +131,52 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+TEST_RUNNER = 'agromanager.test_runner.ExecutorTestes'
+
+
+# Logs de atividade gravados em lote por uma thread de fundo
+# (apps/atividades/auditoria.py). Nos testes a gravação é síncrona
+# (agromanager/test_runner.py).
+AUDITORIA_ATIVIDADES = {
+    'ASSINCRONO': True,
+    'TAMANHO_LOTE': 200,
+    'INTERVALO': 1.0,
+}
+
+# Retenção dos logs de atividade: registros mais antigos que RETENCAO_LOGS_DIAS
+# saem da tabela para arquivos NDJSON compactados, um por mês
+# (apps/atividades/arquivamento.py).
+RETENCAO_LOGS_DIAS = 365
+ARQUIVO_LOGS_DIR = BASE_DIR / 'arquivo' / 'logs_atividades'
+
+# Ingestão das estações meteorológicas (apps/monitoramento/ingestao.py):
+# leituras acumuladas em memória e gravadas em lote. As estações se
+# autenticam com o token de SENSORES_TOKEN; vazio desliga o endpoint. Nos
+# testes a gravação é síncrona (agromanager/test_runner.py).
+INGESTAO_SENSORES = {
+    'ASSINCRONO': True,
+    'TAMANHO_LOTE': 5000,
+    'INTERVALO': 1.0,
+    'TOKEN': os.environ.get('SENSORES_TOKEN', ''),
+}
+
+# Jobs agendados (apps/monitoramento/jobs.py): só o processo que detém a
+# liderança no banco executa. Disputam a liderança apenas os processos que
+# optam por isso: wsgi.py/asgi.py definem JOBS_HABILITADOS=1 e o processo
+# filho do runserver entra sozinho; JOBS_HABILITADOS=0 desliga em todos.
+JOBS_AGENDADOS = {
+    'HABILITADO': os.environ.get('JOBS_HABILITADOS') == '1',
+    'DURACAO_LIDERANCA': 60,
+    'INTERVALO': 5,
+    'PARALELOS': 2,
+}
+
+# Coleta automática do clima de todas as localizações
+# (apps/monitoramento/coleta.py): consultas em paralelo, limitadas por host
+# (a Open-Meteo gratuita aceita até 600 requisições por minuto).
+COLETA_CLIMA = {
+    'PARALELOS': 16,
+    'REQUISICOES_POR_SEGUNDO': 5,
+    'RAJADA': 300,
+    'TIMEOUT': 10,
+}
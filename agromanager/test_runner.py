@@ -0,0 +1,25 @@
+"""
+Executor dos testes (``settings.TEST_RUNNER``).
+
+Aplica ``CONFIGURACAO_TESTES`` sobre as settings durante toda a execução:
+os logs de atividade e as leituras das estações são gravados na hora, sem
+as threads de fundo.
+"""
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+CONFIGURACAO_TESTES = {
+    'AUDITORIA_ATIVIDADES': {'ASSINCRONO': False},
+    'INGESTAO_SENSORES': {'ASSINCRONO': False},
+}
+
+
+class ExecutorTestes(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._configuracao_testes = override_settings(**CONFIGURACAO_TESTES)
+        self._configuracao_testes.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._configuracao_testes.disable()
+        super().teardown_test_environment(**kwargs)
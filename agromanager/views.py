@@ -4,7 +4,9 @@ from django.db.models import F, Count, Sum
 import json
 from apps.animal.models import Animal
 from apps.atividades.models import Atividade
-from apps.estoque.models import Item
+from apps.estoque.models import Item, PrevisaoEstoque
+from django.utils import timezone
+import datetime
 
 
 def visualizar_login(request):
@@ -23,6 +25,11 @@ def visualizar_dashboard(request):
         quantidade_atual__lte=F("quantidade_minima")
     ).count()
 
+    # Lido da previsão pré-calculada (apps/estoque/previsao.py)
+    itens_ruptura_proxima = PrevisaoEstoque.objects.filter(
+        data_ruptura__lte=timezone.localdate() + datetime.timedelta(days=7)
+    ).count()
+
     # ATIVIDADES RECENTES (últimos 4 registros)
     atividades_recentes = Atividade.objects.order_by('-data_criacao')[:4]
 
@@ -32,6 +39,7 @@ def visualizar_dashboard(request):
         "tarefas_urgentes": tarefas_urgentes,
         "itens_estoque": itens_estoque,
         "itens_baixo_estoque": itens_baixo_estoque,
+        "itens_ruptura_proxima": itens_ruptura_proxima,
         "atividades_recentes": atividades_recentes,
     }
 
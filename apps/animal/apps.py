@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_migrate, post_save
 
 
 class AnimalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.animal'
+
+    def ready(self):
+        from .busca import criar_indice_busca
+        from .models import Animal
+        from .paginacao import invalidar_contagem
+
+        # Tabela FTS5 + triggers de sincronização da busca (ver busca.py)
+        post_migrate.connect(criar_indice_busca, sender=self, dispatch_uid='animal_indice_busca')
+
+        # Qualquer alteração no rebanho descarta os totais em cache da listagem
+        post_save.connect(invalidar_contagem, sender=Animal, dispatch_uid='animal_contagem_save')
+        post_delete.connect(invalidar_contagem, sender=Animal, dispatch_uid='animal_contagem_delete')
@@ -0,0 +1,125 @@
+"""
+Busca textual de animais com SQLite FTS5.
+
+A tabela virtual ``animal_busca`` usa o próprio ``animal_animal`` como
+conteúdo externo (não duplica os dados) e é mantida por triggers, então
+qualquer INSERT/UPDATE/DELETE — inclusive ``bulk_create`` — atualiza o
+índice de forma incremental.
+"""
+from django.db import DatabaseError, connection
+from django.db.models import Q
+
+TABELA = "animal_busca"
+COLUNAS = ("nome", "numero_identificacao", "raca", "observacoes")
+
+# O tokenizer trigram só consegue casar termos com 3 ou mais caracteres
+TAMANHO_MINIMO_TERMO = 3
+
+_novos = ", ".join(f"new.{c}" for c in COLUNAS)
+_antigos = ", ".join(f"old.{c}" for c in COLUNAS)
+_colunas = ", ".join(COLUNAS)
+
+SQL_CRIACAO = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA} USING fts5(
+        {_colunas},
+        content='animal_animal',
+        content_rowid='id',
+        tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABELA}_ai AFTER INSERT ON animal_animal BEGIN
+        INSERT INTO {TABELA}(rowid, {_colunas}) VALUES (new.id, {_novos});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABELA}_ad AFTER DELETE ON animal_animal BEGIN
+        INSERT INTO {TABELA}({TABELA}, rowid, {_colunas}) VALUES ('delete', old.id, {_antigos});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {TABELA}_au AFTER UPDATE OF {_colunas} ON animal_animal BEGIN
+        INSERT INTO {TABELA}({TABELA}, rowid, {_colunas}) VALUES ('delete', old.id, {_antigos});
+        INSERT INTO {TABELA}(rowid, {_colunas}) VALUES (new.id, {_novos});
+    END
+    """,
+]
+
+_indice_disponivel = None
+
+
+def criar_indice_busca(using="default", reconstruir=False, **kwargs):
+    """
+    Cria a tabela FTS5 e os triggers (idempotente). Conectado ao
+    ``post_migrate``; na primeira criação indexa os animais já existentes.
+    """
+    global _indice_disponivel
+    from django.db import connections
+
+    conexao = connections[using]
+    if conexao.vendor != "sqlite":
+        return False
+
+    with conexao.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABELA]
+        )
+        existia = cursor.fetchone() is not None
+        try:
+            for sql in SQL_CRIACAO:
+                cursor.execute(sql)
+        except DatabaseError as e:
+            # SQLite sem FTS5/trigram (anterior a 3.34): a busca usa LIKE
+            print("busca de animais: índice FTS5 indisponível:", e)
+            _indice_disponivel = False
+            return False
+        if reconstruir or not existia:
+            cursor.execute(f"INSERT INTO {TABELA}({TABELA}) VALUES ('rebuild')")
+
+    _indice_disponivel = True
+    return True
+
+
+def indice_disponivel():
+    global _indice_disponivel
+    if _indice_disponivel is None:
+        if connection.vendor != "sqlite":
+            _indice_disponivel = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [TABELA]
+                )
+                _indice_disponivel = cursor.fetchone() is not None
+    return _indice_disponivel
+
+
+def montar_consulta(termo):
+    """
+    Converte o texto digitado em uma consulta FTS5: cada palavra vira uma
+    frase entre aspas (casamento por substring, o que cobre prefixos) e
+    todas precisam aparecer. Retorna None se alguma palavra for curta
+    demais para o índice trigram.
+    """
+    palavras = termo.split()
+    if not palavras or any(len(p) < TAMANHO_MINIMO_TERMO for p in palavras):
+        return None
+    return " ".join('"{}"'.format(p.replace('"', '""')) for p in palavras)
+
+
+def buscar_animais(queryset, termo):
+    """
+    Filtra ``queryset`` pelo termo e ordena por relevância (bm25).
+
+    Sem índice disponível, ou com termos curtos, recai no trecho
+    (``icontains``) sobre nome e identificação, como a busca original.
+    """
+    consulta = montar_consulta(termo) if indice_disponivel() else None
+    if consulta is None:
+        termo = termo.strip()
+        return queryset.filter(
+            Q(nome__icontains=termo) |
+            Q(numero_identificacao__icontains=termo)
+        )
+    return queryset.filter(busca__documento__match=consulta).order_by("busca__rank", "-id")
@@ -0,0 +1,59 @@
+"""
+Exportação do rebanho em CSV ou NDJSON com uso de memória constante.
+
+As linhas saem de ``values_list(...).iterator(chunk_size=...)`` direto para
+um ``StreamingHttpResponse``; nenhum objeto ``Animal`` é instanciado e o
+primeiro byte é enviado antes de o banco terminar de ler a tabela.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+CAMPOS_EXPORTACAO = (
+    "id",
+    "nome",
+    "numero_identificacao",
+    "especie",
+    "raca",
+    "sexo",
+    "data_nascimento",
+    "peso_inicial",
+    "finalidade",
+    "observacoes",
+    "origem",
+    "data_aquisicao",
+    "valor_compra",
+    "data_criacao",
+)
+TAMANHO_BLOCO = 2000
+FORMATOS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson; charset=utf-8",
+}
+
+
+class _Eco:
+    """Pseudo-arquivo: ``csv.writer`` devolve a linha em vez de guardá-la."""
+
+    def write(self, valor):
+        return valor
+
+
+def linhas_csv(queryset):
+    escritor = csv.writer(_Eco())
+    yield escritor.writerow(CAMPOS_EXPORTACAO)
+    for linha in queryset.values_list(*CAMPOS_EXPORTACAO).iterator(chunk_size=TAMANHO_BLOCO):
+        yield escritor.writerow(linha)
+
+
+def linhas_ndjson(queryset):
+    codificador = DjangoJSONEncoder(ensure_ascii=False)
+    for linha in queryset.values_list(*CAMPOS_EXPORTACAO).iterator(chunk_size=TAMANHO_BLOCO):
+        yield codificador.encode(dict(zip(CAMPOS_EXPORTACAO, linha))) + "\n"
+
+
+GERADORES = {
+    "csv": linhas_csv,
+    "ndjson": linhas_ndjson,
+}
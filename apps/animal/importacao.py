@@ -0,0 +1,137 @@
+"""
+Importação em lote de animais a partir de CSV ou NDJSON.
+
+O arquivo é lido linha a linha (sem carregar tudo em memória), cada linha
+é validada com as regras do ``AnimalForm`` e os animais válidos são
+gravados com ``bulk_create`` em lotes. A unicidade de
+``numero_identificacao`` é verificada com uma única consulta por lote.
+"""
+import csv
+import io
+import json
+
+from django.db import IntegrityError, transaction
+
+from .forms import AnimalForm
+from .models import Animal
+from .paginacao import invalidar_contagem
+
+TAMANHO_LOTE_PADRAO = 500
+FORMATOS = ("csv", "ndjson")
+
+
+class AnimalImportacaoForm(AnimalForm):
+    """AnimalForm sem a consulta de unicidade por linha (feita por lote)."""
+
+    def clean_numero_identificacao(self):
+        return self.cleaned_data.get('numero_identificacao') or None
+
+    def validate_unique(self):
+        pass
+
+
+def ler_linhas(arquivo, formato):
+    """Gera (numero_da_linha, dados) a partir de um arquivo binário."""
+    texto = io.TextIOWrapper(arquivo, encoding="utf-8-sig", newline="")
+    try:
+        if formato == "csv":
+            leitor = csv.DictReader(texto)
+            for dados in leitor:
+                yield leitor.line_num, dados
+        else:
+            for numero, linha in enumerate(texto, start=1):
+                if not linha.strip():
+                    continue
+                try:
+                    dados = json.loads(linha)
+                except ValueError as e:
+                    yield numero, {"__erro__": f"JSON inválido: {e}"}
+                    continue
+                if not isinstance(dados, dict):
+                    dados = {"__erro__": "Cada linha deve ser um objeto JSON."}
+                yield numero, dados
+    finally:
+        # Não fecha o arquivo de upload junto com o wrapper
+        texto.detach()
+
+
+def _gravar_lote(lote, resultado):
+    """Verifica duplicidade no banco e insere o lote com bulk_create."""
+    identificacoes = [a.numero_identificacao for _, a in lote if a.numero_identificacao]
+    existentes = set(
+        Animal.objects.filter(numero_identificacao__in=identificacoes)
+        .values_list("numero_identificacao", flat=True)
+    ) if identificacoes else set()
+
+    validos = []
+    for numero, animal in lote:
+        if animal.numero_identificacao in existentes:
+            resultado["erros"].append({
+                "linha": numero,
+                "erros": {"numero_identificacao": ["Já existe um animal com este número de identificação."]},
+            })
+        else:
+            validos.append((numero, animal))
+
+    try:
+        with transaction.atomic():
+            Animal.objects.bulk_create([a for _, a in validos])
+        resultado["importados"] += len(validos)
+    except IntegrityError:
+        # Conflito concorrente: grava linha a linha para isolar as falhas
+        for numero, animal in validos:
+            try:
+                with transaction.atomic():
+                    animal.save(force_insert=True)
+                resultado["importados"] += 1
+            except IntegrityError as e:
+                animal.pk = None
+                resultado["erros"].append({"linha": numero, "erros": {"__all__": [str(e)]}})
+
+
+def importar_animais(linhas, tamanho_lote=TAMANHO_LOTE_PADRAO):
+    """
+    Valida e grava os animais de ``linhas`` (iterável de (numero, dados)).
+
+    Linhas inválidas não interrompem a carga; são reportadas em
+    ``resultado["erros"]`` com o número da linha e as mensagens por campo.
+    """
+    resultado = {"total": 0, "importados": 0, "erros": []}
+    identificacoes_vistas = set()
+    lote = []
+
+    for numero, dados in linhas:
+        resultado["total"] += 1
+        if "__erro__" in dados:
+            resultado["erros"].append({"linha": numero, "erros": {"__all__": [dados["__erro__"]]}})
+            continue
+
+        form = AnimalImportacaoForm(data=dados)
+        if not form.is_valid():
+            resultado["erros"].append({
+                "linha": numero,
+                "erros": {campo: list(msgs) for campo, msgs in form.errors.items()},
+            })
+            continue
+
+        animal = form.save(commit=False)
+        if animal.numero_identificacao:
+            if animal.numero_identificacao in identificacoes_vistas:
+                resultado["erros"].append({
+                    "linha": numero,
+                    "erros": {"numero_identificacao": ["Número de identificação repetido no arquivo."]},
+                })
+                continue
+            identificacoes_vistas.add(animal.numero_identificacao)
+
+        lote.append((numero, animal))
+        if len(lote) >= tamanho_lote:
+            _gravar_lote(lote, resultado)
+            lote = []
+
+    if lote:
+        _gravar_lote(lote, resultado)
+
+    if resultado["importados"]:
+        invalidar_contagem()
+    return resultado
@@ -0,0 +1,38 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils.gerar_animal import DATA_REFERENCIA, criar_animais
+
+
+class Command(BaseCommand):
+    help = "Gera animais sintéticos (determinísticos pela semente) para testes de carga."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=50, help="Quantidade de animais a gerar.")
+        parser.add_argument("--seed", type=int, default=0, help="Semente da geração.")
+        parser.add_argument("--lote", type=int, default=5000, help="Animais por bulk_create/transação.")
+        parser.add_argument("--processos", type=int, default=1, help="Processos usados na geração das linhas.")
+        parser.add_argument(
+            "--referencia", type=datetime.date.fromisoformat, default=DATA_REFERENCIA,
+            help="Data (AAAA-MM-DD) a partir da qual as datas são sorteadas.",
+        )
+
+    def handle(self, *args, **options):
+        if options["count"] < 1 or options["lote"] < 1 or options["processos"] < 1:
+            raise CommandError("--count, --lote e --processos devem ser maiores que zero.")
+
+        inicio = time.monotonic()
+        total = criar_animais(
+            options["count"],
+            seed=options["seed"],
+            tamanho_lote=options["lote"],
+            processos=options["processos"],
+            progresso=lambda n: self.stdout.write(f"Processados {n} animais..."),
+            referencia=options["referencia"],
+        )
+        duracao = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"{total} animais inseridos em {duracao:.1f}s ({total / max(duracao, 1e-9):.0f}/s)."
+        ))
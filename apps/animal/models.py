@@ -2,6 +2,8 @@
 from django.db import models
 from django.utils import timezone
 
+from apps.core.campos import TextoBuscaField
+
 
 class Animal(models.Model):
 
@@ -49,3 +51,25 @@ class Animal(models.Model):
 
     def __str__(self):
         return f"{self.id} - {self.nome} - {self.especie}"
+
+
+class AnimalBusca(models.Model):
+    """
+    Índice FTS5 (tokenizer trigram) espelhando nome, identificação, raça e
+    observações de ``Animal``. A tabela virtual e os triggers que a mantêm
+    sincronizada são criados por ``apps.animal.busca`` após o migrate.
+    """
+
+    animal = models.OneToOneField(
+        Animal,
+        primary_key=True,
+        db_column="rowid",
+        related_name="busca",
+        on_delete=models.DO_NOTHING,
+    )
+    documento = TextoBuscaField(db_column="animal_busca")
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = "animal_busca"
@@ -0,0 +1,75 @@
+import time
+
+from django.core import signing
+from django.core.cache import cache
+
+# Chave da "geração" das contagens; muda sempre que o rebanho é alterado
+CHAVE_VERSAO_CONTAGEM = "animal:contagem:versao"
+TEMPO_CACHE_CONTAGEM = 300  # segundos
+SALT_CURSOR = "animal.cursor"
+
+FILTROS = ("search", "especie", "sexo")
+
+
+def _versao_contagem():
+    # Valor inicial baseado no relógio para não reaproveitar contagens antigas
+    # caso a chave de versão seja descartada pelo cache.
+    cache.add(CHAVE_VERSAO_CONTAGEM, int(time.time() * 1000), None)
+    return cache.get(CHAVE_VERSAO_CONTAGEM)
+
+
+def invalidar_contagem(**kwargs):
+    """Descarta todas as contagens em cache (usado em save/delete e cargas em lote)."""
+    try:
+        cache.incr(CHAVE_VERSAO_CONTAGEM)
+    except ValueError:
+        _versao_contagem()
+
+
+def contar_animais(queryset, filtros):
+    """Total de animais para a combinação de filtros, guardado em cache."""
+    partes = [str(_versao_contagem())] + [filtros.get(nome, "") for nome in FILTROS]
+    chave = "animal:contagem:" + signing.b64_encode(
+        "|".join(partes).encode()
+    ).decode()
+    return cache.get_or_set(chave, queryset.count, TEMPO_CACHE_CONTAGEM)
+
+
+def codificar_cursor(animal_id, direcao, filtros):
+    """Gera o token assinado de navegação ('p' = próxima, 'a' = anterior)."""
+    dados = {"id": animal_id, "d": direcao}
+    dados.update({nome: valor for nome, valor in filtros.items() if valor})
+    return signing.dumps(dados, salt=SALT_CURSOR, compress=True)
+
+
+def decodificar_cursor(token):
+    """Retorna (id, direcao, filtros) ou None se o token for inválido."""
+    try:
+        dados = signing.loads(token, salt=SALT_CURSOR)
+        animal_id = int(dados["id"])
+        direcao = dados["d"]
+    except (signing.BadSignature, KeyError, TypeError, ValueError):
+        return None
+    if direcao not in ("p", "a"):
+        return None
+    filtros = {nome: dados.get(nome, "") for nome in FILTROS}
+    return animal_id, direcao, filtros
+
+
+def pagina_por_cursor(queryset, animal_id, direcao, por_pagina):
+    """
+    Busca uma página por keyset em ``id`` (ordem decrescente).
+
+    Retorna (animais, tem_anterior, tem_proxima). Usa ``id < cursor`` ou
+    ``id > cursor`` com LIMIT, então o custo não depende da profundidade.
+    """
+    if direcao == "p":
+        linhas = list(queryset.filter(id__lt=animal_id).order_by("-id")[:por_pagina + 1])
+        tem_proxima = len(linhas) > por_pagina
+        return linhas[:por_pagina], True, tem_proxima
+
+    linhas = list(queryset.filter(id__gt=animal_id).order_by("id")[:por_pagina + 1])
+    tem_anterior = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+    linhas.reverse()
+    return linhas, tem_anterior, True
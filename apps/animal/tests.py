@@ -3,9 +3,14 @@ from django.urls import reverse
 from django.utils import timezone
 from django.core.paginator import Page
 from django.contrib.messages import get_messages
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from io import StringIO
+from unittest.mock import patch
 from .models import Animal
 from .forms import AnimalForm
 import datetime
+import json
 
 class AnimalModelTest(TestCase):
     def setUp(self):
@@ -119,6 +124,41 @@ class AnimalViewsTest(TestCase):
         self.assertEqual(len(response.context['animais']), 1)
         self.assertEqual(response.context['animais'][0].nome, "Boi Veloz")
     
+    def test_listar_animais_busca_textual(self):
+        """Testa a busca pelo índice FTS5 em raça/observações e por trecho do nome"""
+        Animal.objects.filter(pk=self.animal2.pk).update(raca="Girolando")
+        self.animal3.observacoes = "Vacinado contra aftosa"
+        self.animal3.save()
+
+        response = self.client.get(reverse('listar_animais') + '?search=girol')
+        self.assertEqual([a.nome for a in response.context['animais']], ["Vaca Leiteira"])
+
+        response = self.client.get(reverse('listar_animais') + '?search=aftosa')
+        self.assertEqual([a.nome for a in response.context['animais']], ["Porco Barriga"])
+
+        response = self.client.get(reverse('listar_animais') + '?search=eloz')
+        self.assertEqual([a.nome for a in response.context['animais']], ["Boi Veloz"])
+
+    def test_listar_animais_busca_indice_apos_exclusao(self):
+        """Testa que animais excluídos saem do índice de busca"""
+        self.animal1.delete()
+        response = self.client.get(reverse('listar_animais') + '?search=Veloz')
+        self.assertEqual(len(response.context['animais']), 0)
+
+    def test_listar_animais_busca_termo_curto(self):
+        """Testa a busca por trecho com termos menores que um trigrama"""
+        response = self.client.get(reverse('listar_animais') + '?search=NV')
+        self.assertEqual(len(response.context['animais']), 3)
+
+        response = self.client.get(reverse('listar_animais') + '?search=oz')
+        self.assertEqual([a.nome for a in response.context['animais']], ["Boi Veloz"])
+
+    def test_listar_animais_busca_sem_indice(self):
+        """Testa que sem FTS5 a busca recai em trecho (icontains)"""
+        with patch('apps.animal.busca.indice_disponivel', return_value=False):
+            response = self.client.get(reverse('listar_animais') + '?search=eloz')
+        self.assertEqual([a.nome for a in response.context['animais']], ["Boi Veloz"])
+
     def test_listar_animais_com_filtro_especie(self):
         """Testa a listagem com filtro de espécie"""
         response = self.client.get(reverse('listar_animais') + '?especie=Suíno')
@@ -153,6 +193,58 @@ class AnimalViewsTest(TestCase):
         self.assertIsInstance(response.context['page_obj'], Page)
         self.assertTrue(response.context['is_paginated'])
     
+    def test_listar_animais_cursor_proxima_pagina(self):
+        """Testa a navegação por cursor mantendo os filtros ativos"""
+        for i in range(15):
+            Animal.objects.create(
+                nome=f"Animal {i}",
+                especie="Bovino",
+                sexo="Macho",
+                data_nascimento="2022-01-01",
+                numero_identificacao=f"CUR{i}",
+                origem="Nascimento Interno",
+                valor_compra=0.00
+            )
+
+        response = self.client.get(reverse('listar_animais') + '?especie=Bovino')
+        cursor = response.context['cursor_proximo']
+        self.assertIsNotNone(cursor)
+        primeira_pagina = [a.id for a in response.context['animais']]
+
+        response = self.client.get(reverse('listar_animais'), {'cursor': cursor})
+        self.assertEqual(response.status_code, 200)
+        segunda_pagina = [a.id for a in response.context['animais']]
+
+        self.assertEqual(len(segunda_pagina), 7)  # 17 bovinos no total
+        self.assertTrue(all(a.especie == "Bovino" for a in response.context['animais']))
+        self.assertLess(max(segunda_pagina), min(primeira_pagina))
+        self.assertEqual(response.context['filtros']['especie'], "Bovino")
+        self.assertEqual(response.context['total_animais'], 17)
+        self.assertIsNone(response.context['cursor_proximo'])
+
+        # Voltar pelo cursor "anterior" retorna a primeira página
+        response = self.client.get(reverse('listar_animais'), {'cursor': response.context['cursor_anterior']})
+        self.assertEqual([a.id for a in response.context['animais']], primeira_pagina)
+
+    def test_listar_animais_cursor_invalido(self):
+        """Testa que um cursor adulterado volta para a primeira página"""
+        response = self.client.get(reverse('listar_animais') + '?cursor=invalido')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['animais']), 3)
+
+    def test_listar_animais_total_em_cache(self):
+        """Testa que o total é reaproveitado e invalidado ao salvar um animal"""
+        self.client.get(reverse('listar_animais'))
+        with self.assertNumQueries(1):  # apenas o SELECT da página
+            response = self.client.get(reverse('listar_animais'))
+        self.assertEqual(response.context['total_animais'], 3)
+
+        Animal.objects.create(
+            nome="Novo", especie="Ovino", sexo="Macho", data_nascimento="2022-01-01"
+        )
+        response = self.client.get(reverse('listar_animais'))
+        self.assertEqual(response.context['total_animais'], 4)
+
     def test_detalhe_animal_view(self):
         """Testa a view de detalhe do animal"""
         response = self.client.get(reverse('detalhe_animal', args=[self.animal1.id]))
@@ -388,4 +480,152 @@ class AnimalFormTest(TestCase):
         }
         form = AnimalForm(data=form_data)
         self.assertFalse(form.is_valid())
-        self.assertIn('valor_compra', form.errors)
\ No newline at end of file
+        self.assertIn('valor_compra', form.errors)
+
+class ImportacaoAnimaisTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        Animal.objects.create(
+            nome="Existente",
+            especie="Bovino",
+            sexo="Macho",
+            data_nascimento="2022-01-01",
+            numero_identificacao="EX001"
+        )
+
+    def test_importar_csv_com_erros_por_linha(self):
+        """Testa a importação CSV gravando as linhas válidas e reportando as inválidas"""
+        conteudo = (
+            "nome,numero_identificacao,especie,sexo,data_nascimento,origem,valor_compra\n"
+            "Mimosa,IMP001,Bovino,Fêmea,2023-01-01,Nascimento Interno,0\n"
+            "Repetido,EX001,Bovino,Macho,2023-01-01,Nascimento Interno,0\n"
+            ",IMP002,Bovino,Macho,2023-01-01,Nascimento Interno,0\n"
+            "Comprado,IMP003,Bovino,Macho,2023-01-01,Compra,0\n"
+            "Duplicado,IMP001,Bovino,Macho,2023-01-01,Nascimento Interno,0\n"
+            "Estrela,IMP004,Equino,Fêmea,2023-01-01,Nascimento Interno,0\n"
+        )
+        arquivo = SimpleUploadedFile("animais.csv", conteudo.encode("utf-8"), content_type="text/csv")
+
+        response = self.client.post(reverse('importar_animais'), {
+            'arquivo': arquivo, 'formato': 'csv', 'tamanho_lote': 2
+        })
+
+        self.assertEqual(response.status_code, 200)
+        resultado = response.context['resultado']
+        self.assertEqual(resultado['total'], 6)
+        self.assertEqual(resultado['importados'], 2)
+        erros = {erro['linha']: erro['erros'] for erro in resultado['erros']}
+        self.assertEqual(sorted(erros), [3, 4, 5, 6])
+        self.assertIn('numero_identificacao', erros[3])
+        self.assertIn('nome', erros[4])
+        self.assertIn('data_aquisicao', erros[5])
+        self.assertIn('numero_identificacao', erros[6])
+        self.assertEqual(Animal.objects.filter(numero_identificacao__in=["IMP001", "IMP004"]).count(), 2)
+
+    def test_importar_ndjson(self):
+        """Testa a importação NDJSON, incluindo linha com JSON inválido"""
+        linhas = [
+            json.dumps({"nome": "Pintada", "especie": "Suíno", "sexo": "Fêmea",
+                        "data_nascimento": "2023-05-01", "valor_compra": 0}),
+            "{quebrado",
+            json.dumps({"nome": "Trovão", "especie": "Equino", "sexo": "Macho",
+                        "data_nascimento": "2021-05-01", "valor_compra": 0}),
+        ]
+        arquivo = SimpleUploadedFile("animais.ndjson", "\n".join(linhas).encode("utf-8"))
+
+        response = self.client.post(reverse('importar_animais'), {'arquivo': arquivo, 'formato': 'ndjson'})
+
+        resultado = response.context['resultado']
+        self.assertEqual(resultado['importados'], 2)
+        self.assertEqual([erro['linha'] for erro in resultado['erros']], [2])
+        self.assertEqual(Animal.objects.count(), 3)
+
+    def test_importar_sem_arquivo(self):
+        """Testa o POST sem arquivo"""
+        response = self.client.post(reverse('importar_animais'), {'formato': 'csv'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['resultado'])
+
+
+class ExportacaoAnimaisTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        Animal.objects.create(nome="Boi Veloz", especie="Bovino", sexo="Macho",
+                              data_nascimento="2022-05-15", numero_identificacao="NV001")
+        Animal.objects.create(nome="Porco Barriga", especie="Suíno", sexo="Macho",
+                              data_nascimento="2023-01-20", numero_identificacao="NV003")
+
+    def test_exportar_csv_com_filtro(self):
+        """Testa a exportação CSV respeitando o filtro de espécie"""
+        response = self.client.get(reverse('exportar_animais') + '?formato=csv&especie=Suíno')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        linhas = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        self.assertEqual(len(linhas), 2)
+        self.assertTrue(linhas[0].startswith("id,nome,numero_identificacao"))
+        self.assertIn("Porco Barriga", linhas[1])
+
+    def test_exportar_ndjson(self):
+        """Testa a exportação NDJSON"""
+        response = self.client.get(reverse('exportar_animais') + '?formato=ndjson')
+
+        linhas = b"".join(response.streaming_content).decode("utf-8").splitlines()
+        registros = [json.loads(linha) for linha in linhas]
+        self.assertEqual({r["numero_identificacao"] for r in registros}, {"NV001", "NV003"})
+        self.assertEqual(registros[0]["valor_compra"], "0.00")
+
+    def test_exportar_formato_invalido(self):
+        """Testa a rejeição de formato desconhecido"""
+        response = self.client.get(reverse('exportar_animais') + '?formato=xls')
+        self.assertEqual(response.status_code, 400)
+
+
+class GeradorAnimaisTest(TestCase):
+    def test_comando_gerar_animais(self):
+        """Testa o comando de geração em lotes e a idempotência por semente"""
+        saida = StringIO()
+        call_command('gerar_animais', count=25, seed=7, lote=10, stdout=saida)
+        self.assertEqual(Animal.objects.count(), 25)
+        self.assertIn("25 animais inseridos", saida.getvalue())
+
+        # Mesma semente gera os mesmos números de identificação (nada duplicado)
+        saida = StringIO()
+        call_command('gerar_animais', count=30, seed=7, lote=10, stdout=saida)
+        self.assertEqual(Animal.objects.count(), 30)
+        self.assertIn("5 animais inseridos", saida.getvalue())
+
+        animal = Animal.objects.first()
+        self.assertIn(animal.especie, ["Bovino", "Suíno", "Caprino", "Ovino", "Equino", "Aves"])
+        self.assertLessEqual(animal.data_nascimento, datetime.date(2025, 1, 1))
+
+    def test_datas_nao_dependem_do_dia(self):
+        """As datas saem da data de referência, não de date.today()"""
+        from utils import gerar_animal
+
+        self.assertEqual(gerar_animal.criar_animais(10, seed=3), 10)
+        datas = list(Animal.objects.order_by("numero_identificacao").values_list("data_nascimento", "data_aquisicao"))
+        Animal.objects.all().delete()
+
+        with patch.object(gerar_animal, "date") as data_falsa:
+            data_falsa.today.return_value = datetime.date(2031, 6, 1)
+            gerar_animal.criar_animais(10, seed=3)
+        self.assertEqual(
+            list(Animal.objects.order_by("numero_identificacao").values_list("data_nascimento", "data_aquisicao")),
+            datas,
+        )
+
+    def test_geracao_deterministica(self):
+        """Testa que a semente determina as linhas geradas"""
+        from utils.gerar_animal import gerar_lote
+
+        pools = {"observacoes": ["a", "b"]}
+        referencia = datetime.date(2025, 1, 1)
+        self.assertEqual(
+            gerar_lote(3, 1, 10, 30, pools, referencia),
+            gerar_lote(3, 1, 10, 30, pools, referencia),
+        )
+        self.assertNotEqual(
+            gerar_lote(3, 1, 10, 30, pools, referencia),
+            gerar_lote(4, 1, 10, 30, pools, referencia),
+        )
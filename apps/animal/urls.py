@@ -5,6 +5,8 @@ urlpatterns = [
     # CRUD
     path('animais/', views.listar_animais, name='listar_animais'),  #Mostra todos os animais cadastrados.
     path('animais/novo', views.criar_animais, name='criar_animais'),  #Formulário para cadastrar um novo animal.
+    path('animais/importar', views.importar_animais, name='importar_animais'),  #Importação em lote (CSV/NDJSON).
+    path('animais/exportar', views.exportar_animais, name='exportar_animais'),  #Exporta os animais filtrados (CSV/NDJSON).
     path('detalhe/<int:animal_id>/', views.detalhe_animal, name='detalhe_animal'),  #Mostra informações de um animal específico (por ID).
     path('editar/<int:animal_id>/', views.editar_animal, name='editar_animal'),
     path('deletar/<int:animal_id>/', views.deletar_animal, name='deletar_animal'),   #Página ou ação para confirmação de exclusão.
@@ -1,50 +1,112 @@
 from django.contrib import messages
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
 from django.shortcuts import render,get_object_or_404, redirect
-from django.db.models import Q
-from django.core.paginator import Paginator
 from django.urls import reverse
 
 from apps.animal.forms import AnimalForm
+from apps.core.paginacao import ContagemPaginator
+from . import exportacao, importacao
+from .busca import buscar_animais
 from .models import Animal
+from .paginacao import (
+    FILTROS,
+    codificar_cursor,
+    contar_animais,
+    decodificar_cursor,
+    pagina_por_cursor,
+)
 from django.views.decorators.http import require_POST
 
 
 
-def listar_animais(request):
-    # Obtém todos os animais
-    animais_list = Animal.objects.all().order_by('-id')
-    
-    # Aplica filtros
-    search_term = request.GET.get('search', '')
-    especie_filter = request.GET.get('especie', '')
-    sexo_filter = request.GET.get('sexo', '')
-    
+ANIMAIS_POR_PAGINA = 10
+
+
+def filtrar_animais(queryset, filtros):
+    """Aplica os filtros de busca, espécie e sexo usados na listagem."""
+    search_term = filtros.get('search', '')
+    especie_filter = filtros.get('especie', '')
+    sexo_filter = filtros.get('sexo', '')
+
     if search_term:
-        animais_list = animais_list.filter(
-            Q(nome__icontains=search_term) | 
-            Q(numero_identificacao__icontains=search_term)
-        )
+        # Índice FTS5 ordenado por relevância (ver apps/animal/busca.py)
+        queryset = buscar_animais(queryset, search_term)
     
     if especie_filter:
-        animais_list = animais_list.filter(especie=especie_filter)
+        queryset = queryset.filter(especie=especie_filter)
     
     if sexo_filter:
-        animais_list = animais_list.filter(sexo=sexo_filter)
-    
-    # Paginação
-    paginator = Paginator(animais_list, 10)  # 10 animais por página
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
-    
+        queryset = queryset.filter(sexo=sexo_filter)
+
+    return queryset
+
+
+def listar_animais(request):
+    # Modo cursor: o token carrega o último id visto e os filtros ativos
+    cursor = decodificar_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+
+    if cursor:
+        animal_id, direcao, filtros = cursor
+    else:
+        filtros = {nome: request.GET.get(nome, '') for nome in FILTROS}
+
+    animais_list = filtrar_animais(Animal.objects.all().order_by('-id'), filtros)
+    total_animais = contar_animais(animais_list, filtros)
+
+    # Com busca o resultado vem por relevância, então usa páginas numeradas
+    usar_cursor = not filtros.get('search')
+
+    if cursor:
+        animais, tem_anterior, tem_proxima = pagina_por_cursor(
+            animais_list, animal_id, direcao, ANIMAIS_POR_PAGINA
+        )
+        page_obj = None
+        page_range = []
+    else:
+        # Paginação numerada, reaproveitando o total em cache (sem COUNT extra)
+        paginator = ContagemPaginator(animais_list, ANIMAIS_POR_PAGINA, total_animais)
+        page_obj = paginator.get_page(request.GET.get('page'))
+        animais = page_obj
+        tem_anterior = page_obj.has_previous()
+        tem_proxima = page_obj.has_next()
+        page_range = paginator.get_elided_page_range(page_obj.number)
+
+    cursor_anterior = None
+    cursor_proximo = None
+    if animais and usar_cursor:
+        if tem_anterior:
+            cursor_anterior = codificar_cursor(animais[0].id, 'a', filtros)
+        if tem_proxima:
+            cursor_proximo = codificar_cursor(animais[len(animais) - 1].id, 'p', filtros)
+
     context = {
-        'animais': page_obj,
-        'total_animais': animais_list.count(),
+        'animais': animais,
+        'total_animais': total_animais,
         'page_obj': page_obj,
-        'is_paginated': paginator.num_pages > 1,
+        'page_range': page_range,
+        'is_paginated': tem_anterior or tem_proxima,
+        'cursor_anterior': cursor_anterior,
+        'cursor_proximo': cursor_proximo,
+        'filtros': filtros,
     }
     
     return render(request, 'listar_animais.html', context)
 
+def exportar_animais(request):
+    formato = request.GET.get('formato', 'csv')
+    if formato not in exportacao.FORMATOS:
+        return HttpResponseBadRequest('Formato inválido. Use csv ou ndjson.')
+
+    filtros = {nome: request.GET.get(nome, '') for nome in FILTROS}
+    animais_list = filtrar_animais(Animal.objects.all().order_by('-id'), filtros)
+
+    response = StreamingHttpResponse(
+        exportacao.GERADORES[formato](animais_list),
+        content_type=exportacao.FORMATOS[formato],
+    )
+    response['Content-Disposition'] = f'attachment; filename="animais.{formato}"'
+    return response
+
 def detalhe_animal(request, animal_id):
     # Usar get_object_or_404 com o ID específico
     animal = get_object_or_404(Animal, id=animal_id)
@@ -72,6 +134,37 @@ def criar_animais(request):
     
     return render(request, 'criar_animais.html', {'form': form})
 
+def importar_animais(request):
+    resultado = None
+    if request.method == 'POST':
+        arquivo = request.FILES.get('arquivo')
+        formato = request.POST.get('formato', 'csv')
+        try:
+            tamanho_lote = int(request.POST.get('tamanho_lote') or importacao.TAMANHO_LOTE_PADRAO)
+        except ValueError:
+            tamanho_lote = importacao.TAMANHO_LOTE_PADRAO
+        tamanho_lote = max(1, min(tamanho_lote, 5000))
+
+        if not arquivo:
+            messages.error(request, 'Selecione um arquivo para importar.')
+        elif formato not in importacao.FORMATOS:
+            messages.error(request, 'Formato inválido. Use CSV ou NDJSON.')
+        else:
+            arquivo.seek(0)
+            resultado = importacao.importar_animais(
+                importacao.ler_linhas(arquivo.file, formato),
+                tamanho_lote=tamanho_lote,
+            )
+            messages.success(
+                request,
+                f"{resultado['importados']} de {resultado['total']} animais importados."
+            )
+
+    return render(request, 'importar_animais.html', {
+        'resultado': resultado,
+        'tamanho_lote_padrao': importacao.TAMANHO_LOTE_PADRAO,
+    })
+
 @require_POST
 def deletar_animal(request, animal_id):
     animal = get_object_or_404(Animal, pk=animal_id)
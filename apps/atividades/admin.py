@@ -1,7 +1,21 @@
 from django.contrib import admin
 from django.contrib.auth.models import User
 from django.contrib.auth.admin import UserAdmin
-from .models import Atividade, LogAtividade
+from django.contrib.admin.views.main import ORDER_VAR
+from django.db.models import Q
+from django.utils.html import format_html, format_html_join
+from .arquivamento import logs_arquivados, total_arquivados
+from .busca import buscar_atividades, buscar_logs
+from .models import ArquivoLog, Atividade, LogAtividade, ModeloAtividade, Trabalhador
+
+# Logs arquivados exibidos no formulário da atividade
+LIMITE_LOGS_ARQUIVADOS = 200
+
+def _ordem_da_busca(request, queryset, resultado):
+    """A busca ordena por relevância, a menos que o usuário tenha escolhido uma coluna."""
+    if request.GET.get(ORDER_VAR):
+        return resultado.order_by(*queryset.query.order_by)
+    return resultado
 
 class LogAtividadeInline(admin.TabularInline):
     model = LogAtividade
@@ -12,12 +26,25 @@ class LogAtividadeInline(admin.TabularInline):
     def has_add_permission(self, request, obj=None):
         return False
 
+@admin.register(Trabalhador)
+class TrabalhadorAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'usuario', 'ativo', 'data_criacao']
+    list_filter = ['ativo']
+    search_fields = ['nome']
+
+@admin.register(ModeloAtividade)
+class ModeloAtividadeAdmin(admin.ModelAdmin):
+    list_display = ['titulo', 'frequencia', 'intervalo', 'trabalhador', 'inicio', 'fim', 'ativo', 'gerado_ate']
+    list_filter = ['frequencia', 'ativo', 'tipo_atividade']
+    search_fields = ['titulo', 'descricao']
+    readonly_fields = ['gerado_ate', 'data_criacao']
+
 @admin.register(Atividade)
 class AtividadeAdmin(admin.ModelAdmin):
     list_display = ['titulo', 'tipo_atividade', 'prioridade', 'status', 'nome_trabalhador', 'data_limite', 'data_criacao']
     list_filter = ['tipo_atividade', 'prioridade', 'status', 'data_criacao', 'data_limite']
     search_fields = ['titulo', 'descricao', 'nome_trabalhador']
-    readonly_fields = ['data_criacao', 'data_modificacao', 'data_exclusao']
+    readonly_fields = ['data_criacao', 'data_modificacao', 'data_exclusao', 'historico_arquivado']
     fieldsets = [
         ('Informações Básicas', {
             'fields': ['titulo', 'descricao', 'tipo_atividade', 'prioridade', 'status']
@@ -26,7 +53,7 @@ class AtividadeAdmin(admin.ModelAdmin):
             'fields': ['data_limite', 'data_criacao', 'data_modificacao', 'data_exclusao']
         }),
         ('Atribuição', {
-            'fields': ['nome_trabalhador']
+            'fields': ['trabalhador']
         }),
         ('Problemas', {
             'fields': ['descricao_problema'],
@@ -35,15 +62,60 @@ class AtividadeAdmin(admin.ModelAdmin):
         ('Auditoria', {
             'fields': ['usuario_responsavel'],
             'classes': ['collapse']
+        }),
+        ('Histórico arquivado', {
+            'fields': ['historico_arquivado'],
+            'classes': ['collapse']
         })
     ]
     inlines = [LogAtividadeInline]
 
+    @admin.display(description='Logs arquivados')
+    def historico_arquivado(self, obj):
+        logs = logs_arquivados(obj.pk, limite=LIMITE_LOGS_ARQUIVADOS) if obj.pk else []
+        if not logs:
+            return '—'
+        total = total_arquivados(obj.pk)
+        aviso = ''
+        if total > len(logs):
+            aviso = format_html('<p>Exibindo os {} mais recentes de {} logs arquivados.</p>', len(logs), total)
+        linhas = format_html_join(
+            '', '<tr><td>{}</td><td>{}</td><td>{}</td><td>{}</td></tr>',
+            ((f"{log['data_criacao']:%d/%m/%Y %H:%M}", log['tipo_acao'], log['usuario_responsavel'], log['log_atividade'])
+             for log in logs),
+        )
+        return format_html(
+            '{}<table><thead><tr><th>Data</th><th>Ação</th><th>Usuário</th><th>Log</th></tr></thead>'
+            '<tbody>{}</tbody></table>', aviso, linhas,
+        )
+
+    def get_search_results(self, request, queryset, search_term):
+        # Índice FTS5 em vez de LIKE sobre search_fields
+        if not search_term.strip():
+            return queryset, False
+        # O nome do trabalhador não está no índice: casa pelo início do nome
+        termo = search_term.strip()
+        resultado = buscar_atividades(queryset, termo) | queryset.filter(
+            Q(nome_trabalhador__istartswith=termo) | Q(trabalhador__nome__istartswith=termo)
+        ).order_by()
+        return _ordem_da_busca(request, queryset, resultado), False
+
     def save_model(self, request, obj, form, change):
         if not obj.usuario_responsavel or obj.usuario_responsavel == 'sistema':
             obj.usuario_responsavel = request.user.username
+        obj.atribuir(obj.trabalhador)
         super().save_model(request, obj, form, change)
 
+@admin.register(ArquivoLog)
+class ArquivoLogAdmin(admin.ModelAdmin):
+    list_display = ['mes', 'caminho', 'quantidade', 'data_modificacao']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(LogAtividade)
 class LogAtividadeAdmin(admin.ModelAdmin):
     list_display = ['atividade', 'tipo_acao', 'usuario_responsavel', 'data_criacao']
@@ -51,6 +123,15 @@ class LogAtividadeAdmin(admin.ModelAdmin):
     search_fields = ['atividade__titulo', 'log_atividade', 'usuario_responsavel']
     readonly_fields = ['data_criacao', 'usuario_responsavel', 'atividade', 'log_atividade', 'tipo_acao']
 
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        # usuario_responsavel não está no índice: casa pelo valor exato
+        termo = search_term.strip()
+        # Sem ordem no lado direito: a união mantém a ordem por relevância da busca
+        resultado = buscar_logs(queryset, termo) | queryset.filter(usuario_responsavel=termo).order_by()
+        return _ordem_da_busca(request, queryset, resultado), False
+
     def has_add_permission(self, request):
         return False
 
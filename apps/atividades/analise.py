@@ -0,0 +1,214 @@
+"""
+Indicadores de SLA das atividades a partir do histórico de status.
+
+As transições (logs ``ATUALIZACAO_STATUS``, "Status alterado de X para Y")
+são lidas em uma única consulta ordenada por atividade e data e viram
+arrays NumPy; o tempo em cada status, o lead time (criação até a primeira
+conclusão) e a taxa de atraso são calculados para todas as atividades de
+uma vez e agregados por trabalhador, tipo e prioridade com ``bincount``.
+
+Atividades concluídas sem log de status (editadas pelo formulário ou pelo
+admin) contam como concluídas na ``data_modificacao``. O relatório cobre as
+atividades criadas dentro de ``settings.RETENCAO_LOGS_DIAS``: os logs das
+mais antigas podem já ter ido para o arquivo (``arquivamento.py``).
+
+O relatório é guardado em cache por dia.
+"""
+import datetime
+import re
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import Atividade, LogAtividade
+
+TEMPO_CACHE = 24 * 60 * 60
+STATUS = [status for status, _ in Atividade.STATUS_CHOICES]
+INDICE_STATUS = {status: i for i, status in enumerate(STATUS)}
+# Status em que o relógio para
+STATUS_ENCERRADOS = ('concluida', 'cancelada')
+DIMENSOES = {
+    'trabalhador': 'nome_trabalhador',
+    'tipo': 'tipo_atividade',
+    'prioridade': 'prioridade',
+}
+
+_TRANSICAO = re.compile(r"de (\w+) para (\w+)")
+
+
+def _horas(valor):
+    return None if np.isnan(valor) else round(float(valor) / 3600, 2)
+
+
+def _timestamps(datas):
+    return np.array([d.timestamp() if d else np.nan for d in datas], dtype=np.float64)
+
+
+def inicio_janela(agora):
+    """Início da janela do relatório: a retenção dos logs de atividade."""
+    return agora - datetime.timedelta(days=settings.RETENCAO_LOGS_DIAS)
+
+
+def carregar_atividades(desde):
+    """Atributos das atividades ativas criadas desde ``desde``, ordenados por id (um array por coluna)."""
+    linhas = list(
+        Atividade.objects.filter(data_exclusao__isnull=True, data_criacao__gte=desde).order_by('pk').values_list(
+            'pk', 'data_criacao', 'data_modificacao', 'data_limite', 'status', *DIMENSOES.values()
+        )
+    )
+    colunas = list(zip(*linhas)) or [()] * (5 + len(DIMENSOES))
+    dados = {
+        'ids': np.array(colunas[0], dtype=np.int64),
+        'criacao': _timestamps(colunas[1]),
+        'modificacao': _timestamps(colunas[2]),
+        'limite': _timestamps(colunas[3]),
+        'status': np.array([INDICE_STATUS.get(s, -1) for s in colunas[4]], dtype=np.int64),
+    }
+    for indice, dimensao in enumerate(DIMENSOES, start=5):
+        dados[dimensao] = np.array([valor or '—' for valor in colunas[indice]], dtype=object)
+    return dados
+
+
+def carregar_transicoes(desde):
+    """Transições de status em ordem (atividade, data): arrays de atividade, instante, de e para."""
+    linhas = (
+        LogAtividade.objects
+        .filter(
+            tipo_acao='ATUALIZACAO_STATUS',
+            atividade__data_exclusao__isnull=True,
+            atividade__data_criacao__gte=desde,
+        )
+        .order_by('atividade_id', 'data_criacao', 'id_log')
+        .values_list('atividade_id', 'data_criacao', 'log_atividade')
+    )
+    atividades, instantes, de, para = [], [], [], []
+    for atividade_id, data, texto in linhas.iterator(chunk_size=5000):
+        encontrado = _TRANSICAO.search(texto)
+        if not encontrado or encontrado[1] not in INDICE_STATUS or encontrado[2] not in INDICE_STATUS:
+            continue
+        atividades.append(atividade_id)
+        instantes.append(data.timestamp())
+        de.append(INDICE_STATUS[encontrado[1]])
+        para.append(INDICE_STATUS[encontrado[2]])
+    return (
+        np.array(atividades, dtype=np.int64),
+        np.array(instantes, dtype=np.float64),
+        np.array(de, dtype=np.int64),
+        np.array(para, dtype=np.int64),
+    )
+
+
+def calcular_indicadores(atividades, transicoes, agora):
+    """Indicadores por atividade: intervalos (posição, status, duração), conclusão e atraso."""
+    ids, criacao, limite, status = atividades['ids'], atividades['criacao'], atividades['limite'], atividades['status']
+    ev_atividade, ev_instante, ev_de, ev_para = transicoes
+    agora = agora.timestamp()
+
+    # Descarta transições de atividades criadas/excluídas entre as duas consultas
+    posicao = np.searchsorted(ids, ev_atividade)
+    validas = posicao < len(ids)
+    validas[validas] &= ids[posicao[validas]] == ev_atividade[validas]
+    if not validas.all():
+        ev_atividade, ev_instante, ev_de, ev_para = (a[validas] for a in transicoes)
+        posicao = posicao[validas]
+
+    primeira = np.r_[True, ev_atividade[1:] != ev_atividade[:-1]] if len(posicao) else np.zeros(0, bool)
+    ultima = np.r_[ev_atividade[1:] != ev_atividade[:-1], True] if len(posicao) else np.zeros(0, bool)
+
+    # Cada transição encerra o período no status "de", iniciado na transição anterior (ou na criação)
+    inicio_periodo = np.where(primeira, criacao[posicao], np.r_[0.0, ev_instante[:-1]][:len(posicao)])
+    duracao = np.maximum(ev_instante - inicio_periodo, 0)
+
+    # Período em aberto no status atual, desde a última transição
+    ultima_mudanca = criacao.copy()
+    ultima_mudanca[posicao[ultima]] = ev_instante[ultima]
+    encerrada = np.isin(status, [INDICE_STATUS[s] for s in STATUS_ENCERRADOS])
+    abertas = np.flatnonzero(~encerrada & (status >= 0))
+
+    intervalos_posicao = np.concatenate([posicao, abertas])
+    intervalos_status = np.concatenate([ev_de, status[abertas]])
+    intervalos_duracao = np.concatenate([duracao, np.maximum(agora - ultima_mudanca[abertas], 0)])
+
+    # Primeira conclusão de cada atividade
+    conclusao = np.full(len(ids), np.nan)
+    concluidas = ev_para == INDICE_STATUS['concluida']
+    pos_concluidas, primeiro = np.unique(posicao[concluidas], return_index=True)
+    conclusao[pos_concluidas] = ev_instante[concluidas][primeiro]
+    # Concluídas sem log de status: vale a última modificação
+    sem_log = np.isnan(conclusao) & (status == INDICE_STATUS['concluida'])
+    conclusao[sem_log] = atividades['modificacao'][sem_log]
+    lead_time = conclusao - criacao
+
+    com_prazo = ~np.isnan(limite) & (status != INDICE_STATUS['cancelada'])
+    atrasada = com_prazo & (np.where(np.isnan(conclusao), agora, conclusao) > limite)
+
+    return {
+        'intervalos': (intervalos_posicao, intervalos_status, intervalos_duracao),
+        'lead_time': lead_time,
+        'com_prazo': com_prazo,
+        'atrasada': atrasada,
+    }
+
+
+def agregar(rotulos, indicadores):
+    """Agrupa os indicadores pelos rótulos (um por atividade)."""
+    chaves, grupo = np.unique(rotulos, return_inverse=True) if len(rotulos) else ([], np.zeros(0, np.int64))
+    total_grupos, total_status = len(chaves), len(STATUS)
+    if not total_grupos:
+        return []
+
+    atividades = np.bincount(grupo, minlength=total_grupos)
+
+    lead_time = indicadores['lead_time']
+    concluidas = ~np.isnan(lead_time)
+    n_concluidas = np.bincount(grupo[concluidas], minlength=total_grupos)
+    soma_lead = np.bincount(grupo[concluidas], weights=lead_time[concluidas], minlength=total_grupos)
+
+    com_prazo = indicadores['com_prazo']
+    n_com_prazo = np.bincount(grupo[com_prazo], minlength=total_grupos)
+    n_atrasadas = np.bincount(grupo[indicadores['atrasada']], minlength=total_grupos)
+
+    posicao, status, duracao = indicadores['intervalos']
+    celula = grupo[posicao] * total_status + status
+    soma_status = np.bincount(celula, weights=duracao, minlength=total_grupos * total_status).reshape(total_grupos, total_status)
+    n_status = np.bincount(celula, minlength=total_grupos * total_status).reshape(total_grupos, total_status)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        lead_medio = soma_lead / n_concluidas
+        taxa_atraso = n_atrasadas / n_com_prazo
+        media_status = soma_status / n_status
+
+    return [
+        {
+            'chave': str(chave),
+            'atividades': int(atividades[g]),
+            'concluidas': int(n_concluidas[g]),
+            'lead_time_horas': _horas(lead_medio[g]),
+            'taxa_atraso': None if np.isnan(taxa_atraso[g]) else round(float(taxa_atraso[g]), 4),
+            'horas_em_status': {
+                STATUS[s]: _horas(media_status[g, s]) for s in range(total_status) if n_status[g, s]
+            },
+        }
+        for g, chave in enumerate(chaves)
+    ]
+
+
+def gerar_relatorio(agora=None):
+    agora = agora or timezone.now()
+    desde = inicio_janela(agora)
+    atividades = carregar_atividades(desde)
+    indicadores = calcular_indicadores(atividades, carregar_transicoes(desde), agora)
+    return {
+        'gerado_em': agora.isoformat(),
+        'desde': desde.isoformat(),
+        'total_atividades': int(len(atividades['ids'])),
+        **{nome: agregar(atividades[nome], indicadores) for nome in DIMENSOES},
+    }
+
+
+def relatorio_sla(dia=None):
+    """Relatório do dia, calculado na primeira chamada e servido do cache depois."""
+    dia = dia or timezone.localdate()
+    return cache.get_or_set(f"atividades:sla:{dia.isoformat()}", gerar_relatorio, TEMPO_CACHE)
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate, post_save, pre_save
 
 
 class AtividadesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.atividades'
+
+    def ready(self):
+        from .busca import criar_indice_busca
+        from .models import Atividade
+        from .sincronizacao import atividade_alterando, atividade_salva
+
+        # Tabelas FTS5 + triggers da busca de atividades e logs (ver busca.py)
+        post_migrate.connect(criar_indice_busca, sender=self, dispatch_uid='atividades_indice_busca')
+        # Reatribuições viram exclusões no delta do trabalhador anterior (ver sincronizacao.py)
+        pre_save.connect(atividade_alterando, sender=Atividade, dispatch_uid='atividades_reatribuicao_pre_save')
+        post_save.connect(atividade_salva, sender=Atividade, dispatch_uid='atividades_reatribuicao_post_save')
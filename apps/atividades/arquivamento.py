@@ -0,0 +1,146 @@
+"""
+Retenção e arquivamento dos logs de atividade.
+
+Logs mais antigos que ``settings.RETENCAO_LOGS_DIAS`` saem da tabela
+``log_atividades`` para arquivos ``AAAA-MM.ndjson.gz`` em
+``settings.ARQUIVO_LOGS_DIR`` (um por mês, só recebem acréscimos: cada
+execução grava um novo membro gzip no fim do arquivo). ``ArquivoLog`` e
+``IndiceArquivoLog`` dizem em quais arquivos estão os logs de cada
+atividade, para o admin ler só os meses necessários.
+
+Na leitura, os logs de uma atividade em cada arquivo ficam em cache até o
+arquivo receber um novo lote, e os meses são lidos do mais recente para o
+mais antigo só até juntar os ``limite`` logs pedidos: o admin não
+descompacta o mês inteiro a cada visualização.
+
+Cada lote é gravado e sincronizado no disco antes de ser apagado do
+banco; se o processo cair entre os dois passos o lote é arquivado de novo
+na próxima execução, e a leitura descarta os ids repetidos.
+"""
+import datetime
+import gzip
+import json
+import os
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import ArquivoLog, IndiceArquivoLog, LogAtividade
+
+TAMANHO_LOTE = 5000
+TEMPO_CACHE = 24 * 60 * 60
+CAMPOS = ("id_log", "atividade_id", "log_atividade", "usuario_responsavel", "data_criacao", "tipo_acao")
+
+
+def pasta_arquivo():
+    return Path(getattr(settings, "ARQUIVO_LOGS_DIR", Path(settings.BASE_DIR) / "arquivo" / "logs_atividades"))
+
+
+def _gravar(mes, linhas):
+    """Acrescenta as linhas ao arquivo do mês e garante que estão no disco."""
+    pasta = pasta_arquivo()
+    pasta.mkdir(parents=True, exist_ok=True)
+    nome = f"{mes:%Y-%m}.ndjson.gz"
+    with open(pasta / nome, "ab") as bruto:
+        with gzip.GzipFile(fileobj=bruto, mode="wb") as arquivo:
+            for linha in linhas:
+                arquivo.write(json.dumps(linha, ensure_ascii=False).encode() + b"\n")
+        bruto.flush()
+        os.fsync(bruto.fileno())
+    return nome
+
+
+def _indexar(mes, nome, linhas):
+    arquivo, _ = ArquivoLog.objects.get_or_create(mes=mes, defaults={"caminho": nome})
+    arquivo.quantidade += len(linhas)
+    arquivo.save(update_fields=["quantidade", "data_modificacao"])
+
+    por_atividade = defaultdict(int)
+    for linha in linhas:
+        por_atividade[linha["atividade_id"]] += 1
+
+    existentes = {
+        indice.atividade_id: indice
+        for indice in IndiceArquivoLog.objects.filter(arquivo=arquivo, atividade_id__in=por_atividade)
+    }
+    for atividade_id, indice in existentes.items():
+        indice.quantidade += por_atividade.pop(atividade_id)
+    IndiceArquivoLog.objects.bulk_update(existentes.values(), ["quantidade"])
+    IndiceArquivoLog.objects.bulk_create([
+        IndiceArquivoLog(arquivo=arquivo, atividade_id=atividade_id, quantidade=quantidade)
+        for atividade_id, quantidade in por_atividade.items()
+    ])
+
+
+def arquivar_logs(dias=None, agora=None, tamanho_lote=TAMANHO_LOTE):
+    """Move para os arquivos mensais os logs anteriores ao corte; retorna quantos foram arquivados."""
+    dias = dias if dias is not None else settings.RETENCAO_LOGS_DIAS
+    corte = (agora or timezone.now()) - datetime.timedelta(days=dias)
+    arquivados = 0
+
+    while True:
+        lote = list(
+            LogAtividade.objects.filter(data_criacao__lt=corte)
+            .order_by("data_criacao", "id_log")
+            .values(*CAMPOS)[:tamanho_lote]
+        )
+        if not lote:
+            return arquivados
+
+        por_mes = defaultdict(list)
+        for linha in lote:
+            data = timezone.localtime(linha["data_criacao"])
+            linha["data_criacao"] = data.isoformat()
+            por_mes[data.date().replace(day=1)].append(linha)
+
+        for mes, linhas in sorted(por_mes.items()):
+            nome = _gravar(mes, linhas)
+            with transaction.atomic():
+                _indexar(mes, nome, linhas)
+                LogAtividade.objects.filter(pk__in=[linha["id_log"] for linha in linhas]).delete()
+            arquivados += len(linhas)
+
+
+def _ler_arquivo(arquivo, atividade_id):
+    """Logs da atividade em um arquivo mensal (sem repetidos), em cache até o arquivo mudar."""
+    chave = f"atividades:arquivo:{arquivo.pk}:{arquivo.data_modificacao.timestamp()}:{atividade_id}"
+    linhas = cache.get(chave)
+    if linhas is not None:
+        return linhas
+
+    caminho = pasta_arquivo() / arquivo.caminho
+    if not caminho.exists():
+        return []
+    vistos = {}
+    # Lê todos os membros gzip do arquivo em sequência, linha a linha
+    with gzip.open(caminho, "rt", encoding="utf-8") as conteudo:
+        for texto in conteudo:
+            linha = json.loads(texto)
+            if linha["atividade_id"] == atividade_id:
+                linha["data_criacao"] = datetime.datetime.fromisoformat(linha["data_criacao"])
+                vistos[linha["id_log"]] = linha
+    linhas = list(vistos.values())
+    cache.set(chave, linhas, TEMPO_CACHE)
+    return linhas
+
+
+def total_arquivados(atividade_id):
+    return sum(
+        IndiceArquivoLog.objects.filter(atividade_id=atividade_id).values_list("quantidade", flat=True)
+    )
+
+
+def logs_arquivados(atividade_id, limite=None):
+    """Logs arquivados de uma atividade, do mais recente para o mais antigo (até ``limite``)."""
+    logs = []
+    for arquivo in ArquivoLog.objects.filter(indices__atividade_id=atividade_id).order_by("-mes"):
+        logs.extend(_ler_arquivo(arquivo, atividade_id))
+        # Os meses seguintes só têm logs mais antigos
+        if limite is not None and len(logs) >= limite:
+            break
+    logs.sort(key=lambda linha: (linha["data_criacao"], linha["id_log"]), reverse=True)
+    return logs[:limite] if limite is not None else logs
@@ -0,0 +1,104 @@
+"""
+Gravação write-behind dos logs de atividade.
+
+As views não gravam mais o ``LogAtividade`` dentro da requisição: o log é
+montado (com o horário do evento) e colocado numa fila em memória, que uma
+thread de fundo descarrega com ``bulk_create`` quando atinge
+``TAMANHO_LOTE`` entradas ou a cada ``INTERVALO`` segundos.
+
+A fila, a thread e a drenagem ficam em ``apps.core.escrita``; aqui só a
+gravação dos logs.
+
+* Dentro de uma transação, o log só entra na fila no commit
+  (``transaction.on_commit``); se a alteração for desfeita, o log também é.
+* No encerramento do processo (``atexit``) a fila é drenada.
+* Se o lote violar uma restrição (ex.: a atividade foi apagada), os logs
+  são regravados um a um e os inválidos descartados; só uma falha do
+  banco (indisponível, travado) devolve o lote à fila.
+
+Com ``ASSINCRONO`` desligado (ex.: testes) o log é gravado na hora.
+"""
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, transaction
+from django.utils import timezone
+
+from apps.core.escrita import EscritaEmSegundoPlano, instancia_do_processo
+
+CONFIGURACAO_PADRAO = {"ASSINCRONO": True, "TAMANHO_LOTE": 200, "INTERVALO": 1.0}
+
+# Limite de logs retidos em memória se o banco ficar indisponível
+TAMANHO_MAXIMO_FILA = 50_000
+
+
+class EscritorAuditoria(EscritaEmSegundoPlano):
+    def __init__(self, tamanho_lote=200, intervalo=1.0, assincrono=True):
+        super().__init__(
+            self._gravar_logs, tamanho_lote, intervalo,
+            nome="auditoria de atividades", maximo_fila=TAMANHO_MAXIMO_FILA,
+        )
+        self.assincrono = assincrono
+
+    def registrar(self, atividade, log_atividade, usuario_responsavel, tipo_acao):
+        from .models import LogAtividade
+
+        log = LogAtividade(
+            atividade=atividade,
+            log_atividade=log_atividade,
+            usuario_responsavel=usuario_responsavel,
+            tipo_acao=tipo_acao,
+            data_criacao=timezone.now(),
+        )
+        if not self.assincrono:
+            log.save()
+            return log
+        # Fora de transação o callback roda imediatamente
+        transaction.on_commit(lambda: self._enfileirar(log))
+        return log
+
+    def _enfileirar(self, log):
+        if not self.enfileirar([log]):
+            print(f"auditoria de atividades: fila cheia, log da atividade {log.atividade_id} descartado")
+
+    def _gravar_logs(self, lote):
+        from .models import LogAtividade
+
+        try:
+            with transaction.atomic():
+                LogAtividade.objects.bulk_create(lote, batch_size=self.tamanho_lote)
+        except IntegrityError:
+            return self._gravar_um_a_um(lote)
+        return len(lote)
+
+    def _gravar_um_a_um(self, lote):
+        """Grava log a log, descartando os que violam alguma restrição."""
+        gravados = 0
+        for posicao, log in enumerate(lote):
+            log.pk = None
+            log._state.adding = True
+            try:
+                with transaction.atomic():
+                    log.save(force_insert=True)
+            except IntegrityError as e:
+                print(f"auditoria de atividades: log da atividade {log.atividade_id} descartado:", e)
+                continue
+            except DatabaseError as e:
+                print("auditoria de atividades: erro ao gravar logs:", e)
+                self.devolver(lote[posicao:])
+                break
+            gravados += 1
+        return gravados
+
+
+@instancia_do_processo
+def escritor():
+    """Instância do processo, configurada por ``settings.AUDITORIA_ATIVIDADES``."""
+    config = {**CONFIGURACAO_PADRAO, **getattr(settings, "AUDITORIA_ATIVIDADES", {})}
+    return EscritorAuditoria(
+        tamanho_lote=config["TAMANHO_LOTE"],
+        intervalo=config["INTERVALO"],
+        assincrono=config["ASSINCRONO"],
+    )
+
+
+def registrar_log(atividade, log_atividade, usuario_responsavel, tipo_acao):
+    return escritor().registrar(atividade, log_atividade, usuario_responsavel, tipo_acao)
@@ -0,0 +1,174 @@
+"""
+Busca textual de atividades com SQLite FTS5.
+
+Dois índices de conteúdo externo, mantidos por triggers (inclusive nos
+``bulk_create`` e ``bulk_update``):
+
+* ``atividade_busca``: título, descrição e problema relatado de ``atividades``;
+* ``log_atividade_busca``: texto de ``log_atividades``.
+
+Ao contrário da busca de animais (trigram, para casar pedaços de
+identificação), aqui o tokenizer é por palavra (``unicode61`` sem acentos)
+com índices de prefixo: o índice fica bem menor, o que importa com
+milhões de logs, e cada palavra digitada casa pelo início.
+"""
+import re
+
+from django.db import DatabaseError, connection
+from django.db.models import F, OuterRef, Q, Subquery
+
+TOKENIZER = "unicode61 remove_diacritics 2"
+
+INDICES = (
+    # (tabela fts, tabela de conteúdo, coluna do rowid, colunas)
+    ("atividade_busca", "atividades", "id_atividade", ("titulo", "descricao", "descricao_problema")),
+    ("log_atividade_busca", "log_atividades", "id_log", ("log_atividade",)),
+)
+
+
+def _sql_indice(tabela, conteudo, rowid, colunas):
+    lista = ", ".join(colunas)
+    novos = ", ".join(f"new.{c}" for c in colunas)
+    antigos = ", ".join(f"old.{c}" for c in colunas)
+    return [
+        f"""
+        CREATE VIRTUAL TABLE IF NOT EXISTS {tabela} USING fts5(
+            {lista},
+            content='{conteudo}',
+            content_rowid='{rowid}',
+            tokenize='{TOKENIZER}',
+            prefix='2 3'
+        )
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {tabela}_ai AFTER INSERT ON {conteudo} BEGIN
+            INSERT INTO {tabela}(rowid, {lista}) VALUES (new.{rowid}, {novos});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {tabela}_ad AFTER DELETE ON {conteudo} BEGIN
+            INSERT INTO {tabela}({tabela}, rowid, {lista}) VALUES ('delete', old.{rowid}, {antigos});
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS {tabela}_au AFTER UPDATE OF {lista} ON {conteudo} BEGIN
+            INSERT INTO {tabela}({tabela}, rowid, {lista}) VALUES ('delete', old.{rowid}, {antigos});
+            INSERT INTO {tabela}(rowid, {lista}) VALUES (new.{rowid}, {novos});
+        END
+        """,
+    ]
+
+
+_indice_disponivel = None
+
+
+def criar_indice_busca(using="default", reconstruir=False, **kwargs):
+    """
+    Cria as tabelas FTS5 e os triggers (idempotente). Conectado ao
+    ``post_migrate``; na primeira criação indexa os registros existentes.
+    """
+    global _indice_disponivel
+    from django.db import connections
+
+    conexao = connections[using]
+    if conexao.vendor != "sqlite":
+        return False
+
+    with conexao.cursor() as cursor:
+        for tabela, conteudo, rowid, colunas in INDICES:
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [tabela]
+            )
+            existia = cursor.fetchone() is not None
+            try:
+                for sql in _sql_indice(tabela, conteudo, rowid, colunas):
+                    cursor.execute(sql)
+            except DatabaseError as e:
+                print("busca de atividades: índice FTS5 indisponível:", e)
+                _indice_disponivel = False
+                return False
+            if reconstruir or not existia:
+                cursor.execute(f"INSERT INTO {tabela}({tabela}) VALUES ('rebuild')")
+
+    _indice_disponivel = True
+    return True
+
+
+def indice_disponivel():
+    global _indice_disponivel
+    if _indice_disponivel is None:
+        if connection.vendor != "sqlite":
+            _indice_disponivel = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN (%s, %s)",
+                    [tabela for tabela, *_ in INDICES],
+                )
+                _indice_disponivel = cursor.fetchone()[0] == len(INDICES)
+    return _indice_disponivel
+
+
+def montar_consulta(termo):
+    """Cada palavra vira um prefixo (``"palavra"*``) e todas precisam aparecer."""
+    palavras = re.findall(r"\w+", termo)
+    if not palavras:
+        return None
+    return " ".join(f'"{p}"*' for p in palavras)
+
+
+def _filtro_contem(termo, campos):
+    filtro = Q()
+    for palavra in termo.split():
+        filtro &= Q(*[Q(**{f"{campo}__icontains": palavra}) for campo in campos], _connector=Q.OR)
+    return filtro
+
+
+def buscar_atividades(queryset, termo):
+    """
+    Atividades cujo texto ou algum log casa com o termo. As que casam no
+    próprio texto vêm primeiro, por relevância (bm25); as encontradas só
+    pelos logs vêm em seguida, das mais recentes para as mais antigas.
+    """
+    from .models import AtividadeBusca, LogAtividade, LogAtividadeBusca
+
+    consulta = montar_consulta(termo) if indice_disponivel() else None
+    if consulta is None:
+        return queryset.filter(
+            _filtro_contem(termo, ("titulo", "descricao", "descricao_problema"))
+            | Q(pk__in=LogAtividade.objects.filter(_filtro_contem(termo, ("log_atividade",))).values("atividade_id"))
+        )
+
+    diretas = AtividadeBusca.objects.filter(documento__match=consulta)
+    por_logs = LogAtividadeBusca.objects.filter(documento__match=consulta).values("log__atividade_id")
+    relevancia = diretas.filter(atividade=OuterRef("pk")).values("rank")[:1]
+
+    return (
+        queryset.filter(Q(pk__in=diretas.values("atividade_id")) | Q(pk__in=por_logs))
+        .annotate(relevancia=Subquery(relevancia))
+        .order_by(F("relevancia").asc(nulls_last=True), "-data_criacao")
+    )
+
+
+def buscar_logs(queryset, termo):
+    """
+    Logs cujo texto, ou o texto da atividade, casa com o termo. Os que casam
+    no próprio texto vêm primeiro, por relevância (bm25).
+    """
+    from .models import AtividadeBusca, LogAtividadeBusca
+
+    consulta = montar_consulta(termo) if indice_disponivel() else None
+    if consulta is None:
+        return queryset.filter(
+            _filtro_contem(termo, ("log_atividade",)) | _filtro_contem(termo, ("atividade__titulo",))
+        )
+    diretos = LogAtividadeBusca.objects.filter(documento__match=consulta)
+    relevancia = diretos.filter(log=OuterRef("pk")).values("rank")[:1]
+    return (
+        queryset.filter(
+            Q(pk__in=diretos.values("log_id"))
+            | Q(atividade_id__in=AtividadeBusca.objects.filter(documento__match=consulta).values("atividade_id"))
+        )
+        .annotate(relevancia=Subquery(relevancia))
+        .order_by(F("relevancia").asc(nulls_last=True), "-data_criacao")
+    )
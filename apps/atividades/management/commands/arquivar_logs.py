@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from apps.atividades.arquivamento import arquivar_logs
+
+
+class Command(BaseCommand):
+    help = "Move os logs de atividade mais antigos que o prazo de retenção para os arquivos mensais."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dias", type=int, default=settings.RETENCAO_LOGS_DIAS,
+            help="Mantém na tabela só os logs dos últimos N dias.",
+        )
+
+    def handle(self, *args, **options):
+        total = arquivar_logs(dias=options["dias"])
+        self.stdout.write(self.style.SUCCESS(f"{total} logs arquivados."))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.atividades.models import Atividade, Trabalhador
+
+# Lista usada nas telas antes do cadastro de trabalhadores
+TRABALHADORES_INICIAIS = ['Gustavo C.', 'Daniel B', 'Danilo V', 'João G', 'Tayane S', 'Admin Sistema']
+
+
+class Command(BaseCommand):
+    help = (
+        "Cadastra os trabalhadores iniciais e os nomes já usados nas atividades, "
+        "e preenche o vínculo (FK) das atividades atribuídas só pelo nome."
+    )
+
+    def handle(self, *args, **options):
+        nomes = set(TRABALHADORES_INICIAIS) | set(
+            Atividade.objects.filter(trabalhador__isnull=True)
+            .exclude(nome_trabalhador__isnull=True).exclude(nome_trabalhador="")
+            .values_list("nome_trabalhador", flat=True).distinct()
+        )
+
+        with transaction.atomic():
+            existentes = set(Trabalhador.objects.filter(nome__in=nomes).values_list("nome", flat=True))
+            Trabalhador.objects.bulk_create([Trabalhador(nome=n) for n in sorted(nomes - existentes)])
+
+            vinculadas = 0
+            for trabalhador in Trabalhador.objects.filter(nome__in=nomes):
+                vinculadas += Atividade.objects.filter(
+                    trabalhador__isnull=True, nome_trabalhador=trabalhador.nome
+                ).update(trabalhador=trabalhador)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(nomes - existentes)} trabalhadores cadastrados, {vinculadas} atividades vinculadas."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from apps.atividades.recorrencia import HORIZONTE_DIAS, materializar_recorrentes
+
+
+class Command(BaseCommand):
+    help = "Gera as próximas ocorrências dos modelos de atividade recorrente."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dias", type=int, default=HORIZONTE_DIAS, help="Horizonte, em dias, a partir de hoje.")
+
+    def handle(self, *args, **options):
+        total = materializar_recorrentes(horizonte_dias=options["dias"])
+        self.stdout.write(self.style.SUCCESS(f"{total} atividades recorrentes criadas."))
@@ -1,11 +1,206 @@
 from django.utils import timezone
-from django.db import models
+from django.db import models, transaction
+from django.db.models import BooleanField, Case, Count, Q, Value, When
 from django.contrib.auth.models import User
 
+from apps.core.campos import TextoBuscaField
+from django.utils.dateparse import parse_datetime
+
+# Maior id aceito pelo banco (int64); acima disso a consulta estoura
+MAXIMO_ID = 2**63 - 1
+
+
+class Trabalhador(models.Model):
+    nome = models.CharField(max_length=100, unique=True)
+    usuario = models.OneToOneField(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='trabalhador')
+    ativo = models.BooleanField(default=True)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'trabalhadores'
+        ordering = ['nome']
+        verbose_name = 'Trabalhador'
+        verbose_name_plural = 'Trabalhadores'
+
+    def __str__(self):
+        return self.nome
+
+def _filtro_atraso(agora):
+    # Mesma regra de Atividade.esta_atrasada()
+    return Q(data_limite__lt=agora) & ~Q(status__in=['concluida', 'cancelada'])
+
 class AtividadeManager(models.Manager):
     def ativas(self):
         return self.filter(data_exclusao__isnull=True)
 
+    def do_trabalhador(self, trabalhador, agora=None):
+        # Percorre o índice (trabalhador, data_exclusao, data_criacao) sem ordenar
+        return self.com_atraso(agora).filter(
+            data_exclusao__isnull=True, trabalhador=trabalhador
+        ).order_by('-data_criacao')
+
+    def com_atraso(self, agora=None):
+        """Anota ``atrasada`` calculado no SQL."""
+        agora = agora or timezone.now()
+        return self.get_queryset().annotate(
+            atrasada=Case(
+                When(_filtro_atraso(agora), then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            )
+        )
+
+    def resumo_do_trabalhador(self, trabalhador, agora=None):
+        """Total, atrasadas e contagem por status numa única consulta agregada."""
+        agora = agora or timezone.now()
+        contagens = {
+            status: Count('pk', filter=Q(status=status))
+            for status, _ in Atividade.STATUS_CHOICES
+        }
+        resumo = self.ativas().filter(trabalhador=trabalhador).aggregate(
+            total=Count('pk'),
+            atrasadas=Count('pk', filter=_filtro_atraso(agora)),
+            **contagens,
+        )
+        return {
+            'total': resumo.pop('total'),
+            'atrasadas': resumo.pop('atrasadas'),
+            'por_status': [
+                (status, rotulo, resumo[status])
+                for status, rotulo in Atividade.STATUS_CHOICES
+                if resumo[status]
+            ],
+        }
+
+    def aplicar_status_offline(self, trabalhador, alteracoes):
+        """
+        Aplica alterações de status feitas offline pelo trabalhador (dicts com
+        ``chave``, ``atividade``, ``status``, ``registrado_em`` e, opcional,
+        ``descricao_problema``) em uma única transação.
+
+        Chaves já processadas voltam como ``duplicada`` sem reaplicar. Se a
+        atividade foi modificada no servidor depois de ``registrado_em``, a
+        alteração é recusada como ``conflito`` (vale a versão do servidor).
+        Retorna uma lista de resultados na ordem recebida.
+        """
+        status_validos = dict(Atividade.STATUS_CHOICES)
+        agora = timezone.now()
+        resultados = [None] * len(alteracoes)
+        validas = []
+
+        for indice, alteracao in enumerate(alteracoes):
+            try:
+                chave = str(alteracao['chave'])[:64]
+                atividade_id = int(alteracao['atividade'])
+                novo_status = alteracao['status']
+                registrado_em = parse_datetime(str(alteracao['registrado_em']))
+            except (KeyError, TypeError, ValueError, OverflowError):
+                registrado_em = chave = None
+            if not chave or registrado_em is None or not 0 < atividade_id <= MAXIMO_ID:
+                resultados[indice] = {'indice': indice, 'resultado': 'erro',
+                                      'erro': 'Informe chave, atividade, status e registrado_em válidos.'}
+                continue
+            if not isinstance(novo_status, str) or novo_status not in status_validos:
+                resultados[indice] = {'chave': chave, 'resultado': 'erro', 'erro': f'Status inválido: {novo_status}.'}
+                continue
+            if timezone.is_naive(registrado_em):
+                registrado_em = timezone.make_aware(registrado_em)
+            # Relógio do aparelho adiantado não pode vencer alterações futuras do servidor
+            registrado_em = min(registrado_em, agora)
+            validas.append((registrado_em, indice, chave, atividade_id, novo_status,
+                            str(alteracao.get('descricao_problema') or '')[:500]))
+
+        with transaction.atomic():
+            processadas = dict(
+                ChaveIdempotencia.objects.filter(
+                    trabalhador=trabalhador, chave__in=[v[2] for v in validas]
+                ).values_list('chave', 'resultado')
+            )
+            atividades = self.select_for_update().in_bulk({v[3] for v in validas})
+            alteradas = {}
+            logs = []
+            novas_chaves = []
+
+            # Em ordem de registro: a última alteração de cada atividade prevalece
+            for registrado_em, indice, chave, atividade_id, novo_status, problema in sorted(validas):
+                atividade = atividades.get(atividade_id)
+                if chave in processadas:
+                    resultado = {'resultado': 'duplicada', 'original': processadas[chave]}
+                elif atividade is None or not atividade.pode_ser_editada_por(trabalhador.nome):
+                    resultado = {'resultado': 'erro', 'erro': 'Atividade não encontrada ou sem permissão.'}
+                elif atividade.data_modificacao > registrado_em and atividade_id not in alteradas:
+                    resultado = {'resultado': 'conflito'}
+                else:
+                    logs.append(LogAtividade(
+                        atividade=atividade,
+                        log_atividade=(f"Status alterado de {atividade.status} para {novo_status} "
+                                       f"por {trabalhador.nome} (offline, registrado em {registrado_em:%d/%m/%Y %H:%M})"),
+                        usuario_responsavel=trabalhador.nome[:20],
+                        tipo_acao="ATUALIZACAO_STATUS",
+                        data_criacao=registrado_em,
+                    ))
+                    atividade.status = novo_status
+                    atividade.data_modificacao = agora
+                    if novo_status == 'com_problemas' and problema:
+                        atividade.descricao_problema = problema
+                    alteradas[atividade_id] = atividade
+                    resultado = {'resultado': 'aplicada'}
+
+                if chave not in processadas:
+                    processadas[chave] = resultado['resultado']
+                    novas_chaves.append(ChaveIdempotencia(
+                        chave=chave, trabalhador=trabalhador,
+                        atividade_id=atividade_id if atividade else None,
+                        resultado=resultado['resultado'],
+                    ))
+                if atividade is not None:
+                    resultado['status'] = atividade.status
+                resultados[indice] = {'chave': chave, **resultado}
+
+            self.bulk_update(alteradas.values(), ['status', 'descricao_problema', 'data_modificacao'])
+            LogAtividade.objects.bulk_create(logs)
+            ChaveIdempotencia.objects.bulk_create(novas_chaves)
+
+        return resultados
+
+    def marcar_atrasadas(self, agora=None, tamanho_lote=500):
+        """
+        Marca como 'atrasada' toda atividade ativa com prazo vencido, com um
+        UPDATE por lote e os logs gravados via bulk_create. Executado pelo
+        scheduler; retorna quantas atividades foram marcadas.
+        """
+        agora = agora or timezone.now()
+        vencidas = self.ativas().filter(data_limite__lt=agora).exclude(status__in=Atividade.STATUS_FINAIS)
+        pendentes = list(vencidas.values_list('id_atividade', flat=True))
+
+        marcadas = 0
+        for inicio in range(0, len(pendentes), tamanho_lote):
+            with transaction.atomic():
+                # Relê o lote travado: ignora as que mudaram desde a leitura e
+                # registra o status de agora, não o da listagem
+                lote = dict(
+                    vencidas.select_for_update()
+                    .filter(pk__in=pendentes[inicio:inicio + tamanho_lote])
+                    .values_list('id_atividade', 'status')
+                )
+                if not lote:
+                    continue
+                marcadas += self.filter(pk__in=lote).update(
+                    status='atrasada',
+                    data_modificacao=agora,
+                    usuario_responsavel='sistema',
+                )
+                LogAtividade.objects.bulk_create([
+                    LogAtividade(
+                        atividade_id=pk,
+                        log_atividade=f"Status alterado de {status} para atrasada por sistema",
+                        usuario_responsavel='sistema',
+                        tipo_acao="ATUALIZACAO_STATUS",
+                    )
+                    for pk, status in lote.items()
+                ])
+        return marcadas
+
 class Atividade(models.Model):
     PRIORIDADE_CHOICES = [
         ('ALTA', 'Alta'),
@@ -21,7 +216,11 @@ class Atividade(models.Model):
         ('cancelada', 'Cancelada'),
         ('pendente', 'Pendente'),
         ('com_problemas', 'Com Problemas'),
+        ('atrasada', 'Atrasada'),
     ]
+
+    # Status que não voltam a ficar atrasados
+    STATUS_FINAIS = ['concluida', 'cancelada', 'atrasada']
     
     TIPO_ATIVIDADE_CHOICES = [
         ('AGRICOLA', 'Agrícola'),
@@ -36,6 +235,8 @@ class Atividade(models.Model):
     prioridade = models.CharField(max_length=5, choices=PRIORIDADE_CHOICES, default='MEDIA')
     status = models.CharField(max_length=15, choices=STATUS_CHOICES, default='registrada')
     id_trabalhador = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='atividades')
+    trabalhador = models.ForeignKey(Trabalhador, on_delete=models.SET_NULL, blank=True, null=True, related_name='atividades')
+    # Cópia do nome do trabalhador atribuído, usada nas telas e no link de status
     nome_trabalhador = models.CharField(max_length=100, blank=True, null=True)
     data_criacao = models.DateTimeField(auto_now_add=True)
     data_modificacao = models.DateTimeField(auto_now=True)
@@ -43,15 +244,23 @@ class Atividade(models.Model):
     data_limite = models.DateTimeField(blank=True, null=True)
     descricao_problema = models.TextField(max_length=500, blank=True, null=True)
     usuario_responsavel = models.CharField(max_length=20, default='sistema')
+    modelo = models.ForeignKey('ModeloAtividade', on_delete=models.SET_NULL, blank=True, null=True, related_name='ocorrencias')
+    ocorrencia = models.DateTimeField(blank=True, null=True)
 
     objects = AtividadeManager()
-    
+
+    def atribuir(self, trabalhador):
+        self.trabalhador = trabalhador
+        self.nome_trabalhador = trabalhador.nome if trabalhador else None
+
     def excluir_logicamente(self, usuario):
         self.data_exclusao = timezone.now()
         self.usuario_responsavel = usuario
         self.save()
 
-        LogAtividade.objects.create(
+        from .auditoria import registrar_log
+
+        registrar_log(
             atividade=self,
             log_atividade=f"Atividade excluída logicamente por {usuario}",
             usuario_responsavel=usuario,
@@ -62,6 +271,13 @@ class Atividade(models.Model):
 
     class Meta:
         db_table = 'atividades'
+        indexes = [
+            models.Index(fields=['trabalhador', 'data_exclusao', 'data_criacao'], name='atividade_trab_excl_cria_idx'),
+            models.Index(fields=['trabalhador', 'data_modificacao', 'id_atividade'], name='atividade_trab_mod_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['modelo', 'ocorrencia'], name='atividade_modelo_ocorrencia_unica'),
+        ]
 
     def __str__(self):
         return self.titulo
@@ -72,12 +288,44 @@ class Atividade(models.Model):
             return timezone.now() > self.data_limite
         return False
 
+class ModeloAtividade(models.Model):
+    """Atividade de rotina; o scheduler gera as ocorrências (recorrencia.py)."""
+    FREQUENCIA_CHOICES = [
+        ('DIARIA', 'Diária'),
+        ('SEMANAL', 'Semanal'),
+        ('MENSAL', 'Mensal'),
+    ]
+
+    titulo = models.CharField(max_length=100)
+    descricao = models.TextField(max_length=500, blank=True, null=True)
+    tipo_atividade = models.CharField(max_length=12, choices=Atividade.TIPO_ATIVIDADE_CHOICES, default='GERAL')
+    prioridade = models.CharField(max_length=5, choices=Atividade.PRIORIDADE_CHOICES, default='MEDIA')
+    trabalhador = models.ForeignKey(Trabalhador, on_delete=models.SET_NULL, blank=True, null=True, related_name='modelos')
+    frequencia = models.CharField(max_length=7, choices=FREQUENCIA_CHOICES, default='DIARIA')
+    intervalo = models.PositiveIntegerField(default=1, help_text='A cada quantos dias/semanas/meses')
+    inicio = models.DateTimeField(help_text='Primeira ocorrência')
+    fim = models.DateTimeField(blank=True, null=True)
+    prazo_horas = models.PositiveIntegerField(default=24, help_text='Prazo de cada ocorrência após o início')
+    ativo = models.BooleanField(default=True)
+    # Última ocorrência já materializada
+    gerado_ate = models.DateTimeField(blank=True, null=True, editable=False)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'atividades_modelos'
+        verbose_name = 'Modelo de Atividade'
+        verbose_name_plural = 'Modelos de Atividades'
+
+    def __str__(self):
+        return f"{self.titulo} ({self.get_frequencia_display()})"
+
 class LogAtividade(models.Model):
     id_log = models.AutoField(primary_key=True)
     atividade = models.ForeignKey('Atividade', on_delete=models.CASCADE, related_name='logs')
     log_atividade = models.TextField(max_length=500)
     usuario_responsavel = models.CharField(max_length=20)
-    data_criacao = models.DateTimeField(auto_now_add=True)
+    # Horário do evento, não da gravação (os logs são gravados em lote)
+    data_criacao = models.DateTimeField(default=timezone.now, editable=False)
     tipo_acao = models.CharField(max_length=50)
 
     class Meta:
@@ -86,4 +334,89 @@ class LogAtividade(models.Model):
         verbose_name_plural = 'Logs de Atividades'
 
     def __str__(self):
-        return f"Log {self.id_log} - {self.atividade.titulo}"
\ No newline at end of file
+        return f"Log {self.id_log} - {self.atividade.titulo}"
+
+class ArquivoLog(models.Model):
+    """Arquivo mensal (NDJSON compactado) com os logs retirados da tabela."""
+    mes = models.DateField(unique=True, help_text='Primeiro dia do mês arquivado')
+    caminho = models.CharField(max_length=255)
+    quantidade = models.PositiveIntegerField(default=0)
+    data_modificacao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'log_atividades_arquivos'
+        ordering = ['-mes']
+        verbose_name = 'Arquivo de Logs'
+        verbose_name_plural = 'Arquivos de Logs'
+
+    def __str__(self):
+        return f"Logs de {self.mes:%m/%Y}"
+
+class IndiceArquivoLog(models.Model):
+    """Quais arquivos têm logs de cada atividade (uma linha por atividade e mês)."""
+    arquivo = models.ForeignKey(ArquivoLog, on_delete=models.CASCADE, related_name='indices')
+    # Sem FK: o índice continua valendo mesmo que a atividade seja apagada
+    atividade_id = models.IntegerField()
+    quantidade = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = 'log_atividades_arquivos_indice'
+        constraints = [
+            models.UniqueConstraint(fields=['atividade_id', 'arquivo'], name='indice_arquivo_log_unico'),
+        ]
+
+class AtividadeBusca(models.Model):
+    """Índice FTS5 de título, descrição e problema (criado por ``busca.py``)."""
+    atividade = models.OneToOneField(
+        Atividade, primary_key=True, db_column='rowid', related_name='busca', on_delete=models.DO_NOTHING,
+    )
+    documento = TextoBuscaField(db_column='atividade_busca')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'atividade_busca'
+
+class LogAtividadeBusca(models.Model):
+    """Índice FTS5 do texto dos logs (criado por ``busca.py``)."""
+    log = models.OneToOneField(
+        LogAtividade, primary_key=True, db_column='rowid', related_name='busca', on_delete=models.DO_NOTHING,
+    )
+    documento = TextoBuscaField(db_column='log_atividade_busca')
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'log_atividade_busca'
+
+class ChaveIdempotencia(models.Model):
+    """Chaves das alterações offline já processadas (reenvios não reaplicam)."""
+    chave = models.CharField(max_length=64)
+    trabalhador = models.ForeignKey(Trabalhador, on_delete=models.CASCADE, related_name='chaves_idempotencia')
+    atividade = models.ForeignKey(Atividade, on_delete=models.CASCADE, blank=True, null=True)
+    resultado = models.CharField(max_length=20)
+    data_criacao = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'atividades_chaves_idempotencia'
+        constraints = [
+            models.UniqueConstraint(fields=['trabalhador', 'chave'], name='chave_idempotencia_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.trabalhador} - {self.chave}"
+
+class ReatribuicaoAtividade(models.Model):
+    """Trabalhador de quem a atividade foi tirada: ela segue no delta dele como excluída (ver ``sincronizacao.py``)."""
+    atividade = models.ForeignKey(Atividade, on_delete=models.CASCADE, related_name='reatribuicoes')
+    trabalhador = models.ForeignKey(Trabalhador, on_delete=models.CASCADE, related_name='reatribuicoes')
+    data_reatribuicao = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'atividades_reatribuicoes'
+        constraints = [
+            models.UniqueConstraint(fields=['trabalhador', 'atividade'], name='reatribuicao_unica'),
+        ]
+
+    def __str__(self):
+        return f"{self.atividade_id} saiu de {self.trabalhador}"
@@ -0,0 +1,120 @@
+"""
+Materialização das atividades recorrentes.
+
+Cada ``ModeloAtividade`` descreve uma rotina (ordenha diária, vacinação
+semanal, vistoria mensal de cercas...). O job do scheduler gera as
+ocorrências até ``HORIZONTE_DIAS`` à frente: todas as atividades novas de
+todos os modelos saem num único ``bulk_create``, e a restrição única
+``(modelo, ocorrencia)`` impede duplicatas se o job rodar de novo.
+
+Ocorrências que já passaram não são geradas: um modelo novo com ``inicio``
+no passado, ou reativado depois de um tempo parado, começa em ``agora``.
+"""
+import calendar
+import datetime
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Atividade, LogAtividade, ModeloAtividade
+
+HORIZONTE_DIAS = 14
+TAMANHO_LOTE = 1000
+
+
+def _somar_meses(data, meses):
+    mes = data.month - 1 + meses
+    ano = data.year + mes // 12
+    mes = mes % 12 + 1
+    # 31/01 + 1 mês = último dia de fevereiro
+    dia = min(data.day, calendar.monthrange(ano, mes)[1])
+    return data.replace(year=ano, month=mes, day=dia)
+
+
+def ocorrencia(modelo, n):
+    """Data da n-ésima ocorrência (0 = ``inicio``), sempre a partir do início para não acumular desvio."""
+    passo = n * modelo.intervalo
+    if modelo.frequencia == 'MENSAL':
+        return _somar_meses(modelo.inicio, passo)
+    dias = passo * 7 if modelo.frequencia == 'SEMANAL' else passo
+    return modelo.inicio + datetime.timedelta(days=dias)
+
+
+def ocorrencias(modelo, apos, ate, desde=None):
+    """
+    Ocorrências do modelo em ``(apos, ate]`` e a partir de ``desde``
+    (``apos`` e ``desde`` None = desde o início).
+    """
+    n = 0
+    referencia = max((d for d in (apos, desde) if d is not None), default=None)
+    if referencia is not None and modelo.frequencia != 'MENSAL':
+        # Pula direto para perto da referência em vez de percorrer todo o histórico
+        passo_dias = modelo.intervalo * (7 if modelo.frequencia == 'SEMANAL' else 1)
+        n = max(0, (referencia - modelo.inicio).days // passo_dias)
+    limite = min(ate, modelo.fim) if modelo.fim else ate
+
+    while True:
+        data = ocorrencia(modelo, n)
+        if data > limite:
+            return
+        if (apos is None or data > apos) and (desde is None or data >= desde):
+            yield data
+        n += 1
+
+
+def materializar_recorrentes(agora=None, horizonte_dias=HORIZONTE_DIAS):
+    """Gera as ocorrências pendentes de todos os modelos ativos; retorna quantas criou."""
+    agora = agora or timezone.now()
+    ate = agora + datetime.timedelta(days=horizonte_dias)
+    modelos = list(
+        ModeloAtividade.objects.filter(ativo=True, inicio__lte=ate)
+        .exclude(gerado_ate__gte=ate)
+        .select_related('trabalhador')
+    )
+    if not modelos:
+        return 0
+
+    novas = []
+    for modelo in modelos:
+        for data in ocorrencias(modelo, modelo.gerado_ate, ate, desde=agora):
+            atividade = Atividade(
+                titulo=modelo.titulo,
+                descricao=modelo.descricao,
+                tipo_atividade=modelo.tipo_atividade,
+                prioridade=modelo.prioridade,
+                data_limite=data + datetime.timedelta(hours=modelo.prazo_horas),
+                usuario_responsavel='sistema',
+                modelo=modelo,
+                ocorrencia=data,
+            )
+            atividade.atribuir(modelo.trabalhador)
+            novas.append(atividade)
+
+    with transaction.atomic():
+        Atividade.objects.bulk_create(novas, batch_size=TAMANHO_LOTE, ignore_conflicts=True)
+
+        criadas = []
+        if novas:
+            # ignore_conflicts não devolve as chaves: busca as recém-criadas (ainda sem log)
+            criadas = list(
+                Atividade.objects.filter(
+                    modelo_id__in={a.modelo_id for a in novas},
+                    ocorrencia__gte=min(a.ocorrencia for a in novas),
+                    logs__isnull=True,
+                ).values_list('pk', 'titulo')
+            )
+            LogAtividade.objects.bulk_create([
+                LogAtividade(
+                    atividade_id=pk,
+                    log_atividade=f"Atividade criada - Título: {titulo} (recorrente)",
+                    usuario_responsavel='sistema',
+                    tipo_acao="CRIACAO",
+                )
+                for pk, titulo in criadas
+            ], batch_size=TAMANHO_LOTE)
+
+        for modelo in modelos:
+            modelo.gerado_ate = ate
+        ModeloAtividade.objects.bulk_update(modelos, ['gerado_ate'])
+
+    return len(criadas)
@@ -0,0 +1,114 @@
+"""
+Sincronização incremental das atividades de um trabalhador.
+
+O cliente guarda o ``cursor`` recebido e o reenvia em ``?desde=``; a
+resposta traz apenas as atividades com ``data_modificacao`` posterior,
+em ordem de ``(data_modificacao, id_atividade)`` (índice
+``atividade_trab_mod_idx``). Atividades excluídas logicamente voltam
+só com o id, em ``excluidas``, para o cliente removê-las. O mesmo vale
+para as atividades passadas a outro trabalhador: os sinais de
+``Atividade`` registram o trabalhador anterior em
+``ReatribuicaoAtividade`` e o delta dele passa a trazê-las em
+``excluidas``.
+
+O ETag é calculado a partir de um agregado sobre as mesmas linhas
+(quantidade e maior modificação), então um 304 não carrega nenhuma
+atividade.
+"""
+import datetime
+import hashlib
+
+from django.core import signing
+from django.db.models import Count, Max, Q
+
+from .models import Atividade, ReatribuicaoAtividade
+
+SALT_CURSOR = "atividades.sincronizacao"
+LIMITE_SINCRONIZACAO = 500
+
+CAMPOS = (
+    "id_atividade", "titulo", "descricao", "tipo_atividade", "prioridade", "status",
+    "data_limite", "data_modificacao", "descricao_problema", "data_exclusao",
+)
+
+
+def codificar_cursor(data_modificacao, atividade_id):
+    return signing.dumps([data_modificacao.isoformat(), atividade_id], salt=SALT_CURSOR)
+
+
+def decodificar_cursor(token):
+    """Retorna (data_modificacao, id) ou None se o token for inválido."""
+    try:
+        data, atividade_id = signing.loads(token, salt=SALT_CURSOR)
+        return datetime.datetime.fromisoformat(data), int(atividade_id)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+
+
+def alteracoes(trabalhador, cursor=None):
+    """Atividades (inclusive excluídas e reatribuídas) do trabalhador alteradas após o cursor."""
+    if cursor:
+        data, atividade_id = cursor
+        reatribuidas = ReatribuicaoAtividade.objects.filter(trabalhador=trabalhador).values("atividade_id")
+        queryset = Atividade.objects.filter(Q(trabalhador=trabalhador) | Q(pk__in=reatribuidas)).filter(
+            Q(data_modificacao__gt=data) | Q(data_modificacao=data, id_atividade__gt=atividade_id)
+        )
+    else:
+        # Primeira carga: o cliente não tem nada para remover
+        queryset = Atividade.objects.filter(trabalhador=trabalhador, data_exclusao__isnull=True)
+    return queryset.order_by("data_modificacao", "id_atividade")
+
+
+def etag(trabalhador, cursor=None):
+    resumo = alteracoes(trabalhador, cursor).order_by().aggregate(
+        quantidade=Count("pk"), ultima=Max("data_modificacao"), maior_id=Max("pk"),
+    )
+    partes = [trabalhador.pk, cursor, resumo["quantidade"], resumo["ultima"], resumo["maior_id"], LIMITE_SINCRONIZACAO]
+    return hashlib.sha256(repr(partes).encode()).hexdigest()
+
+
+def pagina_alteracoes(trabalhador, cursor=None, limite=None):
+    """
+    Monta o corpo da resposta: ``atividades`` alteradas, ids ``excluidas``,
+    o ``cursor`` para a próxima chamada e ``mais`` se houver outra página.
+    """
+    limite = limite or LIMITE_SINCRONIZACAO
+    linhas = list(alteracoes(trabalhador, cursor).values(*CAMPOS, "trabalhador_id")[:limite + 1])
+    mais = len(linhas) > limite
+    linhas = linhas[:limite]
+
+    atividades, excluidas = [], []
+    for linha in linhas:
+        excluida = linha.pop("data_exclusao")
+        # Passada a outro trabalhador: para este cliente, é uma exclusão
+        reatribuida = linha.pop("trabalhador_id") != trabalhador.pk
+        if excluida or reatribuida:
+            excluidas.append(linha["id_atividade"])
+        else:
+            atividades.append(linha)
+
+    if linhas:
+        proximo = codificar_cursor(linhas[-1]["data_modificacao"], linhas[-1]["id_atividade"])
+    else:
+        proximo = codificar_cursor(*cursor) if cursor else None
+
+    return {"atividades": atividades, "excluidas": excluidas, "cursor": proximo, "mais": mais}
+
+
+def atividade_alterando(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Guarda o trabalhador antigo para registrar a reatribuição depois do save."""
+    instance._trabalhador_anterior = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    if update_fields is not None and "trabalhador" not in update_fields:
+        return
+    instance._trabalhador_anterior = (
+        Atividade.objects.filter(pk=instance.pk).values_list("trabalhador_id", flat=True).first()
+    )
+
+
+def atividade_salva(sender, instance, raw=False, **kwargs):
+    anterior = getattr(instance, "_trabalhador_anterior", None)
+    if raw or anterior is None or anterior == instance.trabalhador_id:
+        return
+    ReatribuicaoAtividade.objects.update_or_create(atividade=instance, trabalhador_id=anterior)
@@ -0,0 +1,33 @@
+from .arquivamento import arquivar_logs
+from .models import Atividade
+from .recorrencia import materializar_recorrentes
+
+# Os erros sobem para o executor de jobs (apps.monitoramento.jobs), que
+# registra a execução e tenta de novo.
+
+
+def marcar_atividades_atrasadas():
+    """
+    Marca as atividades com prazo vencido como 'atrasada'.
+    Executado pelo scheduler a cada 15 minutos.
+    """
+    total = Atividade.objects.marcar_atrasadas()
+    return f"{total} atividades marcadas como atrasadas"
+
+
+def gerar_atividades_recorrentes():
+    """
+    Gera as próximas ocorrências dos modelos de atividade recorrente.
+    Executado pelo scheduler a cada hora.
+    """
+    total = materializar_recorrentes()
+    return f"{total} atividades criadas"
+
+
+def arquivar_logs_antigos():
+    """
+    Move os logs além do prazo de retenção para os arquivos mensais.
+    Executado pelo scheduler uma vez por dia.
+    """
+    total = arquivar_logs()
+    return f"{total} logs arquivados"
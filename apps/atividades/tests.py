@@ -1,9 +1,24 @@
-from django.test import TestCase, Client
+import gzip
+import tempfile
+import time
+from io import StringIO
+from unittest.mock import patch
+
+from django.db import OperationalError, transaction
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
 
-from .models import Atividade, LogAtividade
+from .auditoria import EscritorAuditoria
+from .models import ArquivoLog, Atividade, ChaveIdempotencia, LogAtividade, ModeloAtividade, Trabalhador
+from .analise import gerar_relatorio
+from .arquivamento import arquivar_logs, logs_arquivados
+from .busca import buscar_atividades
+from .recorrencia import materializar_recorrentes, ocorrencia
+from .sincronizacao import decodificar_cursor
 
 
 # ---------------------------------------------------------
@@ -25,6 +40,53 @@ class AtividadeManagerTest(TestCase):
         self.assertNotIn(excluida, qs)
 
 
+    def test_marcar_atrasadas(self):
+        agora = timezone.now()
+        vencida = Atividade.objects.create(titulo="Vencida", data_limite=agora - timezone.timedelta(hours=1))
+        no_prazo = Atividade.objects.create(titulo="No prazo", data_limite=agora + timezone.timedelta(hours=1))
+        concluida = Atividade.objects.create(
+            titulo="Concluída", status="concluida", data_limite=agora - timezone.timedelta(days=1)
+        )
+        excluida = Atividade.objects.create(
+            titulo="Excluída", data_limite=agora - timezone.timedelta(days=1), data_exclusao=agora
+        )
+
+        self.assertEqual(Atividade.objects.marcar_atrasadas(), 1)
+        # Segunda execução não encontra nada novo
+        self.assertEqual(Atividade.objects.marcar_atrasadas(), 0)
+
+        vencida.refresh_from_db()
+        self.assertEqual(vencida.status, "atrasada")
+        for atividade in (no_prazo, concluida, excluida):
+            status = atividade.status
+            atividade.refresh_from_db()
+            self.assertEqual(atividade.status, status)
+
+        log = LogAtividade.objects.get()
+        self.assertEqual(log.atividade, vencida)
+        self.assertEqual(log.tipo_acao, "ATUALIZACAO_STATUS")
+        self.assertIn("de registrada para atrasada", log.log_atividade)
+
+    def test_marcar_atrasadas_ignora_alteradas_por_outro_processo(self):
+        """Só as atividades realmente atualizadas ganham log"""
+        agora = timezone.now()
+        vencida = Atividade.objects.create(titulo="Vencida", data_limite=agora - timezone.timedelta(hours=1))
+        concluida_depois = Atividade.objects.create(titulo="Outra", data_limite=agora - timezone.timedelta(hours=1))
+        atomic = transaction.atomic
+
+        def outro_processo_conclui(*args, **kwargs):
+            # Entre a listagem e o lote, outro processo conclui a atividade
+            Atividade.objects.filter(pk=concluida_depois.pk).update(status="concluida")
+            return atomic(*args, **kwargs)
+
+        with patch("apps.atividades.models.transaction.atomic", side_effect=outro_processo_conclui):
+            self.assertEqual(Atividade.objects.marcar_atrasadas(agora=agora), 1)
+
+        self.assertEqual(list(LogAtividade.objects.values_list("atividade_id", flat=True)), [vencida.pk])
+        concluida_depois.refresh_from_db()
+        self.assertEqual(concluida_depois.status, "concluida")
+
+
 # ---------------------------------------------------------
 # TESTES DO MODEL
 # ---------------------------------------------------------
@@ -92,6 +154,17 @@ class AtividadeViewsTest(TestCase):
         self.assertEqual(Atividade.objects.count(), 2)
         self.assertEqual(LogAtividade.objects.count(), 1)
 
+    # -----------------------------
+    def test_criar_atividade_campos_obrigatorios(self):
+        Trabalhador.objects.create(nome="Daniel B")
+        resp = self.client.post(reverse("criar_atividade"), {"titulo": "", "tipo_atividade": "GERAL"})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTemplateUsed(resp, "admin_criar_atividade.html")
+        self.assertContains(resp, "Título, tipo e prioridade são obrigatórios.")
+        self.assertEqual([t.nome for t in resp.context["trabalhadores"]], ["Daniel B"])
+        self.assertEqual(Atividade.objects.count(), 1)
+
     # -----------------------------
     def test_editar_atividade_post(self):
         resp = self.client.post(
@@ -138,3 +211,612 @@ class AtividadeViewsTest(TestCase):
         self.assertEqual(atividade.status, "com_problemas")
         self.assertEqual(atividade.descricao_problema, "Pane")
         self.assertEqual(LogAtividade.objects.count(), 1)
+
+
+    # -----------------------------
+    def test_criar_atividade_atribui_trabalhador(self):
+        trabalhador = Trabalhador.objects.create(nome="Daniel B")
+        self.client.post(reverse("criar_atividade"), {
+            "titulo": "Com responsável",
+            "tipo_atividade": "GERAL",
+            "prioridade": "MEDIA",
+            "trabalhador": trabalhador.pk,
+        })
+
+        atividade = Atividade.objects.get(titulo="Com responsável")
+        self.assertEqual(atividade.trabalhador, trabalhador)
+        self.assertEqual(atividade.nome_trabalhador, "Daniel B")
+
+    # -----------------------------
+    def test_area_trabalhador_filtra_pelo_vinculo(self):
+        daniel = Trabalhador.objects.create(nome="Daniel B")
+        outro = Trabalhador.objects.create(nome="Danilo V")
+        minha = Atividade.objects.create(titulo="Minha")
+        minha.atribuir(daniel)
+        minha.save()
+        Atividade.objects.create(titulo="Outra", trabalhador=outro, nome_trabalhador="Danilo V")
+        Atividade.objects.create(titulo="Excluída", trabalhador=daniel, data_exclusao=timezone.now())
+
+        resp = self.client.post(reverse("area_trabalhador"), {"trabalhador": daniel.pk})
+
+        self.assertEqual(resp.context["trabalhador_selecionado"], daniel)
+        self.assertEqual(list(resp.context["atividades"]), [minha])
+        self.assertContains(resp, f'value="{outro.pk}"')
+
+    # -----------------------------
+    def test_area_trabalhador_resumo_e_paginacao(self):
+        daniel = Trabalhador.objects.create(nome="Daniel B")
+        ontem = timezone.now() - timezone.timedelta(days=1)
+        for i in range(25):
+            Atividade.objects.create(titulo=f"T{i}", trabalhador=daniel, data_limite=ontem if i < 3 else None)
+        Atividade.objects.create(titulo="Feita", trabalhador=daniel, status="concluida", data_limite=ontem)
+
+        with self.assertNumQueries(4):  # trabalhador, resumo, página e lista do select
+            resp = self.client.get(reverse("area_trabalhador"), {"trabalhador": daniel.pk, "page": 2})
+
+        resumo = resp.context["resumo"]
+        self.assertEqual(resumo["total"], 26)
+        self.assertEqual(resumo["atrasadas"], 3)
+        self.assertIn(("concluida", "Concluída", 1), resumo["por_status"])
+        self.assertIn(("registrada", "Registrada", 25), resumo["por_status"])
+
+        page_obj = resp.context["page_obj"]
+        self.assertEqual(page_obj.paginator.num_pages, 2)
+        self.assertEqual(len(page_obj.object_list), 6)
+        # Flag calculada no SQL coincide com esta_atrasada()
+        for atividade in page_obj.object_list:
+            self.assertEqual(atividade.atrasada, atividade.esta_atrasada())
+
+    # -----------------------------
+    def test_cadastrar_trabalhadores_vincula_atividades(self):
+        call_command("cadastrar_trabalhadores", stdout=StringIO())
+
+        self.atividade.refresh_from_db()
+        self.assertEqual(self.atividade.trabalhador.nome, "Gustavo")
+        self.assertTrue(Trabalhador.objects.filter(nome="Tayane S").exists())
+
+        # Reexecutar não duplica
+        total = Trabalhador.objects.count()
+        call_command("cadastrar_trabalhadores", stdout=StringIO())
+        self.assertEqual(Trabalhador.objects.count(), total)
+
+
+
+# ---------------------------------------------------------
+# TESTES DA SINCRONIZAÇÃO INCREMENTAL
+# ---------------------------------------------------------
+class SincronizacaoAtividadesTest(TestCase):
+    def setUp(self):
+        self.trabalhador = Trabalhador.objects.create(nome="Daniel B")
+        self.url = reverse("sincronizar_atividades", args=[self.trabalhador.pk])
+        self.a1 = Atividade.objects.create(titulo="A1", trabalhador=self.trabalhador)
+        self.a2 = Atividade.objects.create(titulo="A2", trabalhador=self.trabalhador)
+        Atividade.objects.create(titulo="De outro")
+
+    def test_carga_inicial_e_delta(self):
+        resp = self.client.get(self.url)
+        dados = resp.json()
+        self.assertEqual([a["titulo"] for a in dados["atividades"]], ["A1", "A2"])
+        self.assertEqual(dados["excluidas"], [])
+        self.assertFalse(dados["mais"])
+        self.assertTrue(resp.has_header("ETag"))
+
+        self.a1.status = "em_andamento"
+        self.a1.save()
+        self.a2.excluir_logicamente("admin")
+
+        delta = self.client.get(self.url, {"desde": dados["cursor"]}).json()
+        self.assertEqual([a["id_atividade"] for a in delta["atividades"]], [self.a1.pk])
+        self.assertEqual(delta["atividades"][0]["status"], "em_andamento")
+        self.assertEqual(delta["excluidas"], [self.a2.pk])
+
+        # Nada mudou desde o último cursor: lista vazia e o mesmo cursor
+        vazio = self.client.get(self.url, {"desde": delta["cursor"]}).json()
+        self.assertEqual(vazio["atividades"], [])
+        # O token assinado muda com o horário da assinatura; a posição não
+        self.assertEqual(decodificar_cursor(vazio["cursor"]), decodificar_cursor(delta["cursor"]))
+
+    def test_reatribuicao_aparece_no_delta_do_trabalhador_anterior(self):
+        """A atividade passada a outro trabalhador volta como excluída para o anterior"""
+        cursor = self.client.get(self.url).json()["cursor"]
+        outro = Trabalhador.objects.create(nome="Tayane S")
+        self.a1.atribuir(outro)
+        self.a1.save()
+
+        delta = self.client.get(self.url, {"desde": cursor}).json()
+        self.assertEqual(delta["atividades"], [])
+        self.assertEqual(delta["excluidas"], [self.a1.pk])
+        url_outro = reverse("sincronizar_atividades", args=[outro.pk])
+        self.assertEqual([a["titulo"] for a in self.client.get(url_outro).json()["atividades"]], ["A1"])
+
+        # Depois do cursor novo nada se repete; de volta ao trabalhador, reaparece normalmente
+        vazio = self.client.get(self.url, {"desde": delta["cursor"]}).json()
+        self.assertEqual((vazio["atividades"], vazio["excluidas"]), ([], []))
+        self.a1.atribuir(self.trabalhador)
+        self.a1.save()
+        delta = self.client.get(self.url, {"desde": vazio["cursor"]}).json()
+        self.assertEqual([a["id_atividade"] for a in delta["atividades"]], [self.a1.pk])
+        self.assertEqual(delta["excluidas"], [])
+
+    def test_etag_responde_304(self):
+        resp = self.client.get(self.url)
+        etag = resp["ETag"]
+
+        with self.assertNumQueries(2):  # trabalhador e agregado do ETag
+            resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 304)
+
+        self.a1.titulo = "Alterada"
+        self.a1.save()
+        resp = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertNotEqual(resp["ETag"], etag)
+
+    def test_paginacao_por_cursor(self):
+        with patch("apps.atividades.sincronizacao.LIMITE_SINCRONIZACAO", 1):
+            primeira = self.client.get(self.url).json()
+            self.assertTrue(primeira["mais"])
+            segunda = self.client.get(self.url, {"desde": primeira["cursor"]}).json()
+        self.assertEqual([a["titulo"] for a in primeira["atividades"] + segunda["atividades"]], ["A1", "A2"])
+
+    def test_cursor_invalido_e_trabalhador_inexistente(self):
+        self.assertEqual(self.client.get(self.url, {"desde": "x"}).status_code, 400)
+        url = reverse("sincronizar_atividades", args=[9999])
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+
+
+# ---------------------------------------------------------
+# TESTES DO ENVIO OFFLINE DE STATUS
+# ---------------------------------------------------------
+class StatusOfflineTest(TestCase):
+    def setUp(self):
+        self.trabalhador = Trabalhador.objects.create(nome="Daniel B")
+        self.url = reverse("sincronizar_status_offline", args=[self.trabalhador.pk])
+        self.a1 = Atividade.objects.create(titulo="A1")
+        self.a1.atribuir(self.trabalhador)
+        self.a1.save()
+        self.a2 = Atividade.objects.create(titulo="A2")
+        self.a2.atribuir(self.trabalhador)
+        self.a2.save()
+        self.alheia = Atividade.objects.create(titulo="Alheia", nome_trabalhador="Outro")
+
+    def enviar(self, alteracoes):
+        return self.client.post(self.url, {"alteracoes": alteracoes}, content_type="application/json")
+
+    def alteracao(self, chave, atividade, status, minutos=1):
+        registrado_em = timezone.now() + timezone.timedelta(minutes=minutos)
+        return {"chave": chave, "atividade": atividade.pk, "status": status,
+                "registrado_em": registrado_em.isoformat()}
+
+    def test_aplica_lote_e_ignora_reenvio(self):
+        lote = [
+            self.alteracao("k1", self.a1, "em_andamento", 1),
+            self.alteracao("k2", self.a1, "concluida", 2),
+            self.alteracao("k3", self.a2, "com_problemas", 1) | {"descricao_problema": "Chuva"},
+        ]
+        resultados = self.enviar(lote).json()["resultados"]
+
+        self.assertEqual([r["resultado"] for r in resultados], ["aplicada"] * 3)
+        self.a1.refresh_from_db()
+        self.a2.refresh_from_db()
+        self.assertEqual(self.a1.status, "concluida")
+        self.assertEqual(self.a2.descricao_problema, "Chuva")
+        self.assertEqual(LogAtividade.objects.count(), 3)
+
+        # Reenvio após perda da resposta: nada é reaplicado
+        resultados = self.enviar(lote).json()["resultados"]
+        self.assertEqual([r["resultado"] for r in resultados], ["duplicada"] * 3)
+        self.assertEqual(LogAtividade.objects.count(), 3)
+        self.assertEqual(ChaveIdempotencia.objects.count(), 3)
+
+    def test_conflito_com_alteracao_no_servidor(self):
+        antiga = self.alteracao("k1", self.a1, "concluida", minutos=-10)
+        self.a1.status = "cancelada"
+        self.a1.save()
+
+        resultado = self.enviar([antiga]).json()["resultados"][0]
+        self.assertEqual(resultado["resultado"], "conflito")
+        self.assertEqual(resultado["status"], "cancelada")
+
+    def test_permissao_e_validacao(self):
+        resultados = self.enviar([
+            self.alteracao("k1", self.alheia, "concluida"),
+            self.alteracao("k2", self.a1, "inexistente"),
+            {"chave": "k3", "atividade": self.a1.pk},
+        ]).json()["resultados"]
+
+        self.assertEqual([r["resultado"] for r in resultados], ["erro"] * 3)
+
+        # Status que não é texto (lista, objeto) é recusado, não vira 500
+        resultados = self.enviar([
+            self.alteracao("k4", self.a1, ["concluida"]),
+            self.alteracao("k5", self.a1, {"status": "concluida"}),
+        ]).json()["resultados"]
+        self.assertEqual([r["resultado"] for r in resultados], ["erro"] * 2)
+
+        # Id fora do int64 é recusado antes de chegar ao banco
+        resultados = self.enviar([
+            self.alteracao("k6", self.a1, "concluida") | {"atividade": 10**30},
+            self.alteracao("k7", self.a1, "concluida") | {"atividade": -1},
+        ]).json()["resultados"]
+        self.assertEqual([r["resultado"] for r in resultados], ["erro"] * 2)
+
+        self.a1.refresh_from_db()
+        self.assertEqual(self.a1.status, "registrada")
+        self.alheia.refresh_from_db()
+        self.assertEqual(self.alheia.status, "registrada")
+        self.assertEqual(self.enviar([]).status_code, 400)
+
+
+
+# ---------------------------------------------------------
+# TESTES DAS ATIVIDADES RECORRENTES
+# ---------------------------------------------------------
+class AtividadesRecorrentesTest(TestCase):
+    def setUp(self):
+        self.agora = timezone.now().replace(microsecond=0)
+        self.trabalhador = Trabalhador.objects.create(nome="Daniel B")
+
+    def test_gera_horizonte_sem_duplicar(self):
+        ordenha = ModeloAtividade.objects.create(
+            titulo="Ordenha", frequencia="DIARIA", inicio=self.agora, trabalhador=self.trabalhador,
+        )
+        vacina = ModeloAtividade.objects.create(
+            titulo="Vacinação", frequencia="SEMANAL", inicio=self.agora, prazo_horas=48,
+        )
+
+        self.assertEqual(materializar_recorrentes(agora=self.agora, horizonte_dias=14), 15 + 3)
+        self.assertEqual(ordenha.ocorrencias.count(), 15)
+        self.assertEqual(LogAtividade.objects.filter(tipo_acao="CRIACAO").count(), 18)
+
+        primeira = vacina.ocorrencias.order_by("ocorrencia").first()
+        self.assertEqual(primeira.data_limite, self.agora + timezone.timedelta(hours=48))
+        self.assertEqual(ordenha.ocorrencias.first().nome_trabalhador, "Daniel B")
+
+        # Mesma janela: nada novo; janela maior: só as ocorrências seguintes
+        self.assertEqual(materializar_recorrentes(agora=self.agora, horizonte_dias=14), 0)
+        ModeloAtividade.objects.update(gerado_ate=None)
+        self.assertEqual(materializar_recorrentes(agora=self.agora, horizonte_dias=14), 0)
+        self.assertEqual(materializar_recorrentes(agora=self.agora + timezone.timedelta(days=1), horizonte_dias=14), 1)
+        self.assertEqual(ordenha.ocorrencias.count(), 16)
+
+    def test_respeita_fim_e_inativos(self):
+        ModeloAtividade.objects.create(
+            titulo="Cerca", frequencia="DIARIA", inicio=self.agora, fim=self.agora + timezone.timedelta(days=2),
+        )
+        ModeloAtividade.objects.create(titulo="Pausado", inicio=self.agora, ativo=False)
+
+        self.assertEqual(materializar_recorrentes(agora=self.agora, horizonte_dias=14), 3)
+
+    def test_inicio_no_passado_nao_gera_ocorrencias_vencidas(self):
+        """Primeira execução (ou modelo reativado) começa em agora, não no início do modelo"""
+        modelo = ModeloAtividade.objects.create(
+            titulo="Ordenha", frequencia="DIARIA", inicio=self.agora - timezone.timedelta(days=365, hours=1),
+        )
+        self.assertEqual(materializar_recorrentes(agora=self.agora, horizonte_dias=14), 14)
+        self.assertGreaterEqual(modelo.ocorrencias.order_by("ocorrencia").first().ocorrencia, self.agora)
+
+        # Job parado por 30 dias além do horizonte: não recupera as ocorrências do período
+        depois = self.agora + timezone.timedelta(days=44)
+        self.assertEqual(materializar_recorrentes(agora=depois, horizonte_dias=14), 14)
+        self.assertEqual(modelo.ocorrencias.filter(ocorrencia__lt=depois).count(), 14)
+
+    def test_ocorrencia_mensal_no_fim_do_mes(self):
+        inicio = timezone.make_aware(timezone.datetime(2025, 1, 31, 8, 0))
+        modelo = ModeloAtividade(frequencia="MENSAL", intervalo=1, inicio=inicio)
+        self.assertEqual(ocorrencia(modelo, 1).date(), timezone.datetime(2025, 2, 28).date())
+        self.assertEqual(ocorrencia(modelo, 2).date(), timezone.datetime(2025, 3, 31).date())
+
+
+
+# ---------------------------------------------------------
+# TESTES DA BUSCA TEXTUAL
+# ---------------------------------------------------------
+class BuscaAtividadesTest(TestCase):
+    def setUp(self):
+        self.irrigacao = Atividade.objects.create(titulo="Irrigação do pomar", descricao="Verificar aspersores")
+        self.cerca = Atividade.objects.create(titulo="Consertar cerca", descricao_problema="Arame rompido no piquete")
+        self.ordenha = Atividade.objects.create(titulo="Ordenha")
+        LogAtividade.objects.create(
+            atividade=self.ordenha, log_atividade="Bomba de vácuo com defeito", usuario_responsavel="joao",
+            tipo_acao="EDICAO",
+        )
+
+    def buscar(self, termo):
+        return buscar_atividades(Atividade.objects.all(), termo)
+
+    def test_busca_por_prefixo_sem_acento(self):
+        self.assertEqual(list(self.buscar("irrigacao")), [self.irrigacao])
+        self.assertEqual(list(self.buscar("asper")), [self.irrigacao])
+        self.assertEqual(list(self.buscar("arame piq")), [self.cerca])
+
+    def test_busca_nos_logs_vem_depois_do_texto(self):
+        Atividade.objects.create(titulo="Trocar bomba do poço")
+        titulos = [a.titulo for a in self.buscar("bomba")]
+        self.assertEqual(titulos, ["Trocar bomba do poço", "Ordenha"])
+
+    def test_indice_acompanha_edicao(self):
+        self.cerca.titulo = "Pintar galpão"
+        self.cerca.save()
+        self.assertEqual(list(self.buscar("galpao")), [self.cerca])
+        self.assertEqual(list(self.buscar("consertar")), [])
+
+    def test_busca_na_listagem_e_no_admin(self):
+        resp = self.client.get(reverse("listar_atividades_admin"), {"q": "ordenha"})
+        self.assertEqual(list(resp.context["atividades"]), [self.ordenha])
+
+        self.client.force_login(User.objects.create_superuser("admin", "a@a.com", "senha"))
+        resp = self.client.get(reverse("admin:atividades_atividade_changelist"), {"q": "aspersores"})
+        self.assertEqual(list(resp.context["cl"].result_list), [self.irrigacao])
+        resp = self.client.get(reverse("admin:atividades_logatividade_changelist"), {"q": "vacuo"})
+        self.assertEqual(resp.context["cl"].result_count, 1)
+
+    def test_admin_ordena_busca_por_relevancia(self):
+        """Com termo de busca o admin ordena por relevância, salvo se o usuário escolher uma coluna"""
+        direto = LogAtividade.objects.create(
+            atividade=self.ordenha, log_atividade="Irrigação revisada", usuario_responsavel="joao", tipo_acao="EDICAO",
+        )
+        pela_atividade = LogAtividade.objects.create(
+            atividade=self.irrigacao, log_atividade="Verificada", usuario_responsavel="joao", tipo_acao="EDICAO",
+        )
+        self.client.force_login(User.objects.create_superuser("admin", "a@a.com", "senha"))
+
+        url = reverse("admin:atividades_atividade_changelist")
+        resp = self.client.get(url, {"q": "irrigacao"})
+        self.assertEqual(list(resp.context["cl"].result_list), [self.irrigacao, self.ordenha])
+        resp = self.client.get(url, {"q": "irrigacao", "o": "-1"})  # título, decrescente
+        self.assertEqual(list(resp.context["cl"].result_list), [self.ordenha, self.irrigacao])
+
+        resp = self.client.get(reverse("admin:atividades_logatividade_changelist"), {"q": "irrigacao"})
+        self.assertEqual(list(resp.context["cl"].result_list), [direto, pela_atividade])
+
+    def test_admin_busca_por_nome_do_trabalhador(self):
+        """A busca do admin também encontra atividades pelo nome do trabalhador"""
+        gustavo = Trabalhador.objects.create(nome="Gustavo C.")
+        self.ordenha.atribuir(gustavo)
+        self.ordenha.save()
+        avulsa = Atividade.objects.create(titulo="Cerca", nome_trabalhador="Gustavo Lima")
+        self.client.force_login(User.objects.create_superuser("admin", "a@a.com", "senha"))
+
+        url = reverse("admin:atividades_atividade_changelist")
+        resp = self.client.get(url, {"q": "Gustavo"})
+        self.assertEqual(set(resp.context["cl"].result_list), {self.ordenha, avulsa})
+        resp = self.client.get(url, {"q": "Gustavo C."})
+        self.assertEqual(list(resp.context["cl"].result_list), [self.ordenha])
+
+
+
+# ---------------------------------------------------------
+# TESTES DOS INDICADORES DE SLA
+# ---------------------------------------------------------
+class RelatorioSlaTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.agora = timezone.now()
+        self.inicio = self.agora - timezone.timedelta(hours=10)
+
+    def criar(self, trabalhador, transicoes, prazo_horas=None, **campos):
+        atividade = Atividade.objects.create(
+            titulo="A", nome_trabalhador=trabalhador,
+            data_limite=self.inicio + timezone.timedelta(hours=prazo_horas) if prazo_horas else None,
+            **campos,
+        )
+        Atividade.objects.filter(pk=atividade.pk).update(data_criacao=self.inicio)
+        anterior = "registrada"
+        for horas, novo in transicoes:
+            LogAtividade.objects.create(
+                atividade=atividade, usuario_responsavel=trabalhador or "sistema", tipo_acao="ATUALIZACAO_STATUS",
+                log_atividade=f"Status alterado de {anterior} para {novo} por {trabalhador}",
+                data_criacao=self.inicio + timezone.timedelta(hours=horas),
+            )
+            anterior = novo
+        return atividade
+
+    def test_tempo_em_status_lead_time_e_atraso(self):
+        # Registrada 2h, em andamento 4h, concluída com 6h (prazo de 5h: atrasou)
+        self.criar("Ana", [(2, "em_andamento"), (6, "concluida")], prazo_horas=5,
+                   status="concluida", tipo_atividade="AGRICOLA")
+        # Registrada 1h e em andamento desde então (9h até agora), prazo ainda não venceu
+        self.criar("Ana", [(1, "em_andamento")], prazo_horas=20, status="em_andamento")
+        # Sem transições: registrada há 10h
+        self.criar("Beto", [], prioridade="ALTA")
+
+        relatorio = gerar_relatorio(agora=self.agora)
+
+        self.assertEqual(relatorio["total_atividades"], 3)
+        ana, beto = relatorio["trabalhador"]
+        self.assertEqual((ana["chave"], ana["atividades"], ana["concluidas"]), ("Ana", 2, 1))
+        self.assertEqual(ana["lead_time_horas"], 6.0)
+        self.assertEqual(ana["taxa_atraso"], 0.5)
+        self.assertEqual(ana["horas_em_status"], {"registrada": 1.5, "em_andamento": 6.5})
+        self.assertEqual(beto["horas_em_status"], {"registrada": 10.0})
+        self.assertIsNone(beto["lead_time_horas"])
+        self.assertIsNone(beto["taxa_atraso"])
+
+        self.assertEqual([g["chave"] for g in relatorio["prioridade"]], ["ALTA", "MEDIA"])
+
+    def test_concluida_sem_log_de_status(self):
+        """Concluída pelo formulário ou pelo admin (sem log de status): conclusão na data_modificacao"""
+        atividade = self.criar("Ana", [], prazo_horas=5, status="concluida")
+        Atividade.objects.filter(pk=atividade.pk).update(data_modificacao=self.inicio + timezone.timedelta(hours=3))
+
+        ana, = gerar_relatorio(agora=self.agora)["trabalhador"]
+
+        self.assertEqual((ana["concluidas"], ana["lead_time_horas"], ana["taxa_atraso"]), (1, 3.0, 0.0))
+
+    @override_settings(RETENCAO_LOGS_DIAS=30)
+    def test_relatorio_cobre_a_janela_de_retencao(self):
+        self.criar("Ana", [(1, "em_andamento")])
+        antiga = self.criar("Beto", [(1, "em_andamento")])
+        Atividade.objects.filter(pk=antiga.pk).update(data_criacao=self.agora - timezone.timedelta(days=31))
+
+        relatorio = gerar_relatorio(agora=self.agora)
+
+        self.assertEqual(relatorio["total_atividades"], 1)
+        self.assertEqual([g["chave"] for g in relatorio["trabalhador"]], ["Ana"])
+
+    def test_relatorio_em_cache_por_dia(self):
+        self.criar("Ana", [])
+        resp = self.client.get(reverse("relatorio_sla_atividades"))
+        self.assertEqual(resp.json()["total_atividades"], 1)
+
+        self.criar("Ana", [])
+        with self.assertNumQueries(0):
+            resp = self.client.get(reverse("relatorio_sla_atividades"))
+        self.assertEqual(resp.json()["total_atividades"], 1)
+
+
+
+# ---------------------------------------------------------
+# TESTES DO ARQUIVAMENTO DE LOGS
+# ---------------------------------------------------------
+class ArquivamentoLogsTest(TestCase):
+    def setUp(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        configuracao = override_settings(ARQUIVO_LOGS_DIR=pasta.name)
+        configuracao.enable()
+        self.addCleanup(configuracao.disable)
+
+        cache.clear()
+        self.agora = timezone.now()
+        self.atividade = Atividade.objects.create(titulo="Antiga")
+        self.outra = Atividade.objects.create(titulo="Outra")
+
+    def log(self, atividade, dias, texto):
+        return LogAtividade.objects.create(
+            atividade=atividade, log_atividade=texto, usuario_responsavel="joao", tipo_acao="EDICAO",
+            data_criacao=self.agora - timezone.timedelta(days=dias),
+        )
+
+    def test_arquiva_por_mes_e_le_de_volta(self):
+        self.log(self.atividade, 400, "muito antigo")
+        self.log(self.atividade, 370, "antigo")
+        self.log(self.outra, 380, "de outra atividade")
+        recente = self.log(self.atividade, 10, "recente")
+
+        self.assertEqual(arquivar_logs(dias=365, agora=self.agora), 3)
+        self.assertEqual(list(LogAtividade.objects.all()), [recente])
+        self.assertEqual(sum(ArquivoLog.objects.values_list("quantidade", flat=True)), 3)
+
+        arquivados = logs_arquivados(self.atividade.pk)
+        self.assertEqual([l["log_atividade"] for l in arquivados], ["antigo", "muito antigo"])
+
+        # Nova execução acrescenta ao arquivo do mês sem perder o que já estava lá
+        self.log(self.atividade, 370, "mais um")
+        self.assertEqual(arquivar_logs(dias=365, agora=self.agora), 1)
+        self.assertEqual(len(logs_arquivados(self.atividade.pk)), 3)
+        self.assertEqual(arquivar_logs(dias=365, agora=self.agora), 0)
+
+    def test_leitura_em_cache_e_limitada(self):
+        """Cada arquivo é lido uma vez até mudar; com limite, os meses mais antigos nem são abertos"""
+        self.log(self.atividade, 400, "muito antigo")
+        self.log(self.atividade, 370, "antigo")
+        arquivar_logs(dias=365, agora=self.agora)
+
+        self.assertEqual([l["log_atividade"] for l in logs_arquivados(self.atividade.pk, limite=1)], ["antigo"])
+        with patch("apps.atividades.arquivamento.gzip.open", wraps=gzip.open) as abrir:
+            self.assertEqual(len(logs_arquivados(self.atividade.pk)), 2)
+        self.assertEqual(abrir.call_count, 1)  # só o mês ainda não lido
+
+        # O arquivo recebeu um novo lote: lido de novo
+        self.log(self.atividade, 370, "mais um")
+        arquivar_logs(dias=365, agora=self.agora)
+        self.assertEqual(len(logs_arquivados(self.atividade.pk)), 3)
+
+    def test_admin_exibe_logs_arquivados(self):
+        self.log(self.atividade, 400, "vacinação registrada")
+        arquivar_logs(dias=365, agora=self.agora)
+
+        self.client.force_login(User.objects.create_superuser("admin", "a@a.com", "senha"))
+        resp = self.client.get(reverse("admin:atividades_atividade_change", args=[self.atividade.pk]))
+        self.assertContains(resp, "vacinação registrada")
+
+
+# ---------------------------------------------------------
+# TESTES DA AUDITORIA (WRITE-BEHIND)
+# ---------------------------------------------------------
+class EscritorAuditoriaTest(TransactionTestCase):
+    def setUp(self):
+        self.atividade = Atividade.objects.create(titulo="Auditada")
+
+    def registrar(self, escritor, n=1):
+        for i in range(n):
+            escritor.registrar(self.atividade, f"log {i}", "teste", "EDICAO")
+
+    def test_grava_em_lote_ao_atingir_tamanho(self):
+        escritor = EscritorAuditoria(tamanho_lote=3, intervalo=60)
+        self.registrar(escritor, 2)
+        self.assertEqual(escritor.pendentes(), 2)
+        self.assertEqual(LogAtividade.objects.count(), 0)
+
+        self.registrar(escritor)
+        for _ in range(100):
+            if LogAtividade.objects.count() == 3:
+                break
+            time.sleep(0.02)
+        self.assertEqual(LogAtividade.objects.count(), 3)
+        escritor.encerrar()
+
+    def test_grava_apos_intervalo(self):
+        escritor = EscritorAuditoria(tamanho_lote=100, intervalo=0.05)
+        self.registrar(escritor)
+        for _ in range(100):
+            if LogAtividade.objects.exists():
+                break
+            time.sleep(0.02)
+        self.assertEqual(LogAtividade.objects.count(), 1)
+        escritor.encerrar()
+
+    def test_transacao_desfeita_descarta_log(self):
+        escritor = EscritorAuditoria(tamanho_lote=100, intervalo=60)
+        try:
+            with transaction.atomic():
+                self.registrar(escritor)
+                self.assertEqual(escritor.pendentes(), 0)
+                raise RuntimeError
+        except RuntimeError:
+            pass
+        self.assertEqual(escritor.pendentes(), 0)
+
+        with transaction.atomic():
+            self.registrar(escritor)
+        self.assertEqual(escritor.pendentes(), 1)
+        escritor.encerrar()
+
+    def test_encerrar_drena_fila(self):
+        escritor = EscritorAuditoria(tamanho_lote=100, intervalo=60)
+        self.registrar(escritor, 5)
+        registrado_em = timezone.now()
+
+        self.assertEqual(escritor.encerrar(), 0)  # a thread drenou antes de sair
+        self.assertEqual(escritor.pendentes(), 0)
+        self.assertEqual(LogAtividade.objects.count(), 5)
+        # O horário gravado é o do evento, não o da gravação
+        self.assertTrue(all(l.data_criacao <= registrado_em for l in LogAtividade.objects.all()))
+
+    def test_log_invalido_nao_trava_a_fila(self):
+        """Um log que viola restrição é descartado; os demais do lote são gravados"""
+        escritor = EscritorAuditoria(tamanho_lote=100, intervalo=60)
+        apagada = Atividade.objects.create(titulo="Apagada")
+        self.registrar(escritor, 2)
+        escritor.registrar(apagada, "log órfão", "teste", "EDICAO")
+        self.registrar(escritor)
+        # Apagada por outro processo antes da descarga
+        Atividade.objects.filter(pk=apagada.pk).delete()
+
+        self.assertEqual(escritor.descarregar(), 3)
+        self.assertEqual(escritor.pendentes(), 0)
+        self.assertEqual(LogAtividade.objects.filter(atividade=self.atividade).count(), 3)
+        self.assertFalse(LogAtividade.objects.exclude(atividade=self.atividade).exists())
+        escritor.encerrar()
+
+    def test_banco_indisponivel_devolve_o_lote(self):
+        escritor = EscritorAuditoria(tamanho_lote=100, intervalo=60)
+        self.registrar(escritor, 2)
+        with patch.object(LogAtividade.objects, "bulk_create", side_effect=OperationalError("database is locked")):
+            self.assertEqual(escritor.descarregar(), 0)
+        self.assertEqual(escritor.pendentes(), 2)
+        escritor.encerrar()
+        self.assertEqual(LogAtividade.objects.count(), 2)
@@ -8,5 +8,8 @@ urlpatterns = [
     path('admin/editar/<int:id_atividade>/', views.editar_atividade, name='editar_atividade'),
     path('admin/excluir/<int:id_atividade>/', views.excluir_atividade_logica, name='excluir_atividade'),
     path('trabalhador/', views.area_trabalhador, name='area_trabalhador'),
+    path('api/trabalhador/<int:trabalhador_id>/atividades/', views.sincronizar_atividades, name='sincronizar_atividades'),
+    path('api/trabalhador/<int:trabalhador_id>/status/', views.sincronizar_status_offline, name='sincronizar_status_offline'),
+    path('api/relatorios/sla/', views.relatorio_sla_atividades, name='relatorio_sla_atividades'),
     path('atualizar-status/<int:id_atividade>/<str:nome_trabalhador>/', views.atualizar_status_atividade, name='atualizar_status'),
 ]
\ No newline at end of file
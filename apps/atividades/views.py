@@ -1,21 +1,33 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
+import json
+
+from django.db import IntegrityError
+from django.http import JsonResponse
 from django.utils import timezone
-import datetime
-from .models import Atividade, LogAtividade
+from django.views.decorators.http import condition, require_GET, require_POST
+
+from apps.core.paginacao import ContagemPaginator
+
+from . import sincronizacao
+from .analise import relatorio_sla
+from .auditoria import registrar_log
+from .busca import buscar_atividades
+from .models import Atividade, Trabalhador
+
+ATIVIDADES_POR_PAGINA_TRABALHADOR = 20
+
+def _buscar_trabalhador(trabalhador_id):
+    """Trabalhador ativo pelo id enviado no formulário (ou None)."""
+    if not trabalhador_id or not str(trabalhador_id).isdigit():
+        return None
+    return Trabalhador.objects.filter(pk=trabalhador_id, ativo=True).first()
 
 def menuativ(request): 
     return render(request, "admin_listar_atividades.html")
 
 def criarAtividade(request):
-    trabalhadores_teste = [
-        {'id': 1, 'nome': 'Gustavo C.'},
-        {'id': 2, 'nome': 'Daniel B'},
-        {'id': 3, 'nome': 'Danilo V'},
-        {'id': 4, 'nome': 'João G'},
-        {'id': 5, 'nome': 'Tayane S'},
-        {'id': 6, 'nome': 'Admin Sistema'}
-    ]
+    trabalhadores = Trabalhador.objects.filter(ativo=True)
     
     if request.method == 'POST':
         try:
@@ -28,7 +40,7 @@ def criarAtividade(request):
             
             if not titulo or not tipo_atividade or not prioridade:
                 messages.error(request, 'Título, tipo e prioridade são obrigatórios.')
-                return render(request, 'criacao_atividade_placeholder.html', {'trabalhadores': trabalhadores_teste})
+                return render(request, 'admin_criar_atividade.html', {'trabalhadores': trabalhadores})
             
             atividade = Atividade(
                 titulo=titulo,
@@ -39,14 +51,13 @@ def criarAtividade(request):
                 data_limite=data_limite if data_limite else None
             )
             
-            if trabalhador_id:
-                trabalhador_selecionado = next((t for t in trabalhadores_teste if str(t['id']) == trabalhador_id), None)
-                if trabalhador_selecionado:
-                    atividade.nome_trabalhador = trabalhador_selecionado['nome']
+            trabalhador = _buscar_trabalhador(trabalhador_id)
+            if trabalhador:
+                atividade.atribuir(trabalhador)
             
             atividade.save()
             
-            LogAtividade.objects.create(
+            registrar_log(
                 atividade=atividade,
                 log_atividade=f"Atividade criada - Título: {titulo}",
                 usuario_responsavel='usuario_teste',
@@ -59,28 +70,13 @@ def criarAtividade(request):
         except Exception as e:
             messages.error(request, f'Erro ao criar atividade: {str(e)}')
     
-    return render(request, 'admin_criar_atividade.html', {'trabalhadores': trabalhadores_teste})
+    return render(request, 'admin_criar_atividade.html', {'trabalhadores': trabalhadores})
 
 def listar_atividades(request):
+    # Somente leitura: as atividades vencidas são marcadas como 'atrasada'
+    # pelo job do scheduler (Atividade.objects.marcar_atrasadas)
     atividades = Atividade.objects.filter(data_exclusao__isnull=True)
 
-    # hoje como datetime para evitar erro
-    hoje = timezone.now()
-
-    # Marca automaticamente atividades atrasadas
-    for a in atividades:
-        if a.data_limite:
-            data_limite_dt = a.data_limite
-
-            # Se data_limite for date, converte para datetime
-            if isinstance(data_limite_dt, datetime.date) and not isinstance(data_limite_dt, datetime.datetime):
-                data_limite_dt = datetime.datetime.combine(data_limite_dt, datetime.time.min, tzinfo=timezone.get_current_timezone())
-
-            # Agora a comparação é SEMPRE datetime vs datetime
-            if data_limite_dt < hoje and a.status not in ["concluida", "atrasada"]:
-                a.status = "atrasada"
-                a.save()
-
     # FILTROS
     tipo = request.GET.get("tipo")
     prioridade = request.GET.get("prioridade")
@@ -119,9 +115,14 @@ def listar_atividades_admin(request):
     if filtro_excluidas:
         atividades = Atividade.objects.filter(data_exclusao__isnull=False).order_by('-data_exclusao')
     
+    busca = request.GET.get('q', '').strip()
+    if busca:
+        atividades = buscar_atividades(atividades, busca)
+    
     context = {
         'atividades': atividades,
-        'filtro_excluidas': filtro_excluidas
+        'filtro_excluidas': filtro_excluidas,
+        'busca': busca,
     }
     return render(request, 'admin_listar_atividades.html', context)
 
@@ -132,14 +133,7 @@ def editar_atividade(request, id_atividade):
         messages.error(request, 'Não é possível editar uma atividade excluída.')
         return redirect('listar_atividades_admin')
     
-    trabalhadores_hardcoded = [
-        {'id': 1, 'nome': 'Gustavo C.'},
-        {'id': 2, 'nome': 'Daniel B'},
-        {'id': 3, 'nome': 'Danilo V'},
-        {'id': 4, 'nome': 'João G'},
-        {'id': 5, 'nome': 'Tayane S'},
-        {'id': 6, 'nome': 'Admin Sistema'}
-    ]
+    trabalhadores = Trabalhador.objects.filter(ativo=True)
     
     if request.method == 'POST':
         try:
@@ -156,7 +150,7 @@ def editar_atividade(request, id_atividade):
                 messages.error(request, 'Título, tipo, prioridade e status são obrigatórios.')
                 return render(request, 'admin_editar_atividade.html', {
                     'atividade': atividade,
-                    'trabalhadores': trabalhadores_hardcoded
+                    'trabalhadores': trabalhadores
                 })
             
             dados_antigos = f"Título: {atividade.titulo}, Tipo: {atividade.tipo_atividade}, Prioridade: {atividade.prioridade}, Status: {atividade.status}"
@@ -171,15 +165,15 @@ def editar_atividade(request, id_atividade):
             atividade.usuario_responsavel = 'admin_edicao'
             
             if trabalhador_id:
-                trabalhador_selecionado = next((t for t in trabalhadores_hardcoded if str(t['id']) == trabalhador_id), None)
-                if trabalhador_selecionado:
-                    atividade.nome_trabalhador = trabalhador_selecionado['nome']
+                trabalhador = _buscar_trabalhador(trabalhador_id)
+                if trabalhador:
+                    atividade.atribuir(trabalhador)
             else:
-                atividade.nome_trabalhador = None
+                atividade.atribuir(None)
             
             atividade.save()
             
-            LogAtividade.objects.create(
+            registrar_log(
                 atividade=atividade,
                 log_atividade=f"Atividade editada. Dados antigos: {dados_antigos}",
                 usuario_responsavel='admin_edicao',
@@ -194,7 +188,7 @@ def editar_atividade(request, id_atividade):
     
     return render(request, 'admin_editar_atividade.html', {
         'atividade': atividade,
-        'trabalhadores': trabalhadores_hardcoded
+        'trabalhadores': trabalhadores
     })
 
 def excluir_atividade_logica(request, id_atividade):
@@ -210,7 +204,7 @@ def excluir_atividade_logica(request, id_atividade):
             atividade.usuario_responsavel = 'admin_sistema'
             atividade.save()
             
-            LogAtividade.objects.create(
+            registrar_log(
                 atividade=atividade,
                 log_atividade=f"Atividade excluída por admin_sistema",
                 usuario_responsavel='admin_sistema',
@@ -226,37 +220,32 @@ def excluir_atividade_logica(request, id_atividade):
 
 def area_trabalhador(request):
     """Página única da área do trabalhador com seleção por dropdown"""
-    trabalhadores = [
-        {'id': 1, 'nome': 'Gustavo C.'},
-        {'id': 2, 'nome': 'Daniel B'},
-        {'id': 3, 'nome': 'Danilo V'},
-        {'id': 4, 'nome': 'João G'},
-        {'id': 5, 'nome': 'Tayane S'},
-    ]
+    trabalhadores = Trabalhador.objects.filter(ativo=True)
     
-    trabalhador_selecionado = None
-    atividades = []
+    # A seleção vem do formulário (POST) e a navegação entre páginas por GET
+    trabalhador_selecionado = _buscar_trabalhador(
+        request.POST.get('trabalhador') or request.GET.get('trabalhador')
+    )
+    page_obj = None
+    resumo = None
     
-    if request.method == 'POST':
-        nome_trabalhador = request.POST.get('trabalhador')
-        if nome_trabalhador:
-            atividades = Atividade.objects.filter(
-                nome_trabalhador=nome_trabalhador,
-                data_exclusao__isnull=True
-            ).order_by('-data_criacao')
-            
-            trabalhador_selecionado = next(
-                (t for t in trabalhadores if t['nome'] == nome_trabalhador), 
-                None
-            )
-    
-    total_atividades = len(atividades)
+    if trabalhador_selecionado:
+        agora = timezone.now()
+        resumo = Atividade.objects.resumo_do_trabalhador(trabalhador_selecionado, agora)
+        paginator = ContagemPaginator(
+            Atividade.objects.do_trabalhador(trabalhador_selecionado, agora),
+            ATIVIDADES_POR_PAGINA_TRABALHADOR,
+            resumo['total'],
+        )
+        page_obj = paginator.get_page(request.GET.get('page'))
     
     context = {
         'trabalhadores': trabalhadores,
         'trabalhador_selecionado': trabalhador_selecionado,
-        'atividades': atividades,
-        'total_atividades': total_atividades
+        'atividades': page_obj.object_list if page_obj else [],
+        'page_obj': page_obj,
+        'resumo': resumo,
+        'total_atividades': resumo['total'] if resumo else 0,
     }
     
     return render(request, 'area_trabalhador.html', context)
@@ -286,7 +275,7 @@ def atualizar_status_atividade(request, id_atividade, nome_trabalhador):
             
             atividade.save()
 
-            LogAtividade.objects.create(
+            registrar_log(
                 atividade=atividade,
                 log_atividade=f"Status alterado de {status_anterior} para {novo_status} por {nome_trabalhador}",
                 usuario_responsavel=nome_trabalhador,
@@ -302,4 +291,68 @@ def atualizar_status_atividade(request, id_atividade, nome_trabalhador):
     return render(request, 'funcionario_atualizar_status.html', {
         'atividade': atividade,
         'nome_trabalhador': nome_trabalhador
-    })
\ No newline at end of file
+    })
+
+def _etag_sincronizacao(request, trabalhador_id):
+    trabalhador = _buscar_trabalhador(trabalhador_id)
+    desde = request.GET.get('desde')
+    cursor = sincronizacao.decodificar_cursor(desde) if desde else None
+    if trabalhador is None or (desde and cursor is None):
+        return None
+    return sincronizacao.etag(trabalhador, cursor)
+
+@require_GET
+@condition(etag_func=_etag_sincronizacao)
+def sincronizar_atividades(request, trabalhador_id):
+    """
+    Alterações nas atividades do trabalhador desde ``?desde=<cursor>``.
+    Responde 304 quando o ETag enviado em If-None-Match ainda vale.
+    """
+    trabalhador = _buscar_trabalhador(trabalhador_id)
+    if trabalhador is None:
+        return JsonResponse({'erro': 'Trabalhador não encontrado.'}, status=404)
+
+    desde = request.GET.get('desde')
+    cursor = sincronizacao.decodificar_cursor(desde) if desde else None
+    if desde and cursor is None:
+        return JsonResponse({'erro': 'Cursor inválido.'}, status=400)
+
+    return JsonResponse(sincronizacao.pagina_alteracoes(trabalhador, cursor))
+
+MAXIMO_ALTERACOES_OFFLINE = 500
+
+@require_POST
+def sincronizar_status_offline(request, trabalhador_id):
+    """
+    Recebe as alterações de status feitas sem conexão:
+
+    {"alteracoes": [{"chave": "uuid", "atividade": 1, "status": "concluida",
+                     "registrado_em": "2025-01-01T10:00:00-03:00",
+                     "descricao_problema": ""}, ...]}
+    """
+    trabalhador = _buscar_trabalhador(trabalhador_id)
+    if trabalhador is None:
+        return JsonResponse({'erro': 'Trabalhador não encontrado.'}, status=404)
+
+    try:
+        alteracoes = json.loads(request.body)['alteracoes']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'erro': 'JSON inválido: informe alteracoes.'}, status=400)
+    if not isinstance(alteracoes, list) or not alteracoes:
+        return JsonResponse({'erro': 'alteracoes deve ser uma lista não vazia.'}, status=400)
+    if len(alteracoes) > MAXIMO_ALTERACOES_OFFLINE:
+        return JsonResponse({'erro': f'Máximo de {MAXIMO_ALTERACOES_OFFLINE} alterações por envio.'}, status=400)
+    if not all(isinstance(a, dict) for a in alteracoes):
+        return JsonResponse({'erro': 'Cada alteração deve ser um objeto JSON.'}, status=400)
+
+    try:
+        resultados = Atividade.objects.aplicar_status_offline(trabalhador, alteracoes)
+    except IntegrityError:
+        # Mesmo lote enviado em paralelo: o reenvio recebe as chaves como duplicadas
+        return JsonResponse({'erro': 'Envio concorrente das mesmas alterações; tente novamente.'}, status=409)
+    return JsonResponse({'resultados': resultados})
+
+@require_GET
+def relatorio_sla_atividades(request):
+    """Tempo em cada status, lead time e taxa de atraso por trabalhador, tipo e prioridade."""
+    return JsonResponse(relatorio_sla())
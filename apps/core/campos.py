@@ -0,0 +1,15 @@
+from django.db import models
+
+
+class TextoBuscaField(models.TextField):
+    """Coluna oculta de uma tabela FTS5; aceita o lookup ``match``."""
+
+
+@TextoBuscaField.register_lookup
+class Match(models.Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
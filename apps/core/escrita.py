@@ -0,0 +1,119 @@
+"""
+Gravação write-behind compartilhada pelos apps.
+
+Os itens vão para uma fila em memória que uma thread de fundo descarrega
+quando atinge ``tamanho_lote`` itens ou a cada ``intervalo`` segundos. No
+encerramento do processo (``atexit``) a fila é drenada.
+
+Cada app entra só com a função de gravação, que recebe o lote, trata as
+violações de restrição do seu jeito e retorna quantos itens gravou. Uma
+falha do banco (indisponível, travado) que escape dela devolve o lote
+inteiro à fila para a próxima tentativa.
+"""
+import atexit
+import functools
+import threading
+
+from django.db import DatabaseError, connection
+
+
+class EscritaEmSegundoPlano:
+    def __init__(self, gravar, tamanho_lote, intervalo, nome, maximo_fila=50_000):
+        self.gravar = gravar
+        self.tamanho_lote = tamanho_lote
+        self.intervalo = intervalo
+        self.nome = nome
+        self.maximo_fila = maximo_fila
+        self._fila = []
+        self._condicao = threading.Condition()
+        self._gravacao = threading.Lock()
+        self._thread = None
+        self._parar = False
+
+    def enfileirar(self, itens):
+        """Enfileira os itens; retorna False (nada enfileirado) se a fila estiver cheia."""
+        with self._condicao:
+            if len(self._fila) + len(itens) > self.maximo_fila:
+                return False
+            self._fila.extend(itens)
+            if len(self._fila) >= self.tamanho_lote:
+                self._condicao.notify()
+        self._iniciar()
+        return True
+
+    def _iniciar(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._condicao:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._parar = False
+            self._thread = threading.Thread(target=self._executar, name=self.nome, daemon=True)
+            self._thread.start()
+        atexit.register(self.encerrar)
+
+    def _executar(self):
+        try:
+            while True:
+                with self._condicao:
+                    self._condicao.wait_for(
+                        lambda: self._parar or len(self._fila) >= self.tamanho_lote,
+                        timeout=self.intervalo,
+                    )
+                    parar = self._parar
+                self.descarregar()
+                if parar:
+                    return
+        finally:
+            connection.close()
+
+    def pendentes(self):
+        with self._condicao:
+            return len(self._fila)
+
+    def descarregar(self):
+        """Grava tudo o que está na fila; retorna quantos itens foram gravados."""
+        with self._gravacao:
+            with self._condicao:
+                lote, self._fila = self._fila, []
+            if not lote:
+                return 0
+            try:
+                return self.gravar(lote)
+            except DatabaseError as e:
+                print(f"{self.nome}: erro ao gravar:", e)
+                self.devolver(lote)
+                return 0
+
+    def devolver(self, lote):
+        """Devolve itens à fila para a próxima tentativa, na ordem original."""
+        with self._condicao:
+            self._fila = (lote + self._fila)[-self.maximo_fila:]
+
+    def encerrar(self, timeout=10):
+        """Para a thread de fundo e drena o que restou na fila."""
+        thread = self._thread
+        if thread is not None and thread.is_alive():
+            with self._condicao:
+                self._parar = True
+                self._condicao.notify()
+            thread.join(timeout)
+        atexit.unregister(self.encerrar)
+        return self.descarregar()
+
+
+def instancia_do_processo(fabrica):
+    """Cria o objeto de ``fabrica`` uma única vez por processo, na primeira chamada."""
+    trava = threading.Lock()
+    instancia = None
+
+    @functools.wraps(fabrica)
+    def obter():
+        nonlocal instancia
+        if instancia is None:
+            with trava:
+                if instancia is None:
+                    instancia = fabrica()
+        return instancia
+
+    return obter
@@ -0,0 +1,14 @@
+from django.core.paginator import Paginator
+from django.utils.functional import cached_property
+
+
+class ContagemPaginator(Paginator):
+    """Paginator que recebe o total já calculado, evitando o COUNT por página."""
+
+    def __init__(self, object_list, per_page, total, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._total = total
+
+    @cached_property
+    def count(self):
+        return self._total
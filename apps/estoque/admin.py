@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Categoria, Item, MovimentacaoEstoque
+from .models import Categoria, Item, MovimentacaoEstoque, PrevisaoEstoque, SaldoDiario
 
 @admin.register(Categoria)
 class CategoriaAdmin(admin.ModelAdmin):
@@ -17,3 +17,18 @@ class MovimentacaoEstoqueAdmin(admin.ModelAdmin):
     list_filter = ('tipo_movimentacao', 'data_movimentacao')
     search_fields = ('item__nome',)
     readonly_fields = ('data_movimentacao',)
+
+
+@admin.register(SaldoDiario)
+class SaldoDiarioAdmin(admin.ModelAdmin):
+    list_display = ('item', 'data', 'saldo_final', 'entradas', 'saidas')
+    list_filter = ('data',)
+    search_fields = ('item__nome',)
+    date_hierarchy = 'data'
+
+
+@admin.register(PrevisaoEstoque)
+class PrevisaoEstoqueAdmin(admin.ModelAdmin):
+    list_display = ('item', 'consumo_diario', 'data_ruptura', 'quantidade_sugerida', 'calculado_em')
+    list_filter = ('data_ruptura',)
+    search_fields = ('item__nome',)
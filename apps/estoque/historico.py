@@ -0,0 +1,85 @@
+"""
+Consulta paginada do histórico de movimentações.
+
+A página é buscada por keyset em ``(data_movimentacao, id)`` (índice
+``estoque_mov_data_id_idx``): o cursor e o LIMIT vão direto na consulta,
+sem ler as movimentações das outras páginas. O acumulado por item é
+calculado de trás para frente: a primeira página parte do saldo atual de
+cada item (uma soma agrupada sobre o histórico filtrado) e desconta linha
+a linha; o saldo que sobra antes da linha mais antiga vai assinado no
+cursor, e as páginas seguintes continuam dele sem somar nada de novo.
+"""
+import datetime
+from collections import defaultdict
+
+from django.core import signing
+from django.db.models import Case, F, Q, Sum, When
+
+SALT_CURSOR = "estoque.historico"
+
+SINAL = Case(
+    When(tipo_movimentacao='entrada', then=F('quantidade_movimentada')),
+    default=-F('quantidade_movimentada'),
+)
+
+
+def codificar_cursor(movimentacao, saldos):
+    """Posição da movimentação e o saldo de cada item antes dela."""
+    return signing.dumps(
+        [movimentacao.data_movimentacao.isoformat(), movimentacao.id, {k: v for k, v in saldos.items() if v}],
+        salt=SALT_CURSOR,
+        compress=True,
+    )
+
+
+def decodificar_cursor(token):
+    """Retorna (data_movimentacao, id, saldos) ou None se o token for inválido."""
+    try:
+        data, movimentacao_id, saldos = signing.loads(token, salt=SALT_CURSOR)
+        saldos = {int(item_id): int(saldo) for item_id, saldo in saldos.items()}
+        return datetime.datetime.fromisoformat(data), int(movimentacao_id), saldos
+    except (signing.BadSignature, TypeError, ValueError, AttributeError):
+        return None
+
+
+def _antes_de(data, movimentacao_id):
+    return Q(data_movimentacao__lt=data) | Q(data_movimentacao=data, id__lt=movimentacao_id)
+
+
+def saldos_atuais(queryset):
+    """Soma (entradas - saídas) de cada item nas movimentações do queryset."""
+    return dict(
+        queryset.order_by()
+        .values('item_id')
+        .annotate(saldo=Sum(SINAL))
+        .values_list('item_id', 'saldo')
+    )
+
+
+def pagina_historico(queryset, cursor, por_pagina):
+    """
+    Retorna (movimentacoes, cursor_proximo) em ordem decrescente, cada
+    movimentação com ``saldo_acumulado`` do item até ela.
+    """
+    if cursor:
+        data, movimentacao_id, saldos = cursor
+        queryset_pagina = queryset.filter(_antes_de(data, movimentacao_id))
+    else:
+        # Só a primeira página soma o histórico; as demais herdam do cursor
+        saldos = saldos_atuais(queryset)
+        queryset_pagina = queryset
+    saldos = defaultdict(int, saldos)
+    linhas = list(
+        queryset_pagina.select_related('item__categoria')
+        .order_by('-data_movimentacao', '-id')[:por_pagina + 1]
+    )
+    mais = len(linhas) > por_pagina
+    linhas = linhas[:por_pagina]
+
+    for movimentacao in linhas:
+        movimentacao.saldo_acumulado = saldos[movimentacao.item_id]
+        quantidade = movimentacao.quantidade_movimentada
+        saldos[movimentacao.item_id] -= quantidade if movimentacao.tipo_movimentacao == 'entrada' else -quantidade
+
+    cursor_proximo = codificar_cursor(linhas[-1], saldos) if mais else None
+    return linhas, cursor_proximo
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.estoque.previsao import ALFA, JANELA_DIAS, PRAZO_REPOSICAO_DIAS, calcular_previsoes
+
+
+class Command(BaseCommand):
+    help = "Recalcula a previsão de ruptura e a reposição sugerida de todos os itens."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--janela", type=int, default=JANELA_DIAS, help="Dias de histórico de saídas.")
+        parser.add_argument("--alfa", type=float, default=ALFA, help="Peso da suavização exponencial.")
+        parser.add_argument("--prazo", type=int, default=PRAZO_REPOSICAO_DIAS, help="Prazo de reposição em dias.")
+
+    def handle(self, *args, **options):
+        try:
+            total = calcular_previsoes(janela=options["janela"], alfa=options["alfa"], prazo=options["prazo"])
+        except ValueError as e:
+            raise CommandError(str(e))
+        self.stdout.write(self.style.SUCCESS(f"Previsão calculada para {total} itens."))
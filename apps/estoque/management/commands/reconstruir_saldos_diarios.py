@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from apps.estoque.models import Item, SaldoDiario
+
+
+class Command(BaseCommand):
+    help = "Recalcula os fechamentos diários de estoque a partir das movimentações."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--item", type=int, action="append", help="Restringe a um ou mais itens (id).")
+
+    def handle(self, *args, **options):
+        itens = Item.objects.all()
+        if options["item"]:
+            itens = itens.filter(pk__in=options["item"])
+        total = SaldoDiario.reconstruir(itens)
+        self.stdout.write(self.style.SUCCESS(f"{total} fechamentos diários gravados."))
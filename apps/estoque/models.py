@@ -1,4 +1,17 @@
-from django.db import models
+import datetime
+
+from django.db import models, transaction
+from django.db.models import Case, F, Sum, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+class EstoqueInsuficiente(Exception):
+    def __init__(self, item, quantidade_atual):
+        self.item = item
+        self.quantidade_atual = quantidade_atual
+        super().__init__(f"Estoque insuficiente! Atual: {quantidade_atual}")
+
 
 class Categoria(models.Model):
     nome = models.CharField(max_length=100)
@@ -34,6 +47,245 @@ class Item(models.Model):
     def __str__(self):
         return self.nome
 
+    def saldo_em(self, data):
+        """Saldo ao fim do dia ``data``, lido dos fechamentos diários (sem replay)."""
+        fechamento = self.saldos_diarios.filter(data__lte=data).order_by('-data').first()
+        if fechamento:
+            return fechamento.saldo_final
+        # Antes do primeiro fechamento: desfaz o movimento daquele dia
+        primeiro = self.saldos_diarios.order_by('data').first()
+        if primeiro:
+            return primeiro.saldo_final - primeiro.entradas + primeiro.saidas
+        return self.quantidade_atual
+
+    def consumo_medio(self, dias=30, ate=None):
+        """Média diária de saídas nos últimos ``dias`` dias (até ``ate``, inclusive)."""
+        ate = ate or timezone.localdate()
+        total = self.saldos_diarios.filter(
+            data__gt=ate - datetime.timedelta(days=dias), data__lte=ate
+        ).aggregate(total=Sum('saidas'))['total'] or 0
+        return total / dias
+
+
+class SaldoDiario(models.Model):
+    """Fechamento diário do item: saldo ao fim do dia e totais movimentados."""
+
+    item = models.ForeignKey(Item, on_delete=models.CASCADE, related_name='saldos_diarios')
+    data = models.DateField()
+    saldo_final = models.IntegerField()
+    entradas = models.PositiveIntegerField(default=0)
+    saidas = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['item', 'data'], name='estoque_saldo_item_data_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.item_id} - {self.data}: {self.saldo_final}"
+
+    @classmethod
+    def registrar(cls, item_id, entradas, saidas, data=None):
+        """
+        Atualiza o fechamento do dia após movimentações já aplicadas ao
+        item. Deve rodar na mesma transação do UPDATE do saldo.
+        """
+        data = data or timezone.localdate()
+        saldo = Item.objects.filter(pk=item_id).values_list('quantidade_atual', flat=True).get()
+        alterados = cls.objects.filter(item_id=item_id, data=data).update(
+            saldo_final=saldo,
+            entradas=F('entradas') + entradas,
+            saidas=F('saidas') + saidas,
+        )
+        if not alterados:
+            cls.objects.create(item_id=item_id, data=data, saldo_final=saldo, entradas=entradas, saidas=saidas)
+
+    @classmethod
+    def reconstruir(cls, itens=None):
+        """
+        Recalcula os fechamentos a partir das movimentações: uma consulta
+        agrupada por (item, dia) e, para cada item, o saldo de cada dia é
+        obtido voltando a partir do saldo atual.
+        """
+        itens = Item.objects.all() if itens is None else itens
+        saldos_atuais = dict(itens.values_list('id', 'quantidade_atual'))
+        sinal_entrada = Case(When(tipo_movimentacao='entrada', then=F('quantidade_movimentada')), default=0)
+        sinal_saida = Case(When(tipo_movimentacao='saida', then=F('quantidade_movimentada')), default=0)
+        por_dia = (
+            MovimentacaoEstoque.objects
+            .filter(item_id__in=saldos_atuais)
+            .annotate(dia=TruncDate('data_movimentacao'))
+            .values('item_id', 'dia')
+            .annotate(entradas=Sum(sinal_entrada), saidas=Sum(sinal_saida))
+            .order_by('item_id', '-dia')
+        )
+
+        novos = []
+        saldo = None
+        item_anterior = None
+        for linha in por_dia.iterator(chunk_size=2000):
+            if linha['item_id'] != item_anterior:
+                item_anterior = linha['item_id']
+                saldo = saldos_atuais[item_anterior]
+            novos.append(cls(
+                item_id=item_anterior, data=linha['dia'], saldo_final=saldo,
+                entradas=linha['entradas'], saidas=linha['saidas'],
+            ))
+            saldo -= linha['entradas'] - linha['saidas']
+
+        with transaction.atomic():
+            cls.objects.filter(item_id__in=saldos_atuais).delete()
+            cls.objects.bulk_create(novos, batch_size=1000)
+        return len(novos)
+
+
+class PrevisaoEstoque(models.Model):
+    """Resultado do job de previsão (``apps.estoque.previsao``), um por item."""
+
+    item = models.OneToOneField(Item, on_delete=models.CASCADE, related_name='previsao')
+    consumo_diario = models.FloatField(default=0, verbose_name="Consumo diário (suavizado)")
+    consumo_medio = models.FloatField(default=0, verbose_name="Consumo diário (média móvel)")
+    data_ruptura = models.DateField(blank=True, null=True, verbose_name="Ruptura prevista")
+    quantidade_sugerida = models.PositiveIntegerField(default=0, verbose_name="Reposição sugerida")
+    calculado_em = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Previsão {self.item_id}: {self.data_ruptura}"
+
+
+# Maior inteiro aceito pelo banco (int64): ids e quantidades acima disso são inválidos
+MAXIMO_INTEIRO = 2**63 - 1
+
+
+def _aplicar_saldo(item_id, delta, minimo):
+    """UPDATE condicional do saldo; retorna 0 se o saldo atual for menor que ``minimo``."""
+    itens = Item.objects.filter(pk=item_id)
+    if minimo > 0:
+        itens = itens.filter(quantidade_atual__gte=minimo)
+    return itens.update(
+        quantidade_atual=F('quantidade_atual') + delta,
+        data_atualizacao=timezone.now(),
+    )
+
+
+class MovimentacaoEstoqueManager(models.Manager):
+    def registrar_lote(self, entradas, usuario_responsavel, tudo_ou_nada=True):
+        """
+        Registra várias movimentações (dicts com ``item``, ``tipo`` e
+        ``quantidade``) em uma única transação.
+
+        Os itens são carregados em uma consulta; as movimentações de cada
+        item viram um único UPDATE condicional com o saldo líquido, exigindo
+        saldo suficiente para o pior ponto da sequência. Com
+        ``tudo_ou_nada=False`` as entradas inválidas são rejeitadas e as
+        demais aplicadas. Retorna ``{"aplicadas": [...], "erros": [...],
+        "saldos": {item: quantidade_atual}}`` (saldos dos itens encontrados).
+        """
+        tipos = dict(MovimentacaoEstoque.TIPO_CHOICES)
+        erros = []
+        validas = []
+
+        for indice, entrada in enumerate(entradas):
+            try:
+                item_id = int(entrada["item"])
+                quantidade = int(entrada["quantidade"])
+                tipo = entrada["tipo"]
+            except (KeyError, TypeError, ValueError, OverflowError):
+                erros.append({"indice": indice, "erro": "Informe item, tipo e quantidade válidos."})
+                continue
+            if not 0 < item_id <= MAXIMO_INTEIRO:
+                erros.append({"indice": indice, "erro": "Item inválido."})
+            elif not isinstance(tipo, str) or tipo not in tipos:
+                erros.append({"indice": indice, "erro": f"Tipo inválido: {tipo}."})
+            elif not 0 < quantidade <= MAXIMO_INTEIRO:
+                erros.append({"indice": indice, "erro": "A quantidade deve ser maior que zero e caber no estoque."})
+            else:
+                validas.append((indice, item_id, tipo, quantidade))
+
+        itens = Item.objects.in_bulk({item_id for _, item_id, _, _ in validas})
+        grupos = {}
+        for entrada in validas:
+            if entrada[1] in itens:
+                grupos.setdefault(entrada[1], []).append(entrada)
+            else:
+                erros.append({"indice": entrada[0], "erro": f"Item {entrada[1]} não encontrado."})
+
+        # O saldo líquido de cada item também precisa caber no UPDATE
+        for item_id, lista in list(grupos.items()):
+            if sum(quantidade for *_, quantidade in lista) > MAXIMO_INTEIRO:
+                erros.extend({"indice": indice, "erro": "Quantidade total do item excede o limite."} for indice, *_ in lista)
+                del grupos[item_id]
+
+        if tudo_ou_nada and erros:
+            return self._resultado([], erros, itens)
+
+        aplicadas = []
+        with transaction.atomic():
+            for item_id, lista in grupos.items():
+                saldo = 0
+                minimo = 0
+                for _, _, tipo, quantidade in lista:
+                    saldo += quantidade if tipo == 'entrada' else -quantidade
+                    minimo = max(minimo, -saldo)
+
+                if _aplicar_saldo(item_id, saldo, minimo):
+                    aplicadas.extend(lista)
+                    continue
+
+                if tudo_ou_nada:
+                    erros.extend(
+                        {"indice": indice, "erro": f"Estoque insuficiente para {itens[item_id].nome}."}
+                        for indice, *_ in lista
+                    )
+                    transaction.set_rollback(True)
+                    break
+
+                # Melhor esforço: aplica uma a uma para aceitar as que cabem no saldo
+                for entrada in lista:
+                    indice, _, tipo, quantidade = entrada
+                    if tipo == 'entrada':
+                        alterados = _aplicar_saldo(item_id, quantidade, 0)
+                    else:
+                        alterados = _aplicar_saldo(item_id, -quantidade, quantidade)
+                    if alterados:
+                        aplicadas.append(entrada)
+                    else:
+                        erros.append({"indice": indice, "erro": f"Estoque insuficiente para {itens[item_id].nome}."})
+
+            if tudo_ou_nada and erros:
+                aplicadas = []
+            aplicadas.sort()
+            self.bulk_create([
+                MovimentacaoEstoque(
+                    item=itens[item_id],
+                    tipo_movimentacao=tipo,
+                    quantidade_movimentada=quantidade,
+                    usuario_responsavel=usuario_responsavel,
+                )
+                for _, item_id, tipo, quantidade in aplicadas
+            ])
+
+            totais = {}
+            for _, item_id, tipo, quantidade in aplicadas:
+                entradas, saidas = totais.get(item_id, (0, 0))
+                if tipo == 'entrada':
+                    entradas += quantidade
+                else:
+                    saidas += quantidade
+                totais[item_id] = (entradas, saidas)
+            for item_id, (entradas, saidas) in totais.items():
+                SaldoDiario.registrar(item_id, entradas, saidas)
+
+        return self._resultado(aplicadas, erros, itens)
+
+    def _resultado(self, aplicadas, erros, itens):
+        erros.sort(key=lambda erro: erro["indice"])
+        return {
+            "aplicadas": [indice for indice, *_ in aplicadas],
+            "erros": erros,
+            "saldos": dict(Item.objects.filter(pk__in=itens).values_list("id", "quantidade_atual")),
+        }
+
 
 class MovimentacaoEstoque(models.Model):
     TIPO_CHOICES = (
@@ -47,5 +299,44 @@ class MovimentacaoEstoque(models.Model):
     data_movimentacao = models.DateTimeField(auto_now_add=True)
     usuario_responsavel = models.CharField(max_length=100)
 
+    objects = MovimentacaoEstoqueManager()
+
+    class Meta:
+        indexes = [
+            # Paginação do histórico por keyset e filtros/acumulado por item
+            models.Index(fields=['data_movimentacao', 'id'], name='estoque_mov_data_id_idx'),
+            models.Index(fields=['item', 'data_movimentacao', 'id'], name='estoque_mov_item_data_idx'),
+        ]
+
     def __str__(self):
-        return f"{self.tipo_movimentacao} - {self.item.nome}"
\ No newline at end of file
+        return f"{self.tipo_movimentacao} - {self.item.nome}"
+
+    def registrar(self):
+        """
+        Aplica a movimentação ao saldo do item e grava o registro na mesma
+        transação.
+
+        O saldo é alterado por um único ``UPDATE ... SET quantidade_atual =
+        quantidade_atual ± n`` (condicionado a ``quantidade_atual >= n`` nas
+        saídas), então requisições concorrentes não perdem atualizações e o
+        estoque nunca fica negativo. Levanta ``EstoqueInsuficiente``.
+        """
+        quantidade = self.quantidade_movimentada
+
+        with transaction.atomic():
+            if self.tipo_movimentacao == 'entrada':
+                alterados = _aplicar_saldo(self.item_id, quantidade, 0)
+            else:
+                alterados = _aplicar_saldo(self.item_id, -quantidade, quantidade)
+
+            if not alterados:
+                atual = Item.objects.filter(pk=self.item_id).values_list('quantidade_atual', flat=True).first()
+                raise EstoqueInsuficiente(self.item, atual or 0)
+
+            self.save()
+            SaldoDiario.registrar(
+                self.item_id,
+                quantidade if self.tipo_movimentacao == 'entrada' else 0,
+                quantidade if self.tipo_movimentacao == 'saida' else 0,
+                timezone.localdate(self.data_movimentacao),
+            )
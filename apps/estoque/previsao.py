@@ -0,0 +1,107 @@
+"""
+Previsão de ruptura de estoque.
+
+Todas as saídas da janela são carregadas em uma única consulta e
+convertidas em uma matriz (itens x dias) com NumPy; as taxas de consumo,
+datas de ruptura e quantidades de reposição são calculadas para todos os
+itens de uma vez e gravadas em ``PrevisaoEstoque`` com um único upsert.
+"""
+import datetime
+
+import numpy as np
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Item, MovimentacaoEstoque, PrevisaoEstoque
+
+JANELA_DIAS = 30
+ALFA = 0.3  # peso da suavização exponencial (dias recentes pesam mais)
+PRAZO_REPOSICAO_DIAS = 7
+
+
+def matriz_consumo(item_ids, inicio, dias):
+    """Matriz (len(item_ids) x dias) com as saídas diárias de cada item."""
+    linhas = (
+        MovimentacaoEstoque.objects
+        .filter(tipo_movimentacao='saida', data_movimentacao__gte=inicio)
+        .annotate(dia=TruncDate('data_movimentacao'))
+        .values_list('item_id', 'dia', 'quantidade_movimentada')
+    )
+    matriz = np.zeros((len(item_ids), dias))
+    colunas = list(zip(*linhas))
+    if not colunas:
+        return matriz
+
+    ids = np.fromiter(colunas[0], dtype=np.int64)
+    dias_mov = (np.array(colunas[1], dtype='datetime64[D]') - np.datetime64(inicio.date(), 'D')).astype(np.int64)
+    quantidades = np.fromiter(colunas[2], dtype=np.float64)
+
+    # Posição de cada movimentação na matriz (item_ids vem ordenado)
+    posicoes = np.searchsorted(item_ids, ids)
+    validos = (posicoes < len(item_ids)) & (dias_mov >= 0) & (dias_mov < dias)
+    validos[validos] &= item_ids[posicoes[validos]] == ids[validos]
+    np.add.at(matriz, (posicoes[validos], dias_mov[validos]), quantidades[validos])
+    return matriz
+
+
+def calcular_previsoes(janela=JANELA_DIAS, alfa=ALFA, prazo=PRAZO_REPOSICAO_DIAS, hoje=None):
+    """
+    Recalcula e grava a previsão de todos os itens; retorna quantos foram
+    gravados. Levanta ``ValueError`` se ``janela`` não for positiva, ``alfa``
+    estiver fora de (0, 1] ou ``prazo`` for negativo.
+    """
+    if janela <= 0:
+        raise ValueError("A janela deve ter ao menos 1 dia.")
+    if not 0 < alfa <= 1:
+        raise ValueError("Alfa deve estar no intervalo (0, 1].")
+    if prazo < 0:
+        raise ValueError("O prazo de reposição não pode ser negativo.")
+    hoje = hoje or timezone.localdate()
+    inicio = timezone.make_aware(datetime.datetime.combine(
+        hoje - datetime.timedelta(days=janela - 1), datetime.time.min
+    ))
+
+    itens = list(Item.objects.order_by('id').values_list(
+        'id', 'quantidade_atual', 'quantidade_minima', 'quantidade_maxima'
+    ))
+    if not itens:
+        return 0
+    ids, atual, minimo, maximo = (np.array(coluna) for coluna in zip(*itens))
+
+    consumo = matriz_consumo(ids, inicio, janela)
+
+    media_movel = consumo.mean(axis=1)
+    # Pesos alfa * (1 - alfa)^k, com k = 0 no dia mais recente
+    pesos = alfa * (1 - alfa) ** np.arange(janela - 1, -1, -1)
+    suavizado = consumo @ pesos / pesos.sum()
+
+    com_consumo = suavizado > 0
+    taxa = np.where(com_consumo, suavizado, 1)
+    dias_ate_ruptura = np.where(com_consumo, np.floor(atual / taxa), -1).astype(np.int64)
+    dias_ate_minimo = np.where(com_consumo, (atual - minimo) / taxa, np.inf)
+
+    # Quando o mínimo será atingido dentro do prazo, repõe até o máximo
+    # somando o consumo previsto até a entrega
+    repor = (atual <= minimo) | (dias_ate_minimo <= prazo)
+    sugerida = np.where(repor, np.maximum(maximo + np.ceil(suavizado * prazo) - atual, 0), 0).astype(np.int64)
+
+    agora = timezone.now()
+    previsoes = [
+        PrevisaoEstoque(
+            item_id=int(ids[i]),
+            consumo_diario=float(suavizado[i]),
+            consumo_medio=float(media_movel[i]),
+            data_ruptura=hoje + datetime.timedelta(days=int(dias_ate_ruptura[i])) if dias_ate_ruptura[i] >= 0 else None,
+            quantidade_sugerida=int(sugerida[i]),
+            calculado_em=agora,
+        )
+        for i in range(len(ids))
+    ]
+    PrevisaoEstoque.objects.bulk_create(
+        previsoes,
+        batch_size=500,
+        update_conflicts=True,
+        unique_fields=['item'],
+        update_fields=['consumo_diario', 'consumo_medio', 'data_ruptura', 'quantidade_sugerida', 'calculado_em'],
+    )
+    return len(previsoes)
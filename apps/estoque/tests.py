@@ -1,7 +1,17 @@
 from django.test import TestCase, Client
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.contrib.auth.models import User
-from .models import Categoria, Item, MovimentacaoEstoque
+from django.utils import timezone
+from unittest.mock import patch
+import datetime
+import json
+from .models import Categoria, EstoqueInsuficiente, Item, MovimentacaoEstoque, PrevisaoEstoque, SaldoDiario
+from .previsao import calcular_previsoes
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from io import StringIO
 
 class CategoriaModelTest(TestCase):
     def setUp(self):
@@ -71,6 +81,34 @@ class MovimentacaoEstoqueModelTest(TestCase):
         expected = "entrada - Notebook"
         self.assertEqual(str(self.movimentacao), expected)
 
+class MovimentacaoRegistrarTest(TestCase):
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nome="Ração")
+        self.item = Item.objects.create(nome="Sal mineral", categoria=self.categoria, quantidade_atual=10)
+
+    def test_registrar_nao_sobrescreve_saldo_concorrente(self):
+        """Testa que a movimentação usa o saldo do banco, não o da instância"""
+        Item.objects.filter(pk=self.item.pk).update(quantidade_atual=50)  # outra requisição
+
+        MovimentacaoEstoque(item=self.item, tipo_movimentacao='saida',
+                            quantidade_movimentada=5, usuario_responsavel="a").registrar()
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantidade_atual, 45)
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 1)
+
+    def test_registrar_saida_insuficiente_nao_grava(self):
+        """Testa que a saída maior que o saldo não altera nada"""
+        movimentacao = MovimentacaoEstoque(item=self.item, tipo_movimentacao='saida',
+                                           quantidade_movimentada=11, usuario_responsavel="a")
+        with self.assertRaises(EstoqueInsuficiente) as ctx:
+            movimentacao.registrar()
+
+        self.assertEqual(ctx.exception.quantidade_atual, 10)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantidade_atual, 10)
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 0)
+
 class ViewsTest(TestCase):
     def setUp(self):
         self.client = Client()
@@ -192,4 +230,309 @@ class MovimentacaoViewsTest(TestCase):
         self.assertEqual(item_atualizado.quantidade_atual, 10)
         
         # Verifica que a mensagem de erro está presente
-        self.assertContains(response, "Estoque insuficiente")
\ No newline at end of file
+        self.assertContains(response, "Estoque insuficiente")
+
+class MovimentacaoLoteTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.categoria = Categoria.objects.create(nome="Ração")
+        self.milho = Item.objects.create(nome="Milho", categoria=self.categoria, quantidade_atual=10)
+        self.sal = Item.objects.create(nome="Sal", categoria=self.categoria, quantidade_atual=2)
+
+    def _enviar(self, movimentacoes, modo="tudo_ou_nada"):
+        return self.client.post(
+            reverse('registrar_movimentacoes_lote'),
+            data=json.dumps({"usuario_responsavel": "scanner", "modo": modo, "movimentacoes": movimentacoes}),
+            content_type="application/json",
+        )
+
+    def test_lote_tudo_ou_nada_sucesso(self):
+        """Testa um lote válido aplicado em uma transação"""
+        response = self._enviar([
+            {"item": self.milho.id, "tipo": "saida", "quantidade": 4},
+            {"item": self.sal.id, "tipo": "entrada", "quantidade": 5},
+            {"item": self.milho.id, "tipo": "saida", "quantidade": 6},
+            {"item": self.sal.id, "tipo": "saida", "quantidade": 7},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(dados["aplicadas"], [0, 1, 2, 3])
+        self.assertEqual(dados["saldos"], {str(self.milho.id): 0, str(self.sal.id): 0})
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 4)
+
+    def test_lote_tudo_ou_nada_rejeita_tudo(self):
+        """Testa que uma saída sem saldo cancela o lote inteiro"""
+        response = self._enviar([
+            {"item": self.milho.id, "tipo": "saida", "quantidade": 4},
+            {"item": self.sal.id, "tipo": "saida", "quantidade": 3},
+        ])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["indice"] for e in response.json()["erros"]], [1])
+        self.milho.refresh_from_db()
+        self.assertEqual(self.milho.quantidade_atual, 10)
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 0)
+
+    def test_lote_saldo_intermediario_negativo(self):
+        """Testa que a ordem importa: saída antes da entrada não pode negativar"""
+        response = self._enviar([
+            {"item": self.sal.id, "tipo": "saida", "quantidade": 3},
+            {"item": self.sal.id, "tipo": "entrada", "quantidade": 5},
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.sal.refresh_from_db()
+        self.assertEqual(self.sal.quantidade_atual, 2)
+
+    def test_lote_melhor_esforco(self):
+        """Testa o modo melhor esforço aplicando apenas as entradas válidas"""
+        response = self._enviar([
+            {"item": self.milho.id, "tipo": "saida", "quantidade": 4},
+            {"item": 9999, "tipo": "saida", "quantidade": 1},
+            {"item": self.sal.id, "tipo": "saida", "quantidade": 3},
+            {"item": self.sal.id, "tipo": "saida", "quantidade": 2},
+            {"item": self.milho.id, "tipo": "troca", "quantidade": 1},
+        ], modo="melhor_esforco")
+
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(dados["aplicadas"], [0, 3])
+        self.assertEqual([e["indice"] for e in dados["erros"]], [1, 2, 4])
+        self.assertEqual(dados["saldos"], {str(self.milho.id): 6, str(self.sal.id): 0})
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 2)
+
+    def test_lote_valores_de_tipo_errado(self):
+        """Tipo não textual (lista, objeto) e quantidade infinita viram erro de validação, não 500"""
+        response = self._enviar([
+            {"item": self.milho.id, "tipo": ["entrada"], "quantidade": 1},
+            {"item": self.milho.id, "tipo": {"a": 1}, "quantidade": 1},
+            {"item": self.milho.id, "tipo": "entrada", "quantidade": 1e400},
+            {"item": self.milho.id, "tipo": "entrada", "quantidade": 2},
+        ], modo="melhor_esforco")
+
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(dados["aplicadas"], [3])
+        self.assertEqual([e["indice"] for e in dados["erros"]], [0, 1, 2])
+
+    def test_lote_valores_fora_do_int64(self):
+        """Ids e quantidades que não cabem em int64 viram erro da linha, não 500"""
+        entradas = [
+            {"item": 1e999, "tipo": "entrada", "quantidade": 1},
+            {"item": 10**23, "tipo": "entrada", "quantidade": 1},
+            {"item": self.milho.id, "tipo": "entrada", "quantidade": 10**23},
+            {"item": self.sal.id, "tipo": "entrada", "quantidade": 2**63 - 1},
+            {"item": self.sal.id, "tipo": "entrada", "quantidade": 1},
+            {"item": self.milho.id, "tipo": "entrada", "quantidade": 2},
+        ]
+        response = self._enviar(entradas)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([e["indice"] for e in response.json()["erros"]], [0, 1, 2, 3, 4])
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 0)
+
+        response = self._enviar(entradas, modo="melhor_esforco")
+        self.assertEqual(response.status_code, 200)
+        dados = response.json()
+        self.assertEqual(dados["aplicadas"], [5])
+        self.assertEqual([e["indice"] for e in dados["erros"]], [0, 1, 2, 3, 4])
+        self.assertEqual(dados["saldos"], {str(self.milho.id): 12, str(self.sal.id): 2})
+
+    def test_lote_json_invalido(self):
+        """Testa a rejeição de corpo inválido"""
+        response = self.client.post(reverse('registrar_movimentacoes_lote'), data="x",
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+
+
+class HistoricoMovimentacoesTest(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.racao = Categoria.objects.create(nome="Ração")
+        self.remedio = Categoria.objects.create(nome="Remédio")
+        self.milho = Item.objects.create(nome="Milho", categoria=self.racao)
+        self.vacina = Item.objects.create(nome="Vacina", categoria=self.remedio)
+        base = timezone.now() - datetime.timedelta(days=10)
+        # Milho: +10, -3, +5, -4 ... ; Vacina: +2 por dia
+        for dia in range(10):
+            for item, tipo, qtd in ((self.milho, 'entrada' if dia % 2 == 0 else 'saida', 10 if dia % 2 == 0 else 3),
+                                    (self.vacina, 'entrada', 2)):
+                mov = MovimentacaoEstoque.objects.create(
+                    item=item, tipo_movimentacao=tipo, quantidade_movimentada=qtd, usuario_responsavel="t"
+                )
+                MovimentacaoEstoque.objects.filter(pk=mov.pk).update(
+                    data_movimentacao=base + datetime.timedelta(days=dia)
+                )
+
+    def test_paginacao_por_cursor_com_acumulado(self):
+        """Testa a paginação por cursor e o acumulado por item calculado no banco"""
+        url = reverse('historico_movimentacoes')
+        vistos = []
+        with patch('apps.estoque.views.MOVIMENTACOES_POR_PAGINA', 6):
+            response = self.client.get(url)
+            while True:
+                vistos.extend(response.context['movimentacoes'])
+                cursor = response.context['cursor_proximo']
+                if not cursor:
+                    break
+                response = self.client.get(url, {'cursor': cursor})
+
+        self.assertEqual(len(vistos), 20)
+        self.assertEqual(len({m.id for m in vistos}), 20)
+        chaves = [(m.data_movimentacao, m.id) for m in vistos]
+        self.assertEqual(chaves, sorted(chaves, reverse=True))
+
+        # Linha mais recente de cada item traz o saldo líquido do período
+        ultimo_milho = next(m for m in vistos if m.item_id == self.milho.id)
+        ultimo_vacina = next(m for m in vistos if m.item_id == self.vacina.id)
+        self.assertEqual(ultimo_milho.saldo_acumulado, 5 * 10 - 5 * 3)
+        self.assertEqual(ultimo_vacina.saldo_acumulado, 20)
+        self.assertEqual(vistos[-1].saldo_acumulado, 10 if vistos[-1].item_id == self.milho.id else 2)
+
+        # Cada linha traz o acumulado do item até ela, inclusive nas páginas seguintes
+        saldos = {}
+        for m in reversed(vistos):
+            sinal = 1 if m.tipo_movimentacao == 'entrada' else -1
+            saldos[m.item_id] = saldos.get(m.item_id, 0) + sinal * m.quantidade_movimentada
+            self.assertEqual(m.saldo_acumulado, saldos[m.item_id])
+
+    def test_paginas_seguintes_nao_somam_o_historico(self):
+        """O saldo segue no cursor: só a primeira página faz a soma agrupada"""
+        url = reverse('historico_movimentacoes')
+        with patch('apps.estoque.views.MOVIMENTACOES_POR_PAGINA', 6):
+            with CaptureQueriesContext(connection) as primeira:
+                cursor = self.client.get(url).context['cursor_proximo']
+            with CaptureQueriesContext(connection) as segunda:
+                self.client.get(url, {'cursor': cursor})
+        self.assertTrue(any('SUM(' in q['sql'] for q in primeira.captured_queries))
+        self.assertFalse(any('SUM(' in q['sql'] for q in segunda.captured_queries))
+
+    def test_filtros(self):
+        """Testa os filtros por categoria, tipo e intervalo de datas"""
+        url = reverse('historico_movimentacoes')
+
+        response = self.client.get(url, {'categoria': self.remedio.id})
+        self.assertEqual({m.item_id for m in response.context['movimentacoes']}, {self.vacina.id})
+
+        response = self.client.get(url, {'item': self.milho.id, 'tipo': 'saida'})
+        movs = response.context['movimentacoes']
+        self.assertEqual(len(movs), 5)
+        self.assertEqual(movs[0].saldo_acumulado, -15)
+
+        hoje = timezone.localdate()
+        response = self.client.get(url, {
+            'data_inicio': (hoje - datetime.timedelta(days=4)).isoformat(),
+            'data_fim': (hoje - datetime.timedelta(days=2)).isoformat(),
+        })
+        self.assertEqual(len(response.context['movimentacoes']), 6)
+
+
+class SaldoDiarioTest(TestCase):
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nome="Ração")
+        self.item = Item.objects.create(nome="Sal mineral", categoria=self.categoria, quantidade_atual=100)
+
+    def _movimentar(self, tipo, quantidade):
+        MovimentacaoEstoque(item=self.item, tipo_movimentacao=tipo,
+                            quantidade_movimentada=quantidade, usuario_responsavel="t").registrar()
+
+    def test_fechamento_incremental(self):
+        """Testa que cada movimentação atualiza o fechamento do dia"""
+        self._movimentar('saida', 30)
+        self._movimentar('entrada', 10)
+        MovimentacaoEstoque.objects.registrar_lote(
+            [{"item": self.item.id, "tipo": "saida", "quantidade": 5}], "scanner"
+        )
+
+        fechamento = SaldoDiario.objects.get(item=self.item)
+        self.assertEqual(fechamento.data, timezone.localdate())
+        self.assertEqual(fechamento.saldo_final, 75)
+        self.assertEqual(fechamento.entradas, 10)
+        self.assertEqual(fechamento.saidas, 35)
+        self.assertEqual(self.item.saldo_em(timezone.localdate()), 75)
+        self.assertEqual(self.item.saldo_em(timezone.localdate() - datetime.timedelta(days=1)), 100)
+
+    def test_reconstruir_e_consultas(self):
+        """Testa o comando de reconstrução, o saldo pontual e o consumo médio"""
+        hoje = timezone.localdate()
+        for dias_atras, tipo, qtd in ((5, 'saida', 20), (3, 'entrada', 50), (3, 'saida', 10), (1, 'saida', 40)):
+            self._movimentar(tipo, qtd)
+            MovimentacaoEstoque.objects.filter(pk=MovimentacaoEstoque.objects.latest('id').pk).update(
+                data_movimentacao=timezone.now() - datetime.timedelta(days=dias_atras)
+            )
+        SaldoDiario.objects.all().delete()
+
+        call_command('reconstruir_saldos_diarios', stdout=StringIO())
+
+        self.assertEqual(SaldoDiario.objects.filter(item=self.item).count(), 3)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.quantidade_atual, 80)
+        self.assertEqual(self.item.saldo_em(hoje - datetime.timedelta(days=6)), 100)
+        self.assertEqual(self.item.saldo_em(hoje - datetime.timedelta(days=5)), 80)
+        self.assertEqual(self.item.saldo_em(hoje - datetime.timedelta(days=4)), 80)
+        self.assertEqual(self.item.saldo_em(hoje - datetime.timedelta(days=2)), 120)
+        self.assertEqual(self.item.saldo_em(hoje), 80)
+        self.assertAlmostEqual(self.item.consumo_medio(dias=10), 7.0)
+
+    def test_visualizar_item_saldo_na_data(self):
+        """Testa a consulta pontual na página do item"""
+        self._movimentar('saida', 30)
+        response = Client().get(reverse('visualizar_item', args=[self.item.id]),
+                                {'data': timezone.localdate().isoformat()})
+        self.assertEqual(response.context['saldo_na_data'], 70)
+
+
+class PrevisaoEstoqueTest(TestCase):
+    def setUp(self):
+        self.categoria = Categoria.objects.create(nome="Ração")
+        self.milho = Item.objects.create(nome="Milho", categoria=self.categoria, quantidade_atual=100,
+                                         quantidade_minima=20, quantidade_maxima=200)
+        self.parado = Item.objects.create(nome="Arame", categoria=self.categoria, quantidade_atual=3,
+                                          quantidade_minima=5, quantidade_maxima=50)
+        agora = timezone.now()
+        # 10 unidades de milho por dia nos últimos 30 dias
+        for dias_atras in range(30):
+            mov = MovimentacaoEstoque.objects.create(item=self.milho, tipo_movimentacao='saida',
+                                                     quantidade_movimentada=10, usuario_responsavel="t")
+            MovimentacaoEstoque.objects.filter(pk=mov.pk).update(
+                data_movimentacao=agora - datetime.timedelta(days=dias_atras)
+            )
+
+    def test_calcular_previsoes(self):
+        """Testa taxa de consumo, data de ruptura e reposição sugerida"""
+        self.assertEqual(calcular_previsoes(), 2)
+
+        previsao = PrevisaoEstoque.objects.get(item=self.milho)
+        self.assertAlmostEqual(previsao.consumo_medio, 10.0)
+        self.assertAlmostEqual(previsao.consumo_diario, 10.0)
+        self.assertEqual(previsao.data_ruptura, timezone.localdate() + datetime.timedelta(days=10))
+        self.assertEqual(previsao.quantidade_sugerida, 0)  # mínimo atingido só em 8 dias
+
+        parado = PrevisaoEstoque.objects.get(item=self.parado)
+        self.assertIsNone(parado.data_ruptura)
+        self.assertEqual(parado.quantidade_sugerida, 47)  # abaixo do mínimo: completa até o máximo
+
+        # Recalcular atualiza as linhas existentes (upsert)
+        Item.objects.filter(pk=self.milho.pk).update(quantidade_atual=50)
+        calcular_previsoes()
+        previsao = PrevisaoEstoque.objects.get(item=self.milho)
+        self.assertEqual(PrevisaoEstoque.objects.count(), 2)
+        self.assertEqual(previsao.quantidade_sugerida, 200 + 70 - 50)
+
+    def test_parametros_invalidos(self):
+        """Testa a validação de janela, alfa e prazo na função e no comando"""
+        for parametros in ({"janela": 0}, {"alfa": 0}, {"alfa": 1.5}, {"prazo": -1}):
+            with self.assertRaises(ValueError):
+                calcular_previsoes(**parametros)
+        self.assertEqual(calcular_previsoes(alfa=1), 2)
+
+        with self.assertRaisesMessage(CommandError, "janela"):
+            call_command('calcular_previsao_estoque', '--janela', '0')
+        with self.assertRaisesMessage(CommandError, "Alfa"):
+            call_command('calcular_previsao_estoque', '--alfa', '2')
+
+    def test_listar_estoque_exibe_previsao(self):
+        """Testa que a listagem lê a previsão gravada"""
+        calcular_previsoes()
+        response = Client().get(reverse('listar_estoque'))
+        data = (timezone.localdate() + datetime.timedelta(days=10)).strftime("%d/%m/%Y")
+        self.assertContains(response, data)
@@ -8,5 +8,6 @@ urlpatterns = [
     path('item/<int:item_id>/editar/', views.editar_item, name='editar_item'),
     path('item/<int:item_id>/excluir/', views.excluir_item, name='excluir_item'),
     path('movimentacao/', views.registrar_movimentacao, name='registrar_movimentacao'),
+    path('movimentacao/lote/', views.registrar_movimentacoes_lote, name='registrar_movimentacoes_lote'),
     path('historico/', views.historico_movimentacoes, name='historico_movimentacoes'),
 ]
\ No newline at end of file
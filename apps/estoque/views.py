@@ -1,18 +1,44 @@
+import datetime
+import json
+from urllib.parse import urlencode
+
+from django.http import JsonResponse
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils import timezone
+from django.views.decorators.http import require_POST
 from django.urls import reverse
-from .models import Categoria, Item, MovimentacaoEstoque
+from .models import Categoria, EstoqueInsuficiente, Item, MovimentacaoEstoque
 from .forms import ItemForm, MovimentacaoForm
+from . import historico
 from django.contrib import messages
 
 
 def listar_estoque(request):
-    itens = Item.objects.all()
+    # A previsão vem pronta do job diário (apps/estoque/previsao.py)
+    itens = Item.objects.select_related('categoria', 'previsao')
     return render(request, 'listar_items.html', {'itens': itens})
 
 
 def visualizar_item(request, item_id):
     item = get_object_or_404(Item, id=item_id)
-    return render(request, 'visualizar_item.html', {'item': item})
+
+    # Consulta pontual: saldo ao fim de uma data, a partir dos fechamentos diários
+    data_consulta = None
+    saldo_na_data = None
+    if request.GET.get('data'):
+        try:
+            data_consulta = datetime.date.fromisoformat(request.GET['data'])
+        except ValueError:
+            messages.error(request, 'Data inválida.')
+        else:
+            saldo_na_data = item.saldo_em(data_consulta)
+
+    return render(request, 'visualizar_item.html', {
+        'item': item,
+        'data_consulta': data_consulta,
+        'saldo_na_data': saldo_na_data,
+        'consumo_medio': item.consumo_medio(30),
+    })
 
 
 def criar_item(request):
@@ -53,26 +79,19 @@ def registrar_movimentacao(request):
         form = MovimentacaoForm(request.POST)
         if form.is_valid():
             movimentacao = form.save(commit=False)
-            item = movimentacao.item
             quantidade = movimentacao.quantidade_movimentada
-            
-     
+
+            try:
+                movimentacao.registrar()
+            except EstoqueInsuficiente as e:
+                messages.error(request, str(e))
+                return render(request, 'registrar_movimentacao.html', {'form': form})
+
             if movimentacao.tipo_movimentacao == 'entrada':
-                item.quantidade_atual += quantidade
                 messages.success(request, f"Entrada de {quantidade} itens realizada com sucesso!")
-            
-            
-            elif movimentacao.tipo_movimentacao == 'saida':
-                if item.quantidade_atual >= quantidade:
-                    item.quantidade_atual -= quantidade
-                    messages.success(request, f"Saída de {quantidade} itens realizada com sucesso!")
-                else:
-                    messages.error(request, f"Estoque insuficiente! Atual: {item.quantidade_atual}")
-                    return render(request, 'registrar_movimentacao.html', {'form': form})
-
-            item.save() 
-            movimentacao.save() 
-            
+            else:
+                messages.success(request, f"Saída de {quantidade} itens realizada com sucesso!")
+
             return redirect('listar_estoque')
     else:
         form = MovimentacaoForm()
@@ -80,6 +99,80 @@ def registrar_movimentacao(request):
     return render(request, 'registrar_movimentacao.html', {'form': form})
 
 
+MAXIMO_MOVIMENTACOES_LOTE = 1000
+
+
+@require_POST
+def registrar_movimentacoes_lote(request):
+    """
+    Recebe as leituras de uma sessão de scanner em uma única requisição:
+
+    {"usuario_responsavel": "joao", "modo": "tudo_ou_nada" | "melhor_esforco",
+     "movimentacoes": [{"item": 1, "tipo": "saida", "quantidade": 2}, ...]}
+    """
+    try:
+        dados = json.loads(request.body)
+        entradas = dados["movimentacoes"]
+        usuario = str(dados["usuario_responsavel"])[:100]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({"erro": "JSON inválido: informe usuario_responsavel e movimentacoes."}, status=400)
+
+    if not isinstance(entradas, list) or not entradas:
+        return JsonResponse({"erro": "movimentacoes deve ser uma lista não vazia."}, status=400)
+    if len(entradas) > MAXIMO_MOVIMENTACOES_LOTE:
+        return JsonResponse({"erro": f"Máximo de {MAXIMO_MOVIMENTACOES_LOTE} movimentações por lote."}, status=400)
+
+    modo = dados.get("modo", "tudo_ou_nada")
+    if modo not in ("tudo_ou_nada", "melhor_esforco"):
+        return JsonResponse({"erro": f"Modo inválido: {modo}."}, status=400)
+
+    resultado = MovimentacaoEstoque.objects.registrar_lote(
+        entradas, usuario, tudo_ou_nada=(modo == "tudo_ou_nada")
+    )
+    status = 400 if modo == "tudo_ou_nada" and resultado["erros"] else 200
+    return JsonResponse(resultado, status=status)
+
+
+MOVIMENTACOES_POR_PAGINA = 50
+
+
+def _inicio_do_dia(valor, dias=0):
+    """Converte 'AAAA-MM-DD' no início do dia (com fuso); None se inválido."""
+    try:
+        dia = datetime.date.fromisoformat(valor) + datetime.timedelta(days=dias)
+    except ValueError:
+        return None
+    return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+
+
 def historico_movimentacoes(request):
-    movimentacoes = MovimentacaoEstoque.objects.select_related('item', 'item__categoria').all().order_by('-data_movimentacao')
-    return render(request, 'historico_movimentacoes.html', {'movimentacoes': movimentacoes})
\ No newline at end of file
+    filtros = {nome: request.GET.get(nome, '') for nome in ('item', 'categoria', 'tipo', 'data_inicio', 'data_fim')}
+    movimentacoes = MovimentacaoEstoque.objects.all()
+
+    if filtros['item'].isdigit():
+        movimentacoes = movimentacoes.filter(item_id=filtros['item'])
+    if filtros['categoria'].isdigit():
+        movimentacoes = movimentacoes.filter(item__categoria_id=filtros['categoria'])
+    if filtros['tipo'] in dict(MovimentacaoEstoque.TIPO_CHOICES):
+        movimentacoes = movimentacoes.filter(tipo_movimentacao=filtros['tipo'])
+    # Intervalo em data_movimentacao puro (sem date()) para usar o índice
+    inicio = _inicio_do_dia(filtros['data_inicio']) if filtros['data_inicio'] else None
+    fim = _inicio_do_dia(filtros['data_fim'], dias=1) if filtros['data_fim'] else None
+    if inicio:
+        movimentacoes = movimentacoes.filter(data_movimentacao__gte=inicio)
+    if fim:
+        movimentacoes = movimentacoes.filter(data_movimentacao__lt=fim)
+
+    cursor = historico.decodificar_cursor(request.GET['cursor']) if request.GET.get('cursor') else None
+    pagina, cursor_proximo = historico.pagina_historico(movimentacoes, cursor, MOVIMENTACOES_POR_PAGINA)
+
+    return render(request, 'historico_movimentacoes.html', {
+        'movimentacoes': pagina,
+        'cursor_proximo': cursor_proximo,
+        'primeira_pagina': cursor is None,
+        'filtros': filtros,
+        'filtros_query': urlencode({k: v for k, v in filtros.items() if v}),
+        'itens': Item.objects.order_by('nome').values_list('id', 'nome'),
+        'categorias': Categoria.objects.order_by('nome').values_list('id', 'nome'),
+        'tipos': MovimentacaoEstoque.TIPO_CHOICES,
+    })
@@ -1,3 +1,84 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import (
+    EstadoJob,
+    ExecucaoJob,
+    LiderancaJobs,
+    Localizacao,
+    RegistroClimatico,
+    ResumoClimaticoDiario,
+    ResumoClimaticoHorario,
+)
+
+
+@admin.register(Localizacao)
+class LocalizacaoAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'latitude', 'longitude', 'ativa')
+    list_filter = ('ativa',)
+    search_fields = ('nome',)
+
+
+@admin.register(RegistroClimatico)
+class RegistroClimaticoAdmin(admin.ModelAdmin):
+    list_display = ('data_coleta', 'localizacao', 'temperatura', 'umidade', 'vento', 'condicao', 'origem')
+    list_filter = ('origem', 'localizacao')
+    date_hierarchy = 'data_coleta'
+
+
+class ResumoClimaticoAdmin(admin.ModelAdmin):
+    """Os resumos são derivados dos registros: só leitura."""
+    list_display = ('localizacao', 'quantidade', 'temperatura_min', 'temperatura_media', 'temperatura_max', 'umidade_media', 'vento_media')
+    list_filter = ('localizacao',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ResumoClimaticoHorario)
+class ResumoClimaticoHorarioAdmin(ResumoClimaticoAdmin):
+    list_display = ('hora',) + ResumoClimaticoAdmin.list_display
+    date_hierarchy = 'hora'
+
+
+@admin.register(ResumoClimaticoDiario)
+class ResumoClimaticoDiarioAdmin(ResumoClimaticoAdmin):
+    list_display = ('dia',) + ResumoClimaticoAdmin.list_display
+    date_hierarchy = 'dia'
+
+
+@admin.register(EstadoJob)
+class EstadoJobAdmin(admin.ModelAdmin):
+    """Situação de cada job; apagar a próxima execução faz o job rodar no próximo ciclo."""
+    list_display = ('job', 'ultimo_resultado', 'ultima_execucao', 'ultimo_sucesso', 'proxima_execucao', 'falhas_consecutivas')
+    list_filter = ('ultimo_resultado',)
+    readonly_fields = ('job', 'tentativa', 'falhas_consecutivas', 'ultima_execucao', 'ultimo_resultado', 'ultimo_sucesso')
+
+    def has_add_permission(self, request):
+        return False
+
+
+@admin.register(ExecucaoJob)
+class ExecucaoJobAdmin(admin.ModelAdmin):
+    list_display = ('job', 'inicio', 'duracao', 'resultado', 'tentativa', 'dono')
+    list_filter = ('job', 'resultado')
+    date_hierarchy = 'inicio'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(LiderancaJobs)
+class LiderancaJobsAdmin(admin.ModelAdmin):
+    list_display = ('nome', 'dono', 'adquirida_em', 'expira_em')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save, pre_save
 
 
 class MonitoramentoConfig(AppConfig):
@@ -6,5 +7,11 @@ class MonitoramentoConfig(AppConfig):
     name = 'apps.monitoramento'
 
     def ready(self):
+        from .models import RegistroClimatico
+        from .resumos import registro_alterando, registro_excluido, registro_salvo
         from .scheduler import start_scheduler
+
+        pre_save.connect(registro_alterando, sender=RegistroClimatico, dispatch_uid="resumo_clima_pre_save")
+        post_save.connect(registro_salvo, sender=RegistroClimatico, dispatch_uid="resumo_clima_post_save")
+        post_delete.connect(registro_excluido, sender=RegistroClimatico, dispatch_uid="resumo_clima_post_delete")
         start_scheduler()
@@ -0,0 +1,130 @@
+"""
+Cache das consultas à Open-Meteo.
+
+As respostas ficam no cache do Django, por (latitude, longitude, variáveis),
+e valem ``ttl`` segundos. Depois disso continuam sendo servidas
+(stale-while-revalidate) enquanto uma única atualização roda em segundo
+plano; consultas simultâneas da mesma chave não disparam novas
+atualizações. Só quando não há nada no cache a página espera pela API,
+e se ela falhar o chamador recai no último ``RegistroClimatico``. A falha
+também fica em cache por ``TEMPO_FALHA`` segundos: quem esperava pela
+mesma chave, e quem chegar nesse intervalo, recai no registro na hora em
+vez de consultar a API de novo.
+"""
+import hashlib
+import threading
+import time
+
+import requests
+from django.core.cache import cache
+from django.db import connection
+
+URL_API = "https://api.open-meteo.com/v1/forecast"
+TIMEOUT_API = 5  # segundos
+
+TTL_ATUAL = 10 * 60
+TTL_PREVISAO = 60 * 60
+# Por quanto tempo uma resposta vencida ainda pode ser exibida
+VALIDADE_MAXIMA = 24 * 60 * 60
+# Trava entre processos para uma atualização por chave
+TEMPO_TRAVA = 30
+# Por quanto tempo uma falha da API evita novas consultas com o cache vazio
+TEMPO_FALHA = 30
+
+
+class ErroClima(Exception):
+    """A API não respondeu e não há resposta em cache."""
+
+
+_travas = {}
+_trava_travas = threading.Lock()
+_atualizando = set()
+
+
+def _trava(chave):
+    with _trava_travas:
+        return _travas.setdefault(chave, threading.Lock())
+
+
+def chave_cache(latitude, longitude, parametros):
+    texto = f"{latitude:.4f}|{longitude:.4f}|" + "|".join(f"{k}={parametros[k]}" for k in sorted(parametros))
+    return "clima:" + hashlib.sha1(texto.encode()).hexdigest()
+
+
+def _consultar_api(latitude, longitude, parametros, secao):
+    try:
+        resposta = requests.get(
+            URL_API,
+            params={"latitude": latitude, "longitude": longitude, **parametros},
+            timeout=TIMEOUT_API,
+        )
+        resposta.raise_for_status()
+        dados = resposta.json().get(secao) or {}
+    except Exception as e:
+        raise ErroClima(f"Erro ao consultar API: {e}") from e
+    if not dados:
+        raise ErroClima("A API não retornou dados climáticos.")
+    return dados
+
+
+def _atualizar(chave, latitude, longitude, parametros, secao):
+    dados = _consultar_api(latitude, longitude, parametros, secao)
+    cache.set(chave, {"dados": dados, "obtido_em": time.time()}, VALIDADE_MAXIMA)
+    return dados
+
+
+def _atualizar_em_segundo_plano(chave, latitude, longitude, parametros, secao):
+    with _trava_travas:
+        if chave in _atualizando:
+            return
+        _atualizando.add(chave)
+    if not cache.add(f"{chave}:atualizando", 1, TEMPO_TRAVA):
+        # Outro processo já está atualizando esta chave
+        with _trava_travas:
+            _atualizando.discard(chave)
+        return
+
+    def executar():
+        try:
+            _atualizar(chave, latitude, longitude, parametros, secao)
+        except Exception as e:
+            print("clima: erro ao atualizar cache:", e)
+        finally:
+            cache.delete(f"{chave}:atualizando")
+            with _trava_travas:
+                _atualizando.discard(chave)
+            connection.close()
+
+    threading.Thread(target=executar, name=f"clima-{chave[-8:]}", daemon=True).start()
+
+
+def consultar(latitude, longitude, parametros, secao, ttl):
+    """
+    Retorna ``(dados, obtido_em)`` da seção ``secao`` da resposta
+    (ex.: "current", "daily"). Levanta ``ErroClima`` se não houver cache
+    e a API falhar.
+    """
+    chave = chave_cache(latitude, longitude, parametros)
+    entrada = cache.get(chave)
+    if entrada is not None:
+        if time.time() - entrada["obtido_em"] >= ttl:
+            _atualizar_em_segundo_plano(chave, latitude, longitude, parametros, secao)
+        return entrada["dados"], entrada["obtido_em"]
+
+    # Cache vazio: uma requisição por chave vai à API, as demais esperam por ela
+    falha = cache.get(f"{chave}:falha")
+    if falha is not None:
+        raise ErroClima(falha)
+    with _trava(chave):
+        entrada = cache.get(chave)
+        if entrada is not None:
+            return entrada["dados"], entrada["obtido_em"]
+        falha = cache.get(f"{chave}:falha")
+        if falha is not None:
+            raise ErroClima(falha)
+        try:
+            dados = _atualizar(chave, latitude, longitude, parametros, secao)
+        except ErroClima as e:
+            cache.set(f"{chave}:falha", str(e), TEMPO_FALHA)
+            raise
+        return dados, time.time()
@@ -0,0 +1,159 @@
+"""
+Coleta automática do clima de todas as localizações.
+
+Cada ``Localizacao`` ativa é uma consulta à Open-Meteo. As consultas saem
+em paralelo de um pool limitado (``PARALELOS``), todas pela mesma
+``requests.Session`` (conexões reaproveitadas, repetição em 429/5xx de
+gateway) e passando por um limitador de taxa por host (token bucket:
+``RAJADA`` requisições de uma vez, depois ``REQUISICOES_POR_SEGUNDO``).
+As threads só fazem HTTP: as respostas são reunidas e gravadas num único
+``bulk_create``, seguido do recálculo dos resumos.
+
+Sem localização cadastrada, coleta as coordenadas padrão da sede.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .clima import URL_API
+from .models import Localizacao, RegistroClimatico
+from .resumos import atualizar_resumos
+
+LATITUDE_PADRAO = -15.5958
+LONGITUDE_PADRAO = -56.0969
+
+# Open-Meteo (plano gratuito): até 600 requisições por minuto
+CONFIGURACAO_PADRAO = {"PARALELOS": 16, "REQUISICOES_POR_SEGUNDO": 5, "RAJADA": 300, "TIMEOUT": 10}
+PARAMETROS = {
+    "current": "temperature_2m,relative_humidity_2m,wind_speed_10m,weather_code",
+    "timezone": "UTC",
+}
+
+
+class LimitadorTaxa:
+    """Token bucket por host, compartilhado entre as threads."""
+
+    def __init__(self, por_segundo, rajada):
+        self.por_segundo = por_segundo
+        self.rajada = rajada
+        self._baldes = {}
+        self._trava = threading.Lock()
+
+    def aguardar(self, host):
+        while True:
+            with self._trava:
+                agora = time.monotonic()
+                fichas, ultimo = self._baldes.get(host, (self.rajada, agora))
+                fichas = min(self.rajada, fichas + (agora - ultimo) * self.por_segundo)
+                if fichas >= 1:
+                    self._baldes[host] = (fichas - 1, agora)
+                    return
+                self._baldes[host] = (fichas, agora)
+                espera = (1 - fichas) / self.por_segundo
+            time.sleep(espera)
+
+
+def configuracao():
+    return {**CONFIGURACAO_PADRAO, **getattr(settings, "COLETA_CLIMA", {})}
+
+
+def criar_sessao(paralelos):
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=paralelos,
+        max_retries=Retry(
+            total=2,
+            backoff_factor=0.5,
+            status_forcelist=(429, 502, 503, 504),
+            allowed_methods=("GET",),
+        ),
+    )
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    return sessao
+
+
+_sessao = None
+_limitador = None
+_trava = threading.Lock()
+
+
+def _compartilhados():
+    """Sessão e limitador do processo, reaproveitados entre as coletas."""
+    global _sessao, _limitador
+    with _trava:
+        if _sessao is None:
+            config = configuracao()
+            _sessao = criar_sessao(config["PARALELOS"])
+            _limitador = LimitadorTaxa(config["REQUISICOES_POR_SEGUNDO"], config["RAJADA"])
+        return _sessao, _limitador
+
+
+def _consultar(sessao, limitador, url, latitude, longitude, timeout):
+    limitador.aguardar(urlsplit(url).netloc)
+    resposta = sessao.get(
+        url,
+        params={"latitude": latitude, "longitude": longitude, **PARAMETROS},
+        timeout=timeout,
+    )
+    resposta.raise_for_status()
+    atual = resposta.json().get("current") or {}
+    if atual.get("temperature_2m") is None:
+        raise ValueError("resposta sem current.temperature_2m")
+    return atual
+
+
+def coletar_localizacoes(localizacoes=None, url=URL_API, paralelos=None, sessao=None, limitador=None, agora=None):
+    """
+    Coleta as localizações (padrão: todas as ativas) e grava os registros.
+    Retorna ``(registros, falhas)``; ``falhas`` mapeia o nome da
+    localização ao erro.
+    """
+    config = configuracao()
+    paralelos = paralelos or config["PARALELOS"]
+    if sessao is None or limitador is None:
+        compartilhada, compartilhado = _compartilhados()
+        sessao = sessao or compartilhada
+        limitador = limitador or compartilhado
+    if localizacoes is None:
+        localizacoes = list(Localizacao.objects.filter(ativa=True))
+    alvos = [(l, l.latitude, l.longitude) for l in localizacoes] or [(None, LATITUDE_PADRAO, LONGITUDE_PADRAO)]
+
+    with ThreadPoolExecutor(max_workers=min(paralelos, len(alvos)), thread_name_prefix="coleta-clima") as pool:
+        futuros = [
+            (localizacao, pool.submit(_consultar, sessao, limitador, url, latitude, longitude, config["TIMEOUT"]))
+            for localizacao, latitude, longitude in alvos
+        ]
+
+    agora = agora or timezone.now()
+    registros, falhas = [], {}
+    for localizacao, futuro in futuros:
+        try:
+            atual = futuro.result()
+        except Exception as e:
+            falhas[str(localizacao or "padrão")] = str(e)
+            continue
+        registros.append(RegistroClimatico(
+            localizacao=localizacao,
+            temperatura=atual["temperature_2m"],
+            umidade=atual.get("relative_humidity_2m"),
+            vento=atual.get("wind_speed_10m"),
+            condicao=int(atual.get("weather_code") or 0),
+            origem="automatico",
+            data_coleta=agora,
+        ))
+
+    if registros:
+        with transaction.atomic():
+            RegistroClimatico.objects.bulk_create(registros)
+            atualizar_resumos(agora)
+    return registros, falhas
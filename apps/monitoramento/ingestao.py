@@ -0,0 +1,251 @@
+"""
+Ingestão das leituras das estações meteorológicas da fazenda.
+
+As estações enviam lotes em NDJSON (um objeto por linha) ou em line
+protocol (formato do InfluxDB/Telegraf)::
+
+    {"estacao": "sede", "data_coleta": "2025-03-10T14:00:05-04:00", "temperatura": 27.5, "umidade": 61}
+    clima,estacao=sede temperatura=27.5,umidade=61,vento=3.2 1741629605000000000
+
+O lote inteiro é validado de uma vez (as linhas inválidas voltam na
+resposta, as demais seguem) e as leituras vão para um buffer em memória,
+descarregado por uma thread de fundo com um ``bulk_create`` quando atinge
+``TAMANHO_LOTE`` leituras ou a cada ``INTERVALO`` segundos. O insert é um
+upsert em ``(estacao, data_coleta)``: reenviar um lote não duplica nada.
+Depois de cada descarga os resumos (``resumos.py``) dos dias afetados são
+recalculados. A fila e a thread ficam em ``apps.core.escrita``.
+
+Se a gravação violar uma restrição, o lote é dividido ao meio até isolar
+as leituras inválidas, que são descartadas (o upsert torna seguro regravar
+as metades já gravadas). Só uma falha do banco (indisponível, travado)
+devolve o lote ao buffer.
+
+Com ``ASSINCRONO`` desligado (ex.: testes) o lote é gravado na requisição.
+"""
+import datetime
+import json
+import math
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from apps.core.escrita import EscritaEmSegundoPlano, instancia_do_processo
+
+from .models import RegistroClimatico
+from .resumos import atualizar_resumos
+
+CONFIGURACAO_PADRAO = {"ASSINCRONO": True, "TAMANHO_LOTE": 5000, "INTERVALO": 1.0, "TOKEN": ""}
+
+# Limite de leituras retidas em memória; acima dele o envio é recusado (503)
+TAMANHO_MAXIMO_FILA = 200_000
+MAXIMO_ERROS_RESPOSTA = 100
+# Tolerância para relógios de estação adiantados
+TOLERANCIA_FUTURO = datetime.timedelta(minutes=5)
+
+FAIXAS = {
+    "temperatura": (-60.0, 70.0),
+    "umidade": (0.0, 100.0),
+    "vento": (0.0, 400.0),
+}
+CAMPOS_ATUALIZADOS = ["temperatura", "umidade", "vento", "condicao", "origem", "atualizado_em"]
+# Códigos WMO de tempo presente (0 a 99)
+MAXIMO_CONDICAO = 99
+PRECISOES = {"s": 1, "ms": 10**3, "us": 10**6, "ns": 10**9}
+
+
+class LeituraInvalida(ValueError):
+    pass
+
+
+def _numero(valores, campo, obrigatorio=False):
+    valor = valores.get(campo)
+    if valor is None:
+        if obrigatorio:
+            raise LeituraInvalida(f"{campo} é obrigatório.")
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, (int, float)):
+        raise LeituraInvalida(f"{campo} deve ser numérico.")
+    try:
+        valor = float(valor)
+    except OverflowError:
+        raise LeituraInvalida(f"{campo} fora da faixa.")
+    minimo, maximo = FAIXAS[campo]
+    if math.isnan(valor) or not minimo <= valor <= maximo:
+        raise LeituraInvalida(f"{campo} fora da faixa [{minimo:g}, {maximo:g}].")
+    return valor
+
+
+def _instante(valor, precisao, agora):
+    if valor is None:
+        return agora
+    if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+        try:
+            instante = datetime.datetime.fromtimestamp(valor / PRECISOES[precisao], tz=datetime.timezone.utc)
+        except (OverflowError, OSError, ValueError):
+            raise LeituraInvalida("data_coleta inválida.")
+    elif isinstance(valor, str) and (instante := parse_datetime(valor)) is not None:
+        if timezone.is_naive(instante):
+            instante = timezone.make_aware(instante)
+    else:
+        raise LeituraInvalida("data_coleta inválida.")
+    if instante > agora + TOLERANCIA_FUTURO:
+        raise LeituraInvalida("data_coleta no futuro.")
+    return instante
+
+
+def _leitura(valores, precisao, agora):
+    estacao = valores.get("estacao")
+    if not isinstance(estacao, str) or not 0 < len(estacao) <= 50:
+        raise LeituraInvalida("estacao é obrigatória (até 50 caracteres).")
+    condicao = valores.get("condicao", 0)
+    if isinstance(condicao, float) and condicao.is_integer():
+        condicao = int(condicao)
+    if isinstance(condicao, bool) or not isinstance(condicao, int):
+        raise LeituraInvalida("condicao deve ser inteira.")
+    if not 0 <= condicao <= MAXIMO_CONDICAO:
+        raise LeituraInvalida(f"condicao fora da faixa [0, {MAXIMO_CONDICAO}].")
+    return RegistroClimatico(
+        estacao=estacao,
+        data_coleta=_instante(valores.get("data_coleta"), precisao, agora),
+        temperatura=_numero(valores, "temperatura", obrigatorio=True),
+        umidade=_numero(valores, "umidade"),
+        vento=_numero(valores, "vento"),
+        condicao=condicao,
+        origem="Sensor",
+    )
+
+
+def _ler_linhas(texto, interpretar, precisao):
+    leituras, erros = [], []
+    agora = timezone.now()
+    for numero, linha in enumerate(texto.splitlines(), start=1):
+        linha = linha.strip()
+        if not linha or linha.startswith("#"):
+            continue
+        try:
+            leituras.append(_leitura(interpretar(linha), precisao, agora))
+        except LeituraInvalida as e:
+            erros.append({"linha": numero, "erro": str(e)})
+    return leituras, erros
+
+
+def _objeto_ndjson(linha):
+    try:
+        valores = json.loads(linha)
+    except ValueError:
+        raise LeituraInvalida("JSON inválido.")
+    if not isinstance(valores, dict):
+        raise LeituraInvalida("Cada linha deve ser um objeto JSON.")
+    return valores
+
+
+def _valor_line_protocol(texto):
+    if texto.endswith(("i", "u")):
+        return int(texto[:-1])
+    if texto in ("t", "T", "true", "True", "f", "F", "false", "False"):
+        raise ValueError
+    return float(texto)
+
+
+def _objeto_line_protocol(linha):
+    """``medida[,tag=valor...] campo=valor[,campo=valor...] [timestamp]`` (sem escapes)."""
+    partes = linha.split()
+    if len(partes) not in (2, 3):
+        raise LeituraInvalida("Linha fora do formato 'medida,tags campos [timestamp]'.")
+    _, *tags = partes[0].split(",")
+    valores = {}
+    try:
+        for par in tags:
+            chave, valor = par.split("=", 1)
+            valores[chave] = valor
+        for par in partes[1].split(","):
+            chave, valor = par.split("=", 1)
+            valores[chave] = _valor_line_protocol(valor)
+        if len(partes) == 3:
+            valores["data_coleta"] = int(partes[2])
+    except ValueError:
+        raise LeituraInvalida("Tag, campo ou timestamp malformado.")
+    return valores
+
+
+def ler_ndjson(texto, precisao="s"):
+    """Retorna ``(leituras, erros)``; ``data_coleta`` numérico é epoch na ``precisao`` dada."""
+    return _ler_linhas(texto, _objeto_ndjson, precisao)
+
+
+def ler_line_protocol(texto, precisao="ns"):
+    """Retorna ``(leituras, erros)``; o timestamp é epoch na ``precisao`` dada (padrão ns)."""
+    return _ler_linhas(texto, _objeto_line_protocol, precisao)
+
+
+def gravar_leituras(leituras, tamanho_lote=CONFIGURACAO_PADRAO["TAMANHO_LOTE"]):
+    """
+    Upsert das leituras em ``(estacao, data_coleta)`` e recálculo dos
+    resumos dos dias afetados. Retorna quantas leituras distintas gravou.
+    """
+    # Repetidas no mesmo lote: vale a última
+    unicas = {(leitura.estacao, leitura.data_coleta): leitura for leitura in leituras}
+    if not unicas:
+        return 0
+
+    por_dia = defaultdict(list)
+    for _, data_coleta in unicas:
+        por_dia[timezone.localdate(data_coleta)].append(data_coleta)
+
+    with transaction.atomic():
+        RegistroClimatico.objects.bulk_create(
+            unicas.values(),
+            batch_size=tamanho_lote,
+            update_conflicts=True,
+            unique_fields=["estacao", "data_coleta"],
+            update_fields=CAMPOS_ATUALIZADOS,
+        )
+        for instantes in por_dia.values():
+            atualizar_resumos(min(instantes), max(instantes))
+    return len(unicas)
+
+
+class BufferLeituras(EscritaEmSegundoPlano):
+    def __init__(self, tamanho_lote=5000, intervalo=1.0, assincrono=True):
+        super().__init__(
+            self._gravar_separando, tamanho_lote, intervalo,
+            nome="ingestão de sensores", maximo_fila=TAMANHO_MAXIMO_FILA,
+        )
+        self.assincrono = assincrono
+
+    def adicionar(self, leituras):
+        """Enfileira as leituras; retorna False (nada enfileirado) se o buffer estiver cheio."""
+        if not self.assincrono:
+            gravar_leituras(leituras, self.tamanho_lote)
+            return True
+        return self.enfileirar(leituras)
+
+    def _gravar_separando(self, lote):
+        """Grava o lote; se violar uma restrição, divide ao meio e descarta as leituras inválidas."""
+        try:
+            return gravar_leituras(lote, self.tamanho_lote)
+        except IntegrityError as e:
+            if len(lote) == 1:
+                leitura = lote[0]
+                print(f"ingestão de sensores: leitura {leitura.estacao} {leitura.data_coleta} descartada:", e)
+                return 0
+            meio = len(lote) // 2
+            return self._gravar_separando(lote[:meio]) + self._gravar_separando(lote[meio:])
+
+
+def configuracao():
+    return {**CONFIGURACAO_PADRAO, **getattr(settings, "INGESTAO_SENSORES", {})}
+
+
+@instancia_do_processo
+def buffer():
+    """Instância do processo, configurada por ``settings.INGESTAO_SENSORES``."""
+    config = configuracao()
+    return BufferLeituras(
+        tamanho_lote=config["TAMANHO_LOTE"],
+        intervalo=config["INTERVALO"],
+        assincrono=config["ASSINCRONO"],
+    )
@@ -0,0 +1,325 @@
+"""
+Execução dos jobs agendados por um único processo.
+
+Todo processo que carrega o Django (autoreloader do runserver, cada worker
+WSGI/ASGI) podia iniciar seu próprio scheduler e repetir as coletas. Agora
+os processos candidatos disputam uma concessão no banco
+(``LiderancaJobs``): quem a detém renova a cada ``INTERVALO`` segundos e
+executa os jobs; os demais só tentam assumir quando ela expira
+(``DURACAO_LIDERANCA`` sem renovação). As funções dos jobs são importadas
+só no líder.
+
+A agenda fica em ``EstadoJob``, então sobrevive a reinícios e à troca de
+líder:
+
+* cada execução agenda a próxima para ``intervalo`` + um atraso aleatório
+  de até ``jitter``;
+* execuções perdidas (processo parado, sem líder) viram uma só; se o
+  atraso passar da ``tolerancia`` do job ela é registrada como perdida e
+  reagendada;
+* uma falha é repetida até ``tentativas`` vezes, com espera dobrando a
+  partir de ``espera``.
+
+Cada execução (duração, resultado, erro) fica em ``ExecucaoJob``.
+"""
+import atexit
+import datetime
+import os
+import random
+import socket
+import sys
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import EstadoJob, ExecucaoJob, LiderancaJobs
+
+CONFIGURACAO_PADRAO = {"HABILITADO": False, "DURACAO_LIDERANCA": 60, "INTERVALO": 5, "PARALELOS": 2}
+NOME_LIDERANCA = "jobs"
+TAMANHO_MAXIMO_DETALHE = 4000
+
+
+class Job:
+    def __init__(self, id, funcao, intervalo, jitter=0, tentativas=3, espera=60, tolerancia=None):
+        """
+        ``funcao`` é um caminho importável ("apps.x.tasks.y") ou a própria
+        função; ``intervalo``, ``espera`` e ``tolerancia`` são timedelta ou
+        segundos, ``jitter`` em segundos.
+        """
+        self.id = id
+        self.funcao = funcao
+        self.intervalo = _segundos(intervalo)
+        self.jitter = jitter
+        self.tentativas = tentativas
+        self.espera = _segundos(espera)
+        self.tolerancia = _segundos(tolerancia) if tolerancia is not None else None
+
+    def __repr__(self):
+        return f"<Job {self.id}>"
+
+    def executar(self):
+        funcao = import_string(self.funcao) if isinstance(self.funcao, str) else self.funcao
+        return funcao()
+
+    def proxima(self, apos):
+        return apos + datetime.timedelta(seconds=self.intervalo + random.uniform(0, self.jitter))
+
+    def nova_tentativa(self, apos, tentativa):
+        espera = self.espera * 2 ** (tentativa - 1)
+        return apos + datetime.timedelta(seconds=espera + random.uniform(0, self.jitter))
+
+
+def _segundos(valor):
+    return valor.total_seconds() if isinstance(valor, datetime.timedelta) else float(valor)
+
+
+def configuracao():
+    return {**CONFIGURACAO_PADRAO, **getattr(settings, "JOBS_AGENDADOS", {})}
+
+
+def identidade_processo():
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+class ExecutorJobs:
+    def __init__(self, jobs, identidade=None, duracao_lideranca=60, intervalo=5, paralelos=2, sincrono=False):
+        self.jobs = {job.id: job for job in jobs}
+        self.identidade = identidade or identidade_processo()
+        self.duracao_lideranca = datetime.timedelta(seconds=duracao_lideranca)
+        self.intervalo = intervalo
+        self.sincrono = sincrono
+        self.lider = False
+        self._paralelos = paralelos
+        self._pool = None
+        self._em_execucao = set()
+        self._trava = threading.Lock()
+        self._parar = threading.Event()
+        self._thread = None
+
+    # Liderança
+
+    def renovar_lideranca(self, agora):
+        """Renova (ou assume, se expirada) a concessão; retorna se este processo é o líder."""
+        expira_em = agora + self.duracao_lideranca
+        renovadas = (
+            LiderancaJobs.objects
+            .filter(Q(dono=self.identidade) | Q(expira_em__lt=agora), nome=NOME_LIDERANCA)
+            .update(
+                adquirida_em=Case(When(dono=self.identidade, then=F("adquirida_em")), default=Value(agora)),
+                dono=self.identidade,
+                expira_em=expira_em,
+            )
+        )
+        if not renovadas:
+            try:
+                with transaction.atomic():
+                    LiderancaJobs.objects.create(
+                        nome=NOME_LIDERANCA, dono=self.identidade, adquirida_em=agora, expira_em=expira_em
+                    )
+            except IntegrityError:
+                # Outro processo detém a concessão
+                if self.lider:
+                    print(f"jobs: {self.identidade} perdeu a liderança")
+                self.lider = False
+                return False
+
+        if not self.lider:
+            print(f"jobs: {self.identidade} assumiu a liderança")
+        self.lider = True
+        return True
+
+    def liberar_lideranca(self):
+        LiderancaJobs.objects.filter(nome=NOME_LIDERANCA, dono=self.identidade).update(expira_em=timezone.now())
+        self.lider = False
+
+    # Agenda
+
+    def ciclo(self, agora=None):
+        """Uma volta do laço: renova a liderança e dispara os jobs vencidos. Retorna os ids disparados."""
+        agora = agora or timezone.now()
+        if not self.renovar_lideranca(agora):
+            return []
+
+        estados = {estado.job: estado for estado in EstadoJob.objects.filter(job__in=self.jobs)}
+        disparados = []
+        for job in self.jobs.values():
+            estado = estados.get(job.id)
+            if estado is None:
+                # Job novo: primeira execução logo, espalhada pelo jitter
+                estado, _ = EstadoJob.objects.get_or_create(
+                    job=job.id,
+                    defaults={"proxima_execucao": agora + datetime.timedelta(seconds=random.uniform(0, job.jitter))},
+                )
+            # Sem próxima execução (ex.: apagada no admin): executa já
+            if estado.proxima_execucao is not None and estado.proxima_execucao > agora:
+                continue
+            with self._trava:
+                if job.id in self._em_execucao:
+                    continue
+                self._em_execucao.add(job.id)
+            disparados.append(job.id)
+            self._disparar(job, estado, agora)
+        return disparados
+
+    def executar_agora(self, agora=None):
+        """Executa já todos os jobs deste executor, sem disputar a liderança (uso manual)."""
+        agora = agora or timezone.now()
+        for job in self.jobs.values():
+            estado, _ = EstadoJob.objects.get_or_create(job=job.id)
+            with self._trava:
+                self._em_execucao.add(job.id)
+            self._executar(job, estado, agora)
+
+    def _disparar(self, job, estado, agora):
+        atraso = (agora - (estado.proxima_execucao or agora)).total_seconds()
+        if job.tolerancia is not None and atraso > job.tolerancia and not estado.tentativa:
+            try:
+                self._registrar(
+                    job, estado, agora, agora, 0, "perdida",
+                    f"Atraso de {atraso:.0f}s acima da tolerância de {job.tolerancia:.0f}s.",
+                )
+            finally:
+                self._liberar(job)
+            return
+        if self.sincrono:
+            self._executar(job, estado, agora)
+        else:
+            self._pool_execucao().submit(self._executar, job, estado, agora)
+
+    def _pool_execucao(self):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self._paralelos, thread_name_prefix="job")
+        return self._pool
+
+    def _executar(self, job, estado, agora):
+        inicio = time.perf_counter()
+        try:
+            retorno = job.executar()
+            resultado, detalhe = "sucesso", "" if retorno is None else str(retorno)
+        except Exception as e:
+            print(f"jobs: {job.id} falhou:", e)
+            resultado, detalhe = "erro", traceback.format_exc()[-TAMANHO_MAXIMO_DETALHE:]
+        duracao = time.perf_counter() - inicio
+        try:
+            self._registrar(job, estado, agora, agora + datetime.timedelta(seconds=duracao), duracao, resultado, detalhe)
+        except Exception as e:
+            print(f"jobs: erro ao registrar a execução de {job.id}:", e)
+            if self.sincrono:
+                raise
+        finally:
+            self._liberar(job)
+            if not self.sincrono:
+                connection.close()
+
+    def _registrar(self, job, estado, agora, fim, duracao, resultado, detalhe):
+        tentativa = estado.tentativa
+        ExecucaoJob.objects.create(
+            job=job.id, dono=self.identidade, tentativa=tentativa + 1,
+            agendada_para=estado.proxima_execucao, inicio=agora, duracao=duracao,
+            resultado=resultado, detalhe=detalhe,
+        )
+
+        estado.ultima_execucao = agora
+        estado.ultimo_resultado = resultado
+        if resultado == "erro":
+            estado.falhas_consecutivas += 1
+            if tentativa < job.tentativas:
+                estado.tentativa = tentativa + 1
+                estado.proxima_execucao = job.nova_tentativa(fim, estado.tentativa)
+            else:
+                estado.tentativa = 0
+                estado.proxima_execucao = job.proxima(fim)
+        else:
+            if resultado == "sucesso":
+                estado.falhas_consecutivas = 0
+                estado.ultimo_sucesso = fim
+            estado.tentativa = 0
+            estado.proxima_execucao = job.proxima(fim)
+        estado.save()
+
+    def _liberar(self, job):
+        with self._trava:
+            self._em_execucao.discard(job.id)
+
+    # Laço em segundo plano
+
+    def iniciar(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._parar.clear()
+        self._thread = threading.Thread(target=self.executar_continuamente, name="jobs", daemon=True)
+        self._thread.start()
+        atexit.register(self.encerrar)
+
+    def executar_continuamente(self):
+        try:
+            while not self._parar.is_set():
+                try:
+                    self.ciclo()
+                except Exception as e:
+                    # Banco indisponível, por exemplo: tenta de novo na próxima volta
+                    print("jobs: erro no ciclo:", e)
+                self._parar.wait(self.intervalo + random.uniform(0, 1))
+        finally:
+            connection.close()
+
+    def encerrar(self, timeout=10):
+        self._parar.set()
+        if self._thread is not None and self._thread.is_alive():
+            self._thread.join(timeout)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+        atexit.unregister(self.encerrar)
+        if self.lider:
+            try:
+                self.liberar_lideranca()
+            except Exception as e:
+                print("jobs: erro ao liberar a liderança:", e)
+
+
+def deve_iniciar(argv=None, ambiente=None):
+    """
+    Se este processo deve disputar a liderança. Só os processos que se
+    declaram servidores participam: os módulos WSGI/ASGI definem
+    ``JOBS_HABILITADOS=1`` (que liga ``HABILITADO``) e o processo filho do
+    runserver entra por conta própria. Testes, scripts com
+    ``django.setup()``, os demais comandos do manage.py/django-admin e o
+    processo do autoreloader ficam de fora; ``JOBS_HABILITADOS=0`` desliga
+    em todos.
+    """
+    argv = sys.argv if argv is None else argv
+    ambiente = os.environ if ambiente is None else ambiente
+    if ambiente.get("JOBS_HABILITADOS") == "0":
+        return False
+    programa = os.path.basename(argv[0]) if argv else ""
+    if programa.startswith(("manage", "django-admin")):
+        comando = argv[1] if len(argv) > 1 else ""
+        if comando != "runserver":
+            return False
+        return ambiente.get("RUN_MAIN") == "true" or "--noreload" in argv
+    return configuracao()["HABILITADO"]
+
+
+_executor = None
+
+
+def executor(jobs):
+    """Instância do processo, configurada por ``settings.JOBS_AGENDADOS``."""
+    global _executor
+    if _executor is None:
+        config = configuracao()
+        _executor = ExecutorJobs(
+            jobs,
+            duracao_lideranca=config["DURACAO_LIDERANCA"],
+            intervalo=config["INTERVALO"],
+            paralelos=config["PARALELOS"],
+        )
+    return _executor
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.monitoramento.jobs import ExecutorJobs, configuracao
+from apps.monitoramento.scheduler import JOBS
+
+
+class Command(BaseCommand):
+    help = (
+        "Executa os jobs agendados em primeiro plano (ex.: num contêiner só para jobs). "
+        "Disputa a liderança com os demais processos; só o líder executa."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--job", action="append",
+            help="Executa agora só este job (pode repetir), registrando a execução, e sai.",
+        )
+
+    def handle(self, *args, **options):
+        config = configuracao()
+        if options["job"]:
+            desconhecidos = set(options["job"]) - {job.id for job in JOBS}
+            if desconhecidos:
+                raise CommandError(f"Jobs desconhecidos: {', '.join(sorted(desconhecidos))}")
+            executor = ExecutorJobs([job for job in JOBS if job.id in options["job"]], sincrono=True)
+            executor.executar_agora()
+            return
+
+        executor = ExecutorJobs(
+            JOBS,
+            duracao_lideranca=config["DURACAO_LIDERANCA"],
+            intervalo=config["INTERVALO"],
+            paralelos=config["PARALELOS"],
+        )
+        self.stdout.write(f"Executor de jobs {executor.identidade}: {', '.join(job.id for job in JOBS)}")
+        try:
+            executor.executar_continuamente()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            executor.encerrar()
@@ -0,0 +1,23 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from apps.monitoramento.resumos import reconstruir_resumos
+
+
+class Command(BaseCommand):
+    help = "Recalcula os resumos horários e diários a partir dos registros climáticos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--desde", type=datetime.date.fromisoformat,
+            help="Primeiro dia (AAAA-MM-DD); padrão: o registro mais antigo.",
+        )
+        parser.add_argument(
+            "--ate", type=datetime.date.fromisoformat,
+            help="Último dia (AAAA-MM-DD); padrão: o registro mais recente.",
+        )
+
+    def handle(self, *args, **options):
+        dias = reconstruir_resumos(desde=options["desde"], ate=options["ate"])
+        self.stdout.write(self.style.SUCCESS(f"Resumos climáticos de {dias} dias recalculados."))
@@ -2,6 +2,24 @@ from django.db import models
 from django.utils import timezone
 
 
+class Localizacao(models.Model):
+    """Propriedade ou talhão com coleta climática própria."""
+    nome = models.CharField(max_length=100, unique=True)
+    latitude = models.FloatField()
+    longitude = models.FloatField()
+    ativa = models.BooleanField(default=True, help_text="Incluída na coleta automática")
+    criado_em = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "localizacoes"
+        ordering = ["nome"]
+        verbose_name = "localização"
+        verbose_name_plural = "localizações"
+
+    def __str__(self):
+        return self.nome
+
+
 class RegistroClimatico(models.Model):
     temperatura = models.FloatField()
     umidade = models.FloatField(null=True, blank=True)
@@ -14,9 +32,146 @@ class RegistroClimatico(models.Model):
     )
 
     data_coleta = models.DateTimeField(default=timezone.now)
+    # Identificador da estação que enviou a leitura (vazio nas coletas da API)
+    estacao = models.CharField(max_length=50, null=True, blank=True)
+    localizacao = models.ForeignKey(
+        Localizacao, on_delete=models.SET_NULL, null=True, blank=True, related_name="registros"
+    )
 
     criado_em = models.DateTimeField(auto_now_add=True)
     atualizado_em = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Recalcular os resumos é sempre uma faixa de data_coleta
+            models.Index(fields=["data_coleta"], name="registro_clima_coleta_idx"),
+            models.Index(fields=["localizacao", "-data_coleta"], name="registro_clima_local_idx"),
+        ]
+        constraints = [
+            # Reenvio de uma leitura da estação substitui a anterior (NULLs não conflitam)
+            models.UniqueConstraint(fields=["estacao", "data_coleta"], name="registro_clima_estacao_coleta_uniq"),
+        ]
+
     def __str__(self):
         return f"{self.data_coleta} - {self.temperatura}°C"
+
+
+class ResumoClimatico(models.Model):
+    """Mínimo, máximo e média das leituras de um período e localização (ver ``resumos.py``)."""
+    # Vazia para as leituras sem localização (estações não vinculadas)
+    localizacao = models.ForeignKey(Localizacao, on_delete=models.CASCADE, null=True, blank=True, related_name="+")
+    quantidade = models.PositiveIntegerField(default=0)
+    # Umidade e vento são opcionais: quantas leituras entraram em cada média
+    quantidade_umidade = models.PositiveIntegerField(default=0)
+    quantidade_vento = models.PositiveIntegerField(default=0)
+
+    temperatura_min = models.FloatField(null=True, blank=True)
+    temperatura_max = models.FloatField(null=True, blank=True)
+    temperatura_media = models.FloatField(null=True, blank=True)
+
+    umidade_min = models.FloatField(null=True, blank=True)
+    umidade_max = models.FloatField(null=True, blank=True)
+    umidade_media = models.FloatField(null=True, blank=True)
+
+    vento_min = models.FloatField(null=True, blank=True)
+    vento_max = models.FloatField(null=True, blank=True)
+    vento_media = models.FloatField(null=True, blank=True)
+
+    atualizado_em = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        abstract = True
+
+
+class ResumoClimaticoHorario(ResumoClimatico):
+    hora = models.DateTimeField()
+
+    class Meta:
+        db_table = "resumo_climatico_horario"
+        ordering = ["-hora"]
+        constraints = [
+            models.UniqueConstraint(fields=["localizacao", "hora"], name="resumo_horario_local_hora_uniq"),
+        ]
+        indexes = [models.Index(fields=["hora"], name="resumo_horario_hora_idx")]
+
+    def __str__(self):
+        return f"{self.hora:%d/%m/%Y %H:00} - {self.temperatura_media}°C"
+
+
+class ResumoClimaticoDiario(ResumoClimatico):
+    dia = models.DateField()
+
+    class Meta:
+        db_table = "resumo_climatico_diario"
+        ordering = ["-dia"]
+        constraints = [
+            models.UniqueConstraint(fields=["localizacao", "dia"], name="resumo_diario_local_dia_uniq"),
+        ]
+        indexes = [models.Index(fields=["dia"], name="resumo_diario_dia_idx")]
+
+    def __str__(self):
+        return f"{self.dia:%d/%m/%Y} - {self.temperatura_media}°C"
+
+
+class LiderancaJobs(models.Model):
+    """Concessão de liderança: só o processo ``dono`` executa os jobs até ``expira_em`` (ver ``jobs.py``)."""
+    nome = models.CharField(max_length=50, unique=True)
+    dono = models.CharField(max_length=100)
+    adquirida_em = models.DateTimeField()
+    expira_em = models.DateTimeField()
+
+    class Meta:
+        db_table = "lideranca_jobs"
+        verbose_name = "liderança dos jobs"
+        verbose_name_plural = "liderança dos jobs"
+
+    def __str__(self):
+        return f"{self.nome}: {self.dono} até {self.expira_em:%d/%m/%Y %H:%M:%S}"
+
+
+RESULTADOS_JOB = [
+    ("sucesso", "Sucesso"),
+    ("erro", "Erro"),
+    ("perdida", "Perdida (atraso acima da tolerância)"),
+]
+
+
+class EstadoJob(models.Model):
+    """Agenda e situação de cada job; sobrevive a reinícios e à troca de líder."""
+    job = models.CharField(max_length=50, unique=True)
+    proxima_execucao = models.DateTimeField(null=True, blank=True)
+    # Tentativa em andamento depois de uma falha (0 = execução normal)
+    tentativa = models.PositiveIntegerField(default=0)
+    falhas_consecutivas = models.PositiveIntegerField(default=0)
+    ultima_execucao = models.DateTimeField(null=True, blank=True)
+    ultimo_resultado = models.CharField(max_length=10, choices=RESULTADOS_JOB, blank=True)
+    ultimo_sucesso = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = "estado_jobs"
+        ordering = ["job"]
+
+    def __str__(self):
+        return self.job
+
+
+class ExecucaoJob(models.Model):
+    """Histórico das execuções dos jobs."""
+    job = models.CharField(max_length=50)
+    dono = models.CharField(max_length=100)
+    tentativa = models.PositiveIntegerField(default=1)
+    agendada_para = models.DateTimeField(null=True, blank=True)
+    inicio = models.DateTimeField()
+    duracao = models.FloatField(default=0, help_text="Segundos")
+    resultado = models.CharField(max_length=10, choices=RESULTADOS_JOB)
+    detalhe = models.TextField(blank=True)
+
+    class Meta:
+        db_table = "execucoes_jobs"
+        ordering = ["-inicio"]
+        indexes = [
+            models.Index(fields=["job", "-inicio"], name="execucao_job_inicio_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.job} {self.inicio:%d/%m/%Y %H:%M} - {self.resultado}"
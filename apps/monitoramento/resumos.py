@@ -0,0 +1,160 @@
+"""
+Resumos horários e diários das leituras climáticas.
+
+``ResumoClimaticoHorario`` e ``ResumoClimaticoDiario`` guardam mínimo,
+máximo e média de temperatura, umidade e vento de cada localização (as
+leituras sem localização têm resumos próprios). As telas de histórico
+leem só os resumos (no máximo 24 linhas por dia e localização), em vez
+de agrupar as leituras brutas a cada requisição.
+
+Os resumos são recalculados por faixa: ``atualizar_resumos(inicio, fim)``
+refaz as horas que contêm o intervalo a partir das leituras (consulta por
+faixa de ``data_coleta``, que usa o índice) e os dias a partir das horas,
+e substitui os resumos da faixa. Não é um upsert: a localização faz parte
+da chave e pode ser nula, e nulos não entram em conflito. Os sinais de
+``RegistroClimatico`` chamam a função a cada ``save``/``delete``; quem
+grava em lote (``bulk_create``, sem sinais) chama uma vez com o intervalo
+do lote. ``reconstruir_resumos`` (comando ``reconstruir_resumos_climaticos``)
+preenche o histórico existente.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, FloatField, Max, Min, Sum
+from django.db.models.functions import TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import RegistroClimatico, ResumoClimaticoDiario, ResumoClimaticoHorario
+
+VARIAVEIS = ("temperatura", "umidade", "vento")
+# Campo com a quantidade de leituras usada na média de cada variável
+QUANTIDADES = {"temperatura": "quantidade", "umidade": "quantidade_umidade", "vento": "quantidade_vento"}
+# Quantos dias cada passo da reconstrução processa
+PASSO_RECONSTRUCAO = 31
+
+
+def _inicio_do_dia(dia):
+    return timezone.make_aware(datetime.datetime.combine(dia, datetime.time.min))
+
+
+def _horas(inicio, fim):
+    """Resumos das horas em ``[inicio, fim)``, a partir das leituras."""
+    agregados = {
+        "quantidade": Count("id"),
+        "quantidade_umidade": Count("umidade"),
+        "quantidade_vento": Count("vento"),
+    }
+    for variavel in VARIAVEIS:
+        agregados[f"{variavel}_min"] = Min(variavel)
+        agregados[f"{variavel}_max"] = Max(variavel)
+        agregados[f"{variavel}_media"] = Avg(variavel)
+    linhas = (
+        RegistroClimatico.objects
+        .filter(data_coleta__gte=inicio, data_coleta__lt=fim)
+        .annotate(periodo=TruncHour("data_coleta"))
+        .values("localizacao", "periodo")
+        .annotate(**agregados)
+        .order_by("localizacao", "periodo")
+    )
+    return [
+        ResumoClimaticoHorario(localizacao_id=linha.pop("localizacao"), hora=linha.pop("periodo"), **linha)
+        for linha in linhas
+    ]
+
+
+def _dias(inicio, fim):
+    """
+    Resumos dos dias em ``[inicio, fim)``, a partir dos resumos horários
+    (no máximo 24 linhas por dia): as médias são ponderadas pela
+    quantidade de leituras de cada hora.
+    """
+    # Os nomes das anotações não podem coincidir com os campos do modelo
+    agregados = {f"total_{campo}": Sum(campo) for campo in set(QUANTIDADES.values())}
+    for variavel, quantidade in QUANTIDADES.items():
+        agregados[f"menor_{variavel}"] = Min(f"{variavel}_min")
+        agregados[f"maior_{variavel}"] = Max(f"{variavel}_max")
+        agregados[f"soma_{variavel}"] = Sum(F(f"{variavel}_media") * F(quantidade), output_field=FloatField())
+    linhas = (
+        ResumoClimaticoHorario.objects
+        .filter(hora__gte=_inicio_do_dia(inicio), hora__lt=_inicio_do_dia(fim))
+        .annotate(periodo=TruncDate("hora"))
+        .values("localizacao", "periodo")
+        .annotate(**agregados)
+        .order_by("localizacao", "periodo")
+    )
+    resumos = []
+    for linha in linhas:
+        resumo = ResumoClimaticoDiario(localizacao_id=linha["localizacao"], dia=linha["periodo"])
+        for variavel, quantidade in QUANTIDADES.items():
+            total = linha[f"total_{quantidade}"]
+            setattr(resumo, quantidade, total)
+            setattr(resumo, f"{variavel}_min", linha[f"menor_{variavel}"])
+            setattr(resumo, f"{variavel}_max", linha[f"maior_{variavel}"])
+            setattr(resumo, f"{variavel}_media", linha[f"soma_{variavel}"] / total if total else None)
+        resumos.append(resumo)
+    return resumos
+
+
+def _gravar(modelo, campo, resumos, inicio, fim):
+    """Substitui os resumos de ``[inicio, fim)``, de todas as localizações, pelos recalculados."""
+    modelo.objects.filter(**{f"{campo}__gte": inicio, f"{campo}__lt": fim}).delete()
+    modelo.objects.bulk_create(resumos)
+
+
+def atualizar_resumos(inicio, fim=None):
+    """Recalcula as horas e os dias que contêm as leituras de ``inicio`` até ``fim`` (inclusive)."""
+    fim = fim or inicio
+    inicio, fim = timezone.localtime(inicio), timezone.localtime(fim)
+
+    hora_inicio = inicio.replace(minute=0, second=0, microsecond=0)
+    hora_fim = fim.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+    dia_inicio, dia_fim = inicio.date(), fim.date() + datetime.timedelta(days=1)
+
+    with transaction.atomic():
+        _gravar(ResumoClimaticoHorario, "hora", _horas(hora_inicio, hora_fim), hora_inicio, hora_fim)
+        _gravar(ResumoClimaticoDiario, "dia", _dias(dia_inicio, dia_fim), dia_inicio, dia_fim)
+
+
+def reconstruir_resumos(desde=None, ate=None, passo_dias=PASSO_RECONSTRUCAO):
+    """
+    Recalcula os resumos de ``desde`` até ``ate`` (datas; padrão: todo o
+    histórico), ``passo_dias`` por vez. Retorna quantos dias têm leituras.
+    """
+    if desde is None or ate is None:
+        extremos = RegistroClimatico.objects.aggregate(primeira=Min("data_coleta"), ultima=Max("data_coleta"))
+        if extremos["primeira"] is None:
+            return 0
+        desde = desde or timezone.localdate(extremos["primeira"])
+        ate = ate or timezone.localdate(extremos["ultima"])
+
+    dia = desde
+    while dia <= ate:
+        ultimo = min(dia + datetime.timedelta(days=passo_dias - 1), ate)
+        dia_seguinte = ultimo + datetime.timedelta(days=1)
+        atualizar_resumos(_inicio_do_dia(dia), _inicio_do_dia(dia_seguinte) - datetime.timedelta(microseconds=1))
+        dia = dia_seguinte
+
+    return ResumoClimaticoDiario.objects.filter(dia__gte=desde, dia__lte=ate).values("dia").distinct().count()
+
+
+def registro_salvo(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    anterior = getattr(instance, "_data_coleta_anterior", None)
+    if anterior is not None and anterior != instance.data_coleta:
+        atualizar_resumos(anterior)
+    atualizar_resumos(instance.data_coleta)
+
+
+def registro_alterando(sender, instance, raw=False, **kwargs):
+    """Guarda a data antiga para tirar a leitura do período de onde ela saiu."""
+    instance._data_coleta_anterior = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._data_coleta_anterior = (
+        RegistroClimatico.objects.filter(pk=instance.pk).values_list("data_coleta", flat=True).first()
+    )
+
+
+def registro_excluido(sender, instance, **kwargs):
+    atualizar_resumos(instance.data_coleta)
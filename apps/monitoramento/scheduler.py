@@ -1,15 +1,32 @@
-from apscheduler.schedulers.background import BackgroundScheduler
-from django.conf import settings
-from .tasks import coletar_clima
+import datetime
+
+from . import jobs
+from .jobs import Job
+
+# Os caminhos só são importados no processo líder
+JOBS = [
+    Job("coleta_clima", "apps.monitoramento.tasks.coletar_clima",
+        datetime.timedelta(hours=6), jitter=300, tentativas=3, espera=60),
+    Job("previsao_estoque", "apps.estoque.previsao.calcular_previsoes",
+        datetime.timedelta(days=1), jitter=900, tentativas=2, espera=300),
+    Job("atividades_atrasadas", "apps.atividades.tasks.marcar_atividades_atrasadas",
+        datetime.timedelta(minutes=15), jitter=30, tentativas=2, espera=30,
+        tolerancia=datetime.timedelta(minutes=15)),
+    Job("atividades_recorrentes", "apps.atividades.tasks.gerar_atividades_recorrentes",
+        datetime.timedelta(hours=1), jitter=60, tentativas=3, espera=60),
+    Job("arquivar_logs", "apps.atividades.tasks.arquivar_logs_antigos",
+        datetime.timedelta(days=1), jitter=900, tentativas=3, espera=600),
+]
 
-scheduler = None
 
 def start_scheduler():
-    global scheduler
-    if scheduler is not None:
-        return
-
-    scheduler = BackgroundScheduler(timezone=getattr(settings, "TIME_ZONE", None))
-    scheduler.add_job(coletar_clima, "interval", hours=6, id="coleta_clima")
-    scheduler.start()
-    print("Scheduler iniciado: coleta_clima a cada 6 horas")
+    """Inicia o executor de jobs neste processo, se ele for candidato a líder."""
+    if not jobs.deve_iniciar():
+        return None
+    executor = jobs.executor(JOBS)
+    executor.iniciar()
+    print(
+        f"Executor de jobs iniciado ({executor.identidade}): "
+        + ", ".join(job.id for job in JOBS)
+    )
+    return executor
@@ -1,8 +1,27 @@
-from django.test import TestCase, Client
+from django.db import OperationalError
+from django.test import TestCase, TransactionTestCase, Client, override_settings
 from django.urls import reverse
 from django.utils import timezone
 from unittest.mock import patch, Mock
-from .models import RegistroClimatico
+from django.core.cache import cache
+import threading
+import time
+from . import clima
+from django.core.management import call_command
+from io import StringIO
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import json
+from . import coleta, ingestao, jobs, resumos
+from .models import (
+    EstadoJob,
+    ExecucaoJob,
+    LiderancaJobs,
+    Localizacao,
+    RegistroClimatico,
+    ResumoClimaticoDiario,
+    ResumoClimaticoHorario,
+)
 from .views import WEATHERCODES
 import datetime
 
@@ -51,6 +70,8 @@ class WeatherCodesTest(TestCase):
 class ViewsTest(TestCase):
     def setUp(self):
         self.client = Client()
+        # As respostas da API ficam em cache entre as requisições
+        cache.clear()
         # Cria alguns registros de teste
         self.registro1 = RegistroClimatico.objects.create(
             temperatura=22.0,
@@ -71,7 +92,7 @@ class ViewsTest(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'monitoramento.html')
     
-    @patch('apps.monitoramento.views.requests.get')
+    @patch('apps.monitoramento.clima.requests.get')
     def test_clima_atual_view_success(self, mock_get):
         """Testa a view clima_atual com sucesso na API"""
         # Mock da resposta da API
@@ -95,7 +116,7 @@ class ViewsTest(TestCase):
         self.assertEqual(response.context['vento'], 12.0)
         self.assertEqual(response.context['condicao_texto'], "Poucas nuvens")
     
-    @patch('apps.monitoramento.views.requests.get')
+    @patch('apps.monitoramento.clima.requests.get')
     def test_clima_atual_view_api_error(self, mock_get):
         """Testa a view clima_atual com erro na API"""
         mock_get.side_effect = Exception("Erro de conexão")
@@ -107,7 +128,7 @@ class ViewsTest(TestCase):
         self.assertIn('erro', response.context)
         self.assertContains(response, "Erro ao consultar API")
     
-    @patch('apps.monitoramento.views.requests.get')
+    @patch('apps.monitoramento.clima.requests.get')
     def test_clima_atual_view_empty_data(self, mock_get):
         """Testa a view clima_atual com dados vazios da API"""
         mock_response = Mock()
@@ -146,7 +167,7 @@ class ViewsTest(TestCase):
         registros = response.context['registros']
         self.assertEqual(registros.count(), 2)
     
-    @patch('apps.monitoramento.views.requests.get')
+    @patch('apps.monitoramento.clima.requests.get')
     def test_previsao_view_success(self, mock_get):
         """Testa a view previsao com sucesso"""
         mock_response = Mock()
@@ -167,7 +188,7 @@ class ViewsTest(TestCase):
         self.assertIn('previsao', response.context)
         self.assertIsNotNone(response.context['previsao'])
     
-    @patch('apps.monitoramento.views.requests.get')
+    @patch('apps.monitoramento.clima.requests.get')
     def test_previsao_view_error(self, mock_get):
         """Testa a view previsao com erro"""
         mock_get.side_effect = Exception("Timeout")
@@ -230,4 +251,541 @@ class TemplateTest(TestCase):
         """Testa se o template de monitoramento renderiza corretamente"""
         response = self.client.get(reverse('monitoramento'))
         self.assertEqual(response.status_code, 200)
-        self.assertTemplateUsed(response, 'monitoramento.html')
\ No newline at end of file
+        self.assertTemplateUsed(response, 'monitoramento.html')
+
+
+class CacheClimaTest(TestCase):
+    PARAMETROS = {"current": "temperature_2m", "timezone": "auto"}
+
+    def setUp(self):
+        cache.clear()
+
+    def resposta(self, temperatura):
+        resposta = Mock()
+        resposta.json.return_value = {"current": {"temperature_2m": temperatura}}
+        resposta.raise_for_status = Mock()
+        return resposta
+
+    def consultar(self, ttl=60):
+        return clima.consultar(-15.6, -56.1, self.PARAMETROS, "current", ttl)[0]
+
+    @patch('apps.monitoramento.clima.requests.get')
+    def test_resposta_fresca_nao_chama_api(self, mock_get):
+        mock_get.return_value = self.resposta(20)
+        self.assertEqual(self.consultar(), {"temperature_2m": 20})
+        self.assertEqual(self.consultar(), {"temperature_2m": 20})
+        self.assertEqual(mock_get.call_count, 1)
+
+    @patch('apps.monitoramento.clima.requests.get')
+    def test_obsoleto_serve_cache_e_atualiza_uma_vez(self, mock_get):
+        mock_get.return_value = self.resposta(20)
+        self.consultar()
+
+        liberar = threading.Event()
+        def lenta(*args, **kwargs):
+            liberar.wait(5)
+            return self.resposta(30)
+        mock_get.side_effect = lenta
+
+        # Vencido: todas as chamadas recebem o valor antigo na hora
+        for _ in range(5):
+            self.assertEqual(self.consultar(ttl=0), {"temperature_2m": 20})
+        self.assertEqual(mock_get.call_count, 2)
+
+        liberar.set()
+        for _ in range(100):
+            if self.consultar(ttl=60) == {"temperature_2m": 30}:
+                break
+            time.sleep(0.02)
+        self.assertEqual(self.consultar(ttl=60), {"temperature_2m": 30})
+
+    @patch('apps.monitoramento.clima.requests.get')
+    def test_falha_da_api_fica_em_cache(self, mock_get):
+        """Com o cache vazio e a API fora do ar, só a primeira requisição espera pela API"""
+        mock_get.side_effect = Exception("Timeout")
+        for _ in range(3):
+            with self.assertRaisesMessage(clima.ErroClima, "Erro ao consultar API: Timeout"):
+                self.consultar()
+        self.assertEqual(mock_get.call_count, 1)
+
+        # Passado o TEMPO_FALHA a API é consultada de novo
+        cache.delete(clima.chave_cache(-15.6, -56.1, self.PARAMETROS) + ":falha")
+        mock_get.side_effect = None
+        mock_get.return_value = self.resposta(20)
+        self.assertEqual(self.consultar(), {"temperature_2m": 20})
+
+    @patch('apps.monitoramento.clima.requests.get')
+    def test_api_fora_do_ar_usa_ultimo_registro(self, mock_get):
+        mock_get.side_effect = Exception("Timeout")
+        RegistroClimatico.objects.create(temperatura=19.5, vento=3.0, condicao=61)
+
+        response = self.client.get(reverse('monitoramento'))
+
+        self.assertEqual(response.context['temperatura'], 19.5)
+        self.assertEqual(response.context['condicao_texto'], "Chuva leve")
+        self.assertContains(response, "Exibindo o último registro")
+
+
+class ResumoClimaticoTest(TestCase):
+    def setUp(self):
+        self.hora = timezone.make_aware(datetime.datetime(2025, 3, 10, 14, 0))
+
+    def registrar(self, minutos, temperatura, umidade=None, vento=None):
+        return RegistroClimatico.objects.create(
+            temperatura=temperatura, umidade=umidade, vento=vento, condicao=0,
+            data_coleta=self.hora + datetime.timedelta(minutes=minutos),
+        )
+
+    def test_insercao_atualiza_resumos(self):
+        """Cada registro salvo recalcula a hora e o dia em que caiu"""
+        self.registrar(5, 20.0, umidade=60.0)
+        self.registrar(35, 24.0, vento=10.0)
+        self.registrar(70, 30.0)
+
+        hora = ResumoClimaticoHorario.objects.get(hora=self.hora)
+        self.assertEqual(hora.quantidade, 2)
+        self.assertEqual((hora.temperatura_min, hora.temperatura_max, hora.temperatura_media), (20.0, 24.0, 22.0))
+        # Umidade e vento só consideram as leituras que os têm
+        self.assertEqual(hora.umidade_media, 60.0)
+        self.assertEqual(hora.vento_max, 10.0)
+
+        dia = ResumoClimaticoDiario.objects.get(dia=datetime.date(2025, 3, 10))
+        self.assertEqual(dia.quantidade, 3)
+        self.assertEqual(dia.temperatura_max, 30.0)
+        self.assertAlmostEqual(dia.temperatura_media, 74.0 / 3)
+
+    def test_alteracao_e_exclusao(self):
+        """Mudar a data de coleta tira a leitura da hora antiga; excluir a última apaga o resumo"""
+        registro = self.registrar(5, 20.0)
+        registro.data_coleta = self.hora + datetime.timedelta(hours=2)
+        registro.save()
+
+        self.assertFalse(ResumoClimaticoHorario.objects.filter(hora=self.hora).exists())
+        self.assertTrue(ResumoClimaticoHorario.objects.filter(hora=self.hora + datetime.timedelta(hours=2)).exists())
+
+        registro.delete()
+        self.assertFalse(ResumoClimaticoHorario.objects.exists())
+        self.assertFalse(ResumoClimaticoDiario.objects.exists())
+
+    def test_carga_em_lote_e_reconstrucao(self):
+        """bulk_create não dispara sinais: atualizar_resumos cobre o lote e o comando refaz o histórico"""
+        RegistroClimatico.objects.bulk_create([
+            RegistroClimatico(
+                temperatura=float(minuto % 10), condicao=0,
+                data_coleta=self.hora + datetime.timedelta(minutes=minuto),
+            )
+            for minuto in range(0, 3 * 24 * 60, 10)
+        ])
+        self.assertFalse(ResumoClimaticoHorario.objects.exists())
+
+        resumos.atualizar_resumos(self.hora, self.hora + datetime.timedelta(hours=1))
+        self.assertEqual(ResumoClimaticoHorario.objects.count(), 2)
+
+        saida = StringIO()
+        call_command("reconstruir_resumos_climaticos", stdout=saida)
+        self.assertIn("4 dias", saida.getvalue())
+        self.assertEqual(ResumoClimaticoHorario.objects.count(), 72)
+        self.assertEqual(ResumoClimaticoHorario.objects.get(hora=self.hora).quantidade, 6)
+        self.assertEqual(
+            ResumoClimaticoDiario.objects.get(dia=datetime.date(2025, 3, 11)).quantidade, 144
+        )
+
+    def test_historico_le_os_resumos(self):
+        """As telas de histórico mostram os resumos, não as leituras"""
+        agora = timezone.now()
+        for minutos in range(3):
+            RegistroClimatico.objects.create(
+                temperatura=20.0 + minutos, condicao=0, data_coleta=agora - datetime.timedelta(minutes=minutos)
+            )
+
+        response = self.client.get(reverse('historico_clima_semanal'))
+        medias = list(response.context['medias_por_dia'])
+        self.assertEqual(sum(dia.quantidade for dia in medias), 3)
+        self.assertEqual(sum(hora.quantidade for hora in response.context['registros']), 3)
+
+    def test_resumos_separados_por_localizacao(self):
+        """Leituras de localizações diferentes não se misturam nos resumos nem no histórico"""
+        sede = Localizacao.objects.create(nome="Sede", latitude=1, longitude=-56.0)
+        retiro = Localizacao.objects.create(nome="Retiro", latitude=2, longitude=-56.0)
+        agora = timezone.now()
+        for localizacao, temperatura in ((sede, 20.0), (sede, 22.0), (retiro, 35.0)):
+            RegistroClimatico.objects.create(
+                temperatura=temperatura, condicao=0, localizacao=localizacao,
+                data_coleta=agora - datetime.timedelta(minutes=1),
+            )
+
+        hora = ResumoClimaticoHorario.objects.get(localizacao=sede)
+        self.assertEqual((hora.quantidade, hora.temperatura_max), (2, 22.0))
+        self.assertEqual(ResumoClimaticoDiario.objects.get(localizacao=retiro).temperatura_media, 35.0)
+
+        for nome in ('historico_clima_semanal', 'historico_clima_mensal'):
+            response = self.client.get(reverse(nome), {"local": retiro.pk})
+            self.assertEqual(response.context['localizacao'], retiro)
+            self.assertEqual([dia.temperatura_max for dia in response.context['medias_por_dia']], [35.0])
+        response = self.client.get(reverse('historico_clima_semanal'), {"local": sede.pk})
+        self.assertEqual([h.temperatura_media for h in response.context['registros']], [21.0])
+
+
+@override_settings(INGESTAO_SENSORES={'ASSINCRONO': False, 'TOKEN': 'segredo'})
+class IngestaoLeiturasTest(TestCase):
+    def setUp(self):
+        self.instante = timezone.make_aware(datetime.datetime(2025, 3, 10, 14, 0))
+        self.epoch = int(self.instante.timestamp())
+
+    def enviar(self, corpo, content_type="text/plain", token="segredo", **parametros):
+        url = reverse('ingerir_leituras')
+        if parametros:
+            url += "?" + "&".join(f"{k}={v}" for k, v in parametros.items())
+        return self.client.post(url, corpo, content_type=content_type, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+    def test_line_protocol(self):
+        """Lote em line protocol gravado como leituras de sensor e refletido nos resumos"""
+        corpo = "\n".join(
+            f"clima,estacao=sede temperatura={20 + i},umidade=60,vento=3.5,condicao=1i {self.epoch + i * 60}"
+            for i in range(5)
+        )
+        response = self.enviar(corpo, precision="s")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["aceitas"], 5)
+        registro = RegistroClimatico.objects.get(estacao="sede", data_coleta=self.instante)
+        self.assertEqual((registro.temperatura, registro.condicao, registro.origem), (20.0, 1, "Sensor"))
+        self.assertEqual(ResumoClimaticoHorario.objects.get(hora=self.instante).temperatura_max, 24.0)
+
+    def test_reenvio_e_idempotente(self):
+        """Reenviar a mesma leitura (estação, data_coleta) atualiza em vez de duplicar"""
+        linha = '{"estacao": "sede", "data_coleta": "%s", "temperatura": %s}'
+        self.enviar(linha % (self.instante.isoformat(), 20), content_type="application/x-ndjson")
+        corpo = "\n".join([
+            linha % (self.instante.isoformat(), 21),
+            linha % (self.instante.isoformat(), 22),
+            linha % ((self.instante + datetime.timedelta(minutes=1)).isoformat(), 23),
+        ])
+        response = self.enviar(corpo, content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(RegistroClimatico.objects.filter(estacao="sede").count(), 2)
+        self.assertEqual(RegistroClimatico.objects.get(data_coleta=self.instante).temperatura, 22.0)
+        self.assertEqual(ResumoClimaticoHorario.objects.get(hora=self.instante).quantidade, 2)
+
+    def test_linhas_invalidas_voltam_na_resposta(self):
+        corpo = "\n".join([
+            '{"estacao": "sede", "temperatura": 25}',
+            '{"estacao": "sede", "temperatura": 250}',
+            '{"temperatura": 25}',
+            'não é json',
+        ])
+        response = self.enviar(corpo, content_type="application/x-ndjson")
+
+        self.assertEqual(response.status_code, 202)
+        dados = response.json()
+        self.assertEqual((dados["aceitas"], dados["rejeitadas"]), (1, 3))
+        self.assertEqual([erro["linha"] for erro in dados["erros"]], [2, 3, 4])
+
+        response = self.enviar("clima temperatura=abc", precision="s")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(RegistroClimatico.objects.count(), 1)
+
+    def test_numeros_enormes_sao_rejeitados(self):
+        """Inteiros grandes demais para float (ou para a coluna) viram erro de validação, não 500"""
+        enorme = "9" * 400
+        response = self.enviar(
+            f'{{"estacao": "sede", "temperatura": {enorme}}}\n{{"estacao": "sede", "temperatura": 20, "condicao": {enorme}}}',
+            content_type="application/x-ndjson",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(response.json()["erros"]), 2)
+
+        response = self.enviar(f"clima,estacao=sede temperatura={enorme}i", precision="s")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(RegistroClimatico.objects.exists())
+
+    def test_token_obrigatorio(self):
+        response = self.enviar("clima,estacao=sede temperatura=20", token="errado")
+        self.assertEqual(response.status_code, 401)
+        # Token com caracteres fora do ASCII é recusado, não vira 500
+        response = self.enviar("clima,estacao=sede temperatura=20", token="é")
+        self.assertEqual(response.status_code, 401)
+        self.assertFalse(RegistroClimatico.objects.exists())
+
+
+class BufferLeiturasTest(TransactionTestCase):
+    def setUp(self):
+        self.agora = timezone.now()
+
+    def leituras(self, n):
+        agora = self.agora
+        return [
+            RegistroClimatico(
+                estacao="sede", temperatura=20.0, condicao=0, origem="Sensor",
+                data_coleta=agora - datetime.timedelta(seconds=i),
+            )
+            for i in range(n)
+        ]
+
+    def test_descarrega_ao_atingir_tamanho(self):
+        buffer = ingestao.BufferLeituras(tamanho_lote=10, intervalo=60)
+        buffer.adicionar(self.leituras(5))
+        self.assertEqual(buffer.pendentes(), 5)
+
+        buffer.adicionar(self.leituras(10))
+        for _ in range(100):
+            if RegistroClimatico.objects.count() == 10:
+                break
+            time.sleep(0.02)
+        # As 5 primeiras se repetem no segundo envio: upsert
+        self.assertEqual(RegistroClimatico.objects.count(), 10)
+        buffer.encerrar()
+
+    def test_buffer_cheio_recusa_envio(self):
+        with patch.object(ingestao, "TAMANHO_MAXIMO_FILA", 3):
+            buffer = ingestao.BufferLeituras(tamanho_lote=10**6, intervalo=60)
+            self.assertTrue(buffer.adicionar(self.leituras(3)))
+            self.assertFalse(buffer.adicionar(self.leituras(1)))
+        buffer.encerrar()
+        self.assertEqual(RegistroClimatico.objects.count(), 3)
+
+    def test_leitura_invalida_nao_trava_o_buffer(self):
+        """A leitura que viola restrição é isolada e descartada; as demais são gravadas"""
+        buffer = ingestao.BufferLeituras(tamanho_lote=100, intervalo=60, assincrono=False)
+        leituras = self.leituras(7)
+        leituras[4].localizacao_id = 999_999  # localização inexistente
+        buffer._fila = leituras
+
+        self.assertEqual(buffer.descarregar(), 6)
+        self.assertEqual(buffer.pendentes(), 0)
+        self.assertEqual(RegistroClimatico.objects.count(), 6)
+        self.assertFalse(RegistroClimatico.objects.filter(data_coleta=leituras[4].data_coleta).exists())
+
+    def test_banco_indisponivel_devolve_o_lote(self):
+        buffer = ingestao.BufferLeituras(tamanho_lote=100, intervalo=60, assincrono=False)
+        buffer._fila = self.leituras(3)
+        with patch.object(ingestao, "gravar_leituras", side_effect=OperationalError("database is locked")):
+            self.assertEqual(buffer.descarregar(), 0)
+        self.assertEqual(buffer.pendentes(), 3)
+        self.assertEqual(buffer.descarregar(), 3)
+
+
+class ExecutorJobsTest(TestCase):
+    def setUp(self):
+        self.agora = timezone.now()
+        self.chamadas = []
+        self.falhas = 0
+
+    def executor(self, *lista, identidade="processo-a"):
+        return jobs.ExecutorJobs(list(lista), identidade=identidade, duracao_lideranca=60, sincrono=True)
+
+    def ok(self):
+        self.chamadas.append("ok")
+        return "feito"
+
+    def falha(self):
+        self.chamadas.append("falha")
+        if self.falhas:
+            self.falhas -= 1
+            raise RuntimeError("API fora do ar")
+
+    def test_somente_o_lider_executa(self):
+        """Um segundo processo só assume quando a concessão expira"""
+        job = jobs.Job("teste", self.ok, intervalo=3600)
+        a = self.executor(job)
+        b = self.executor(job, identidade="processo-b")
+
+        self.assertEqual(a.ciclo(self.agora), ["teste"])
+        self.assertEqual(b.ciclo(self.agora + datetime.timedelta(seconds=30)), [])
+        self.assertTrue(a.renovar_lideranca(self.agora + datetime.timedelta(seconds=50)))
+        # a renovou em +50s: b ainda não assume em +100s
+        self.assertFalse(b.renovar_lideranca(self.agora + datetime.timedelta(seconds=100)))
+
+        # a parou de renovar: b assume e não repete o job (a agenda está no banco)
+        depois = self.agora + datetime.timedelta(seconds=200)
+        self.assertEqual(b.ciclo(depois), [])
+        self.assertTrue(b.lider)
+        self.assertEqual(LiderancaJobs.objects.get().dono, "processo-b")
+        self.assertFalse(a.renovar_lideranca(depois))
+        self.assertEqual(self.chamadas, ["ok"])
+
+    def test_registra_execucao_e_agenda_proxima(self):
+        job = jobs.Job("teste", self.ok, intervalo=600, jitter=30)
+        executor = self.executor(job)
+        # Job novo: a primeira execução é espalhada pelo jitter
+        executor.ciclo(self.agora - datetime.timedelta(seconds=31))
+        self.assertFalse(ExecucaoJob.objects.exists())
+        executor.ciclo(self.agora)
+
+        execucao = ExecucaoJob.objects.get()
+        self.assertEqual((execucao.job, execucao.resultado, execucao.detalhe), ("teste", "sucesso", "feito"))
+        estado = EstadoJob.objects.get(job="teste")
+        self.assertIsNotNone(estado.ultimo_sucesso)
+        espera = (estado.proxima_execucao - self.agora).total_seconds()
+        self.assertTrue(600 <= espera <= 631)
+
+        # Ainda não venceu
+        self.assertEqual(executor.ciclo(self.agora + datetime.timedelta(seconds=300)), [])
+
+    def test_falha_repete_com_espera_crescente(self):
+        self.falhas = 5
+        job = jobs.Job("teste", self.falha, intervalo=3600, tentativas=2, espera=10)
+        executor = self.executor(job)
+
+        executor.ciclo(self.agora)
+        estado = EstadoJob.objects.get(job="teste")
+        self.assertEqual((estado.tentativa, estado.ultimo_resultado), (1, "erro"))
+        self.assertAlmostEqual((estado.proxima_execucao - self.agora).total_seconds(), 10, delta=1)
+
+        executor.ciclo(estado.proxima_execucao)
+        estado.refresh_from_db()
+        self.assertEqual(estado.tentativa, 2)
+        segunda = estado.proxima_execucao
+
+        # Esgotadas as tentativas, volta ao intervalo normal
+        executor.ciclo(segunda)
+        estado.refresh_from_db()
+        self.assertEqual((estado.tentativa, estado.falhas_consecutivas), (0, 3))
+        self.assertGreaterEqual((estado.proxima_execucao - segunda).total_seconds(), 3600)
+        self.assertIn("API fora do ar", ExecucaoJob.objects.filter(resultado="erro").first().detalhe)
+        self.assertEqual(
+            list(ExecucaoJob.objects.order_by("inicio").values_list("tentativa", flat=True)), [1, 2, 3]
+        )
+
+    def test_atraso_acima_da_tolerancia_e_registrado_como_perdido(self):
+        job = jobs.Job("teste", self.ok, intervalo=900, tolerancia=900)
+        executor = self.executor(job)
+        EstadoJob.objects.create(job="teste", proxima_execucao=self.agora - datetime.timedelta(hours=3))
+
+        executor.ciclo(self.agora)
+
+        self.assertEqual(self.chamadas, [])
+        self.assertEqual(ExecucaoJob.objects.get().resultado, "perdida")
+        self.assertGreater(EstadoJob.objects.get().proxima_execucao, self.agora)
+
+    def test_execucoes_perdidas_viram_uma(self):
+        """Sem tolerância, várias execuções perdidas rodam uma única vez"""
+        job = jobs.Job("teste", self.ok, intervalo=60)
+        executor = self.executor(job)
+        EstadoJob.objects.create(job="teste", proxima_execucao=self.agora - datetime.timedelta(days=1))
+
+        executor.ciclo(self.agora)
+        executor.ciclo(self.agora + datetime.timedelta(seconds=5))
+        self.assertEqual(self.chamadas, ["ok"])
+
+    @override_settings(JOBS_AGENDADOS={"HABILITADO": True})
+    def test_processos_que_nao_disputam_a_lideranca(self):
+        self.assertFalse(jobs.deve_iniciar(["manage.py", "migrate"], {}))
+        self.assertFalse(jobs.deve_iniciar(["manage.py", "runserver"], {}))
+        self.assertTrue(jobs.deve_iniciar(["manage.py", "runserver"], {"RUN_MAIN": "true"}))
+        self.assertTrue(jobs.deve_iniciar(["manage.py", "runserver", "--noreload"], {}))
+        self.assertFalse(jobs.deve_iniciar(["manage.py", "runserver"], {"RUN_MAIN": "true", "JOBS_HABILITADOS": "0"}))
+        self.assertFalse(jobs.deve_iniciar(["/usr/bin/django-admin", "migrate"], {}))
+        with override_settings(JOBS_AGENDADOS={"HABILITADO": False}):
+            # pytest, celery, scripts com django.setup()...
+            self.assertFalse(jobs.deve_iniciar(["/usr/bin/pytest"], {}))
+            self.assertFalse(jobs.deve_iniciar(["utils/benchmark_ingestao.py"], {}))
+        with override_settings(JOBS_AGENDADOS={"HABILITADO": True}):
+            # wsgi.py/asgi.py definiram JOBS_HABILITADOS=1
+            self.assertTrue(jobs.deve_iniciar(["/usr/bin/gunicorn", "agromanager.wsgi"], {}))
+            self.assertFalse(jobs.deve_iniciar(["/usr/bin/django-admin", "migrate"], {}))
+
+
+class _OpenMeteoFalso(BaseHTTPRequestHandler):
+    """Responde como a Open-Meteo, com atraso fixo; latitude 99 devolve erro 500."""
+    atraso = 0.2
+
+    def do_GET(self):
+        parametros = parse_qs(urlsplit(self.path).query)
+        latitude = float(parametros["latitude"][0])
+        self.server.requisicoes.append(latitude)
+        time.sleep(self.atraso)
+        if latitude == 99:
+            self.send_response(500)
+            self.end_headers()
+            return
+        corpo = json.dumps({"current": {
+            "temperature_2m": 20 + latitude,
+            "relative_humidity_2m": 55,
+            "wind_speed_10m": 4.5,
+            "weather_code": 2,
+        }}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class ColetaLocalizacoesTest(TestCase):
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), _OpenMeteoFalso)
+        self.servidor.requisicoes = []
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.url = f"http://127.0.0.1:{self.servidor.server_port}/v1/forecast"
+
+    def coletar(self, **kwargs):
+        kwargs.setdefault("limitador", coleta.LimitadorTaxa(por_segundo=1000, rajada=1000))
+        return coleta.coletar_localizacoes(
+            url=self.url, sessao=coleta.criar_sessao(50), paralelos=50, **kwargs
+        )
+
+    def test_coleta_todas_as_localizacoes_em_paralelo(self):
+        """40 talhões com 0,2s por resposta levam pouco mais que um"""
+        for i in range(40):
+            Localizacao.objects.create(nome=f"Talhão {i}", latitude=i / 10, longitude=-56.0)
+        Localizacao.objects.create(nome="Desativado", latitude=5, longitude=-56.0, ativa=False)
+
+        inicio = time.perf_counter()
+        registros, falhas = self.coletar()
+        duracao = time.perf_counter() - inicio
+
+        self.assertEqual((len(registros), falhas), (40, {}))
+        self.assertLess(duracao, 2)
+        self.assertEqual(RegistroClimatico.objects.filter(origem="automatico").count(), 40)
+        registro = RegistroClimatico.objects.get(localizacao__nome="Talhão 15")
+        self.assertEqual((registro.temperatura, registro.umidade, registro.condicao), (21.5, 55, 2))
+        # Um resumo por talhão, cada um com a sua leitura
+        self.assertEqual(
+            list(ResumoClimaticoDiario.objects.values_list("quantidade", flat=True).distinct()), [1]
+        )
+        self.assertEqual(ResumoClimaticoDiario.objects.count(), 40)
+
+    def test_falha_de_uma_localizacao_nao_impede_as_demais(self):
+        Localizacao.objects.create(nome="Sede", latitude=1, longitude=-56.0)
+        Localizacao.objects.create(nome="Fora do ar", latitude=99, longitude=-56.0)
+
+        registros, falhas = self.coletar()
+
+        self.assertEqual([r.localizacao.nome for r in registros], ["Sede"])
+        self.assertIn("Fora do ar", falhas)
+
+    def test_sem_localizacao_usa_coordenadas_padrao(self):
+        registros, _ = self.coletar()
+        self.assertEqual(self.servidor.requisicoes, [coleta.LATITUDE_PADRAO])
+        self.assertIsNone(registros[0].localizacao)
+
+    def test_limite_de_requisicoes_por_host(self):
+        """Rajada de 2, depois 10 por segundo: a 5ª requisição sai depois de ~0,3s"""
+        _OpenMeteoFalso.atraso, atraso = 0, _OpenMeteoFalso.atraso
+        self.addCleanup(setattr, _OpenMeteoFalso, "atraso", atraso)
+        for i in range(5):
+            Localizacao.objects.create(nome=f"Talhão {i}", latitude=i, longitude=-56.0)
+
+        inicio = time.perf_counter()
+        self.coletar(limitador=coleta.LimitadorTaxa(por_segundo=10, rajada=2))
+        self.assertGreaterEqual(time.perf_counter() - inicio, 0.28)
+
+    def test_views_usam_a_localizacao_escolhida(self):
+        cache.clear()
+        sede = Localizacao.objects.create(nome="Sede", latitude=1, longitude=-56.0)
+        retiro = Localizacao.objects.create(nome="Retiro", latitude=2, longitude=-55.0)
+
+        with patch.object(clima, "URL_API", self.url):
+            response = self.client.get(reverse('monitoramento'), {"local": retiro.pk})
+
+        self.assertEqual(response.context['localizacao'], retiro)
+        self.assertEqual(response.context['temperatura'], 22.0)
+        self.assertContains(response, "Sede")
+        self.assertEqual(self.servidor.requisicoes, [2.0])
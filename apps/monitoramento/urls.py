@@ -6,4 +6,5 @@ urlpatterns = [
     path("previsao/", views.previsao, name="previsao_semana"),
     path("historico/semanal/", views.historico_semanal, name="historico_clima_semanal"),
     path("historico/mensal/", views.historico_mensal, name="historico_clima_mensal"),
+    path("api/leituras/", views.ingerir_leituras, name="ingerir_leituras"),
 ]
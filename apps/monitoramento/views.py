@@ -1,9 +1,14 @@
+import secrets
+
+from django.core.exceptions import RequestDataTooBig
+from django.http import JsonResponse
 from django.shortcuts import render
 from django.utils import timezone
-from .models import RegistroClimatico
-from django.db.models import Avg, Max, Min
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .models import Localizacao, RegistroClimatico, ResumoClimaticoDiario, ResumoClimaticoHorario
+from . import clima, coleta, ingestao
 import datetime
-import requests
 
 WEATHERCODES = {
     0: "Céu limpo",
@@ -26,32 +31,47 @@ WEATHERCODES = {
     99: "Tempestade com granizo forte",
 }
 
-def clima_atual(request):
+def _localizacao(request):
+    """Localização escolhida em ``?local=<id>`` (ou a primeira ativa); None usa as coordenadas padrão."""
+    ativas = Localizacao.objects.filter(ativa=True)
+    local = request.GET.get("local", "")
+    escolhida = ativas.filter(pk=local).first() if local.isdigit() else None
+    return escolhida or ativas.first()
 
-    latitude = -15.5958
-    longitude = -56.0969
+def _coordenadas(localizacao):
+    if localizacao is None:
+        return coleta.LATITUDE_PADRAO, coleta.LONGITUDE_PADRAO
+    return localizacao.latitude, localizacao.longitude
 
-    url = (
-        "https://api.open-meteo.com/v1/forecast"
-        f"?latitude={latitude}"
-        f"&longitude={longitude}"
-        "&current=temperature_2m,wind_speed_10m,wind_direction_10m,weather_code"
-        "&timezone=auto"
-    )
+def _ultimo_registro(localizacao=None):
+    registros = RegistroClimatico.objects.all()
+    if localizacao is not None:
+        registros = registros.filter(localizacao=localizacao)
+    return registros.order_by("-data_coleta").first()
 
+def clima_atual(request):
+    localizacao = _localizacao(request)
+    latitude, longitude = _coordenadas(localizacao)
+    locais = {"localizacao": localizacao, "localizacoes": Localizacao.objects.filter(ativa=True)}
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        data = r.json().get("current", {})
-    except Exception as e:
-        return render(request, "monitoramento.html", {
-            "erro": f"Erro ao consultar API: {e}"
-        })
-
-    if not data:
-        return render(request, "monitoramento.html", {
-            "erro": "A API não retornou dados climáticos."
-        })
+        data, _ = clima.consultar(
+            latitude, longitude,
+            {"current": "temperature_2m,wind_speed_10m,wind_direction_10m,weather_code", "timezone": "auto"},
+            "current", clima.TTL_ATUAL,
+        )
+    except clima.ErroClima as e:
+        # API fora do ar e nada em cache: mostra o último registro coletado
+        ultimo = _ultimo_registro(localizacao)
+        context = {"erro": str(e), **locais}
+        if ultimo:
+            context.update({
+                "erro": f"{e} Exibindo o último registro, de {timezone.localtime(ultimo.data_coleta):%d/%m/%Y %H:%M}.",
+                "temperatura": ultimo.temperatura,
+                "vento": ultimo.vento,
+                "direcao": None,
+                "condicao_texto": WEATHERCODES.get(ultimo.condicao, "Indefinido"),
+            })
+        return render(request, "monitoramento.html", context)
 
     temperatura = data.get("temperature_2m")
     vento = data.get("wind_speed_10m")
@@ -66,6 +86,7 @@ def clima_atual(request):
         "direcao": direcao,
         "condicao_texto": condicao_texto,
         "erro": None,
+        **locais,
     }
 
     return render(request, "monitoramento.html", context)
@@ -75,57 +96,102 @@ def index(request):
     return render(request, "monitoramento.html", context)
 
 def historico_semanal(request):
-    hoje = timezone.now().date()
+    localizacao = _localizacao(request)
+    hoje = timezone.localdate()
     inicio = hoje - datetime.timedelta(days=7)
-    registros = RegistroClimatico.objects.filter(data_coleta__date__gte=inicio).order_by("-data_coleta")
-    medias_por_dia = (
-        RegistroClimatico.objects
-        .filter(data_coleta__date__gte=inicio)
-        .extra({"dia": "date(data_coleta)"})
-        .values("dia")
-        .annotate(media_temp=Avg("temperatura"))
-        .order_by("dia")
-    )
-    return render(request, "historico_climatico_semanal.html", {"registros": registros, "medias_por_dia": medias_por_dia})
+    # Resumos por hora e por dia (ver resumos.py), não as leituras brutas
+    registros = ResumoClimaticoHorario.objects.filter(
+        localizacao=localizacao,
+        hora__gte=timezone.make_aware(datetime.datetime.combine(inicio, datetime.time.min)),
+    ).order_by("-hora")
+    medias_por_dia = ResumoClimaticoDiario.objects.filter(localizacao=localizacao, dia__gte=inicio).order_by("dia")
+    return render(request, "historico_climatico_semanal.html", {
+        "registros": registros,
+        "medias_por_dia": medias_por_dia,
+        "localizacao": localizacao,
+        "localizacoes": Localizacao.objects.filter(ativa=True),
+    })
 
 def previsao(request):
-    latitude = -15.5958
-    longitude = -56.0969
-    url = f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}&daily=temperature_2m_max,temperature_2m_min,precipitation_probability_max&timezone=auto"
+    localizacao = _localizacao(request)
+    latitude, longitude = _coordenadas(localizacao)
     previsao = {}
+    ultimo = None
     try:
-        r = requests.get(url, timeout=10)
-        r.raise_for_status()
-        previsao = r.json().get("daily", {})
-    except Exception as e:
+        previsao, _ = clima.consultar(
+            latitude, longitude,
+            {"daily": "temperature_2m_max,temperature_2m_min,precipitation_probability_max", "timezone": "auto"},
+            "daily", clima.TTL_PREVISAO,
+        )
+    except clima.ErroClima as e:
         print("previsao: erro ao obter dados:", e)
-        previsao = {}
+        ultimo = _ultimo_registro(localizacao)
 
-    return render(request, "previsao.html", {"previsao": previsao})
+    return render(request, "previsao.html", {
+        "previsao": previsao,
+        "ultimo": ultimo,
+        "localizacao": localizacao,
+        "localizacoes": Localizacao.objects.filter(ativa=True),
+    })
 
 def historico_mensal(request):
-    hoje = timezone.now().date()
+    localizacao = _localizacao(request)
+    hoje = timezone.localdate()
     inicio = hoje - datetime.timedelta(days=30)
 
-    registros = (
-        RegistroClimatico.objects
-        .filter(data_coleta__date__gte=inicio)
-        .order_by("-data_coleta")
-    )
-    medias_por_dia = (
-        RegistroClimatico.objects
-        .filter(data_coleta__date__gte=inicio)
-        .extra({"dia": "date(data_coleta)"})
-        .values("dia")
-        .annotate(media_temp=Avg("temperatura"))
-        .order_by("dia")
-    )
+    registros = ResumoClimaticoDiario.objects.filter(localizacao=localizacao, dia__gte=inicio).order_by("-dia")
+    medias_por_dia = registros.order_by("dia")
 
     context = {
         "registros": registros,
         "medias_por_dia": medias_por_dia,
-        "periodo": "Últimos 30 dias"
+        "periodo": "Últimos 30 dias",
+        "localizacao": localizacao,
+        "localizacoes": Localizacao.objects.filter(ativa=True),
     }
 
     return render(request, "historico_climatico_mensal.html", context)
 
+
+
+@csrf_exempt
+@require_POST
+def ingerir_leituras(request):
+    """
+    Recebe um lote de leituras das estações (``Authorization: Bearer <token>``).
+
+    NDJSON com ``Content-Type: application/x-ndjson``; line protocol com
+    ``text/plain``. ``?precision=s|ms|us|ns`` define a unidade dos
+    timestamps numéricos. Responde 202 com quantas leituras foram aceitas e
+    as linhas rejeitadas.
+    """
+    config = ingestao.configuracao()
+    token = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not config["TOKEN"] or not secrets.compare_digest(token.encode(), config["TOKEN"].encode()):
+        return JsonResponse({"erro": "Token inválido."}, status=401)
+
+    precisao = request.GET.get("precision")
+    if precisao is not None and precisao not in ingestao.PRECISOES:
+        return JsonResponse({"erro": "precision deve ser s, ms, us ou ns."}, status=400)
+    try:
+        texto = request.body.decode("utf-8")
+    except RequestDataTooBig:
+        return JsonResponse({"erro": "Lote muito grande; divida o envio."}, status=413)
+    except UnicodeDecodeError:
+        return JsonResponse({"erro": "O corpo deve estar em UTF-8."}, status=400)
+
+    if request.content_type in ("application/x-ndjson", "application/json"):
+        leituras, erros = ingestao.ler_ndjson(texto, precisao or "s")
+    else:
+        leituras, erros = ingestao.ler_line_protocol(texto, precisao or "ns")
+
+    if not leituras:
+        return JsonResponse({"aceitas": 0, "erros": erros[:ingestao.MAXIMO_ERROS_RESPOSTA]}, status=400)
+    if not ingestao.buffer().adicionar(leituras):
+        resposta = JsonResponse({"erro": "Buffer de ingestão cheio; tente novamente."}, status=503)
+        resposta["Retry-After"] = "5"
+        return resposta
+    return JsonResponse(
+        {"aceitas": len(leituras), "rejeitadas": len(erros), "erros": erros[:ingestao.MAXIMO_ERROS_RESPOSTA]},
+        status=202,
+    )
@@ -0,0 +1,136 @@
+"""
+Benchmark de concorrência das movimentações de estoque.
+
+Uso:  python utils/benchmark_estoque.py [threads] [movimentacoes_por_thread]
+
+Cria um banco SQLite temporário, dispara várias threads registrando
+entradas e saídas no mesmo item e compara o saldo final com o esperado:
+
+* "legado": lê o saldo, altera em Python e chama ``item.save()`` (como a
+  view fazia antes) — perde atualizações sob concorrência;
+* "atomico": ``MovimentacaoEstoque.registrar()``, com UPDATE condicional.
+
+O processo termina com código 1 se o modo atômico perder alguma
+atualização ou deixar o saldo negativo.
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agromanager.settings")
+
+SALDO_INICIAL = 1000
+
+
+def _configurar_banco(caminho):
+    from django.conf import settings
+
+    settings.DATABASES["default"]["NAME"] = caminho
+    settings.DATABASES["default"].setdefault("OPTIONS", {})["timeout"] = 60
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+def _legado(item_id, tipo, quantidade):
+    from apps.estoque.models import Item, MovimentacaoEstoque
+
+    item = Item.objects.get(pk=item_id)
+    if tipo == "entrada":
+        item.quantidade_atual += quantidade
+    elif item.quantidade_atual >= quantidade:
+        item.quantidade_atual -= quantidade
+    else:
+        return False
+    time.sleep(0)  # cede o GIL entre a leitura e a escrita, como numa requisição real
+    item.save()
+    MovimentacaoEstoque.objects.create(
+        item=item, tipo_movimentacao=tipo, quantidade_movimentada=quantidade,
+        usuario_responsavel="benchmark",
+    )
+    return True
+
+
+def _atomico(item_id, tipo, quantidade):
+    from apps.estoque.models import EstoqueInsuficiente, MovimentacaoEstoque
+
+    movimentacao = MovimentacaoEstoque(
+        item_id=item_id, tipo_movimentacao=tipo, quantidade_movimentada=quantidade,
+        usuario_responsavel="benchmark",
+    )
+    try:
+        movimentacao.registrar()
+    except EstoqueInsuficiente:
+        return False
+    return True
+
+
+def executar(modo, funcao, threads, por_thread):
+    from django.db import connection
+
+    from apps.estoque.models import Categoria, Item, MovimentacaoEstoque
+
+    categoria, _ = Categoria.objects.get_or_create(nome="Benchmark")
+    item = Item.objects.create(nome=f"Ração {modo}", categoria=categoria, quantidade_atual=SALDO_INICIAL)
+    aplicadas = []
+    trava = threading.Lock()
+
+    def trabalhador(indice):
+        saldo = 0
+        try:
+            for i in range(por_thread):
+                # Threads pares dão entrada de 3, ímpares dão saída de 2
+                tipo, quantidade = ("entrada", 3) if (indice + i) % 2 == 0 else ("saida", 2)
+                if funcao(item.pk, tipo, quantidade):
+                    saldo += quantidade if tipo == "entrada" else -quantidade
+        finally:
+            connection.close()
+        with trava:
+            aplicadas.append(saldo)
+
+    inicio = time.perf_counter()
+    grupo = [threading.Thread(target=trabalhador, args=(n,)) for n in range(threads)]
+    for t in grupo:
+        t.start()
+    for t in grupo:
+        t.join()
+    duracao = time.perf_counter() - inicio
+
+    item.refresh_from_db()
+    esperado = SALDO_INICIAL + sum(aplicadas)
+    total = threads * por_thread
+    registros = MovimentacaoEstoque.objects.filter(item=item).count()
+    print(
+        f"{modo:>8}: {total} movimentações em {duracao:.2f}s ({total / duracao:.0f}/s) | "
+        f"saldo final {item.quantidade_atual}, esperado {esperado}, "
+        f"perdidas {abs(esperado - item.quantidade_atual)} | registros {registros}"
+    )
+    return item.quantidade_atual == esperado and item.quantidade_atual >= 0
+
+
+def main():
+    threads = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    por_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as pasta:
+        _configurar_banco(os.path.join(pasta, "benchmark.sqlite3"))
+        print(f"{threads} threads x {por_thread} movimentações no mesmo item")
+        executar("legado", _legado, threads, por_thread)
+        ok = executar("atomico", _atomico, threads, por_thread)
+
+    if not ok:
+        print("FALHA: o modo atômico perdeu atualizações.")
+        sys.exit(1)
+    print("OK: nenhuma atualização perdida no modo atômico.")
+
+
+if __name__ == "__main__":
+    main()
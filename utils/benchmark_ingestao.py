@@ -0,0 +1,134 @@
+"""
+Benchmark da ingestão de leituras das estações meteorológicas.
+
+Uso:  python utils/benchmark_ingestao.py [leituras] [estacoes] [tamanho_envio]
+
+Cria um banco SQLite temporário e compara:
+
+* "legado": um ``RegistroClimatico.objects.create`` por leitura (como
+  ``coletar_clima`` faz), com os resumos recalculados a cada save;
+* "endpoint": lotes em line protocol enviados ao ``ingerir_leituras``,
+  acumulados no buffer e gravados com ``bulk_create`` (upsert).
+
+Depois reenvia todos os lotes para conferir que o upsert não duplica
+leituras. O processo termina com código 1 se sobrar ou faltar alguma
+leitura ou se a vazão do endpoint ficar abaixo de ``VAZAO_MINIMA``.
+"""
+import datetime
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agromanager.settings")
+
+TOKEN = "benchmark"
+LEITURAS_LEGADO = 2000
+VAZAO_MINIMA = 1000  # leituras/s
+
+
+def _configurar_banco(caminho):
+    from django.conf import settings
+
+    settings.DEBUG = False  # não acumula as consultas em connection.queries
+    settings.DATABASES["default"]["NAME"] = caminho
+    settings.DATABASES["default"].setdefault("OPTIONS", {})["timeout"] = 60
+    settings.INGESTAO_SENSORES = {"ASSINCRONO": True, "TAMANHO_LOTE": 5000, "INTERVALO": 0.5, "TOKEN": TOKEN}
+
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    call_command("migrate", run_syncdb=True, verbosity=0)
+
+
+def _lotes(leituras, estacoes, tamanho_envio):
+    """Line protocol: uma leitura por segundo por estação, terminando agora."""
+    fim = int(time.time())
+    por_estacao = -(-leituras // estacoes)
+    linhas = [
+        f"clima,estacao=estacao-{e:03d} temperatura={20 + (i % 150) / 10},umidade={50 + i % 40},"
+        f"vento={(i % 70) / 10},condicao={i % 4}i {fim - i}"
+        for i in range(por_estacao)
+        for e in range(estacoes)
+    ][:leituras]
+    return ["\n".join(linhas[i:i + tamanho_envio]) for i in range(0, len(linhas), tamanho_envio)]
+
+
+def legado(total):
+    from django.utils import timezone
+
+    from apps.monitoramento.models import RegistroClimatico
+
+    agora = timezone.now()
+    inicio = time.perf_counter()
+    for i in range(total):
+        RegistroClimatico.objects.create(
+            temperatura=20 + (i % 150) / 10, umidade=50 + i % 40, vento=(i % 70) / 10,
+            condicao=i % 4, origem="Sensor", estacao="legado",
+            data_coleta=agora - datetime.timedelta(seconds=i),
+        )
+    duracao = time.perf_counter() - inicio
+    print(f"{'legado':>9}: {total} leituras em {duracao:.2f}s ({total / duracao:.0f}/s)")
+    RegistroClimatico.objects.filter(estacao="legado").delete()
+
+
+def endpoint(lotes, rotulo):
+    from django.test import Client
+    from django.urls import reverse
+
+    from apps.monitoramento import ingestao
+
+    cliente = Client()
+    url = reverse("ingerir_leituras") + "?precision=s"
+    total = 0
+    inicio = time.perf_counter()
+    for corpo in lotes:
+        resposta = cliente.post(url, corpo, content_type="text/plain", HTTP_AUTHORIZATION=f"Bearer {TOKEN}")
+        if resposta.status_code != 202:
+            print(f"FALHA: resposta {resposta.status_code}: {resposta.content[:200]!r}")
+            sys.exit(1)
+        total += resposta.json()["aceitas"]
+    recebido = time.perf_counter() - inicio
+    ingestao.buffer().encerrar(timeout=600)
+    duracao = time.perf_counter() - inicio
+    print(
+        f"{rotulo:>9}: {total} leituras em {duracao:.2f}s ({total / duracao:.0f}/s) | "
+        f"requisições respondidas em {recebido:.2f}s ({total / recebido:.0f}/s)"
+    )
+    return total / duracao
+
+
+def main():
+    leituras = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    estacoes = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    tamanho_envio = int(sys.argv[3]) if len(sys.argv) > 3 else 1000
+
+    with tempfile.TemporaryDirectory() as pasta:
+        _configurar_banco(os.path.join(pasta, "benchmark.sqlite3"))
+        from apps.monitoramento.models import RegistroClimatico, ResumoClimaticoHorario
+
+        print(f"{leituras} leituras de {estacoes} estações, {tamanho_envio} por requisição")
+        legado(min(leituras, LEITURAS_LEGADO))
+        lotes = _lotes(leituras, estacoes, tamanho_envio)
+        vazao = endpoint(lotes, "endpoint")
+        endpoint(lotes, "reenvio")
+
+        gravadas = RegistroClimatico.objects.count()
+        resumidas = sum(ResumoClimaticoHorario.objects.values_list("quantidade", flat=True))
+
+    print(f"registros {gravadas}, esperado {leituras} | leituras nos resumos horários {resumidas}")
+    if gravadas != leituras or resumidas != leituras:
+        print("FALHA: leituras duplicadas ou perdidas.")
+        sys.exit(1)
+    if vazao < VAZAO_MINIMA:
+        print(f"FALHA: vazão abaixo de {VAZAO_MINIMA} leituras/s.")
+        sys.exit(1)
+    print("OK: sem duplicatas e vazão acima do mínimo.")
+
+
+if __name__ == "__main__":
+    main()
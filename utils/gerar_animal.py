@@ -1,28 +1,23 @@
+"""
+Gerador de animais sintéticos para testes de carga.
+
+Uso direto:   python utils/gerar_animal.py [quantidade]
+Via Django:   python manage.py gerar_animais --count 1000000 --seed 42
+
+A geração é determinística: cada lote usa seu próprio ``random.Random``
+derivado da semente e do índice do lote, então o resultado é o mesmo com
+um ou vários processos. As datas são contadas a partir de uma data de
+referência fixa (``DATA_REFERENCIA``), não do dia da execução. O Faker só é usado uma vez, para montar os pools
+de textos; as linhas em si saem de ``random``.
+"""
 import os
-import sys
-import django
 import random
-from datetime import datetime, timedelta
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
 from decimal import Decimal
 from pathlib import Path
 
-# ------------------ CONFIGURAÇÃO DO DJANGO ------------------
-# Caminho base do projeto (onde está o manage.py)
-BASE_DIR = Path(__file__).resolve().parent.parent
-sys.path.append(str(BASE_DIR))
-
-# Ajusta o módulo de configurações do Django
-os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agromanager.settings")
-
-# Inicializa o Django
-django.setup()
-# ------------------------------------------------------------
-
-from faker import Faker
-from apps.animal.models import Animal  
-
-fake = Faker('pt_BR')
-
 # Nomes específicos para animais
 NOMES_ANIMAIS = {
     "Bovino": ["Boi", "Vaca", "Bezerro", "Bezerra", "Novilho", "Novilha", "Touro"],
@@ -42,90 +37,154 @@ RACAS = {
     "Aves": ["Rhode Island", "Sussex", "Leghorn", "Plymouth"]
 }
 
-def criar_animais(quantidade=50):
-    animais_criados = []
-    
-    for i in range(quantidade):
-        especie = random.choice(list(NOMES_ANIMAIS.keys()))
-        nome = random.choice(NOMES_ANIMAIS[especie])
-        raca = random.choice(RACAS[especie])
-
-        if nome in ["Boi", "Touro", "Novilho", "Galo", "Bode", "Carneiro", "Cavalo", "Jumento", "Pato", "Bezerro", "Leitão", "Cabrito", "Cordeiro", "Potro"]:
-            sexo = "Macho"
-        else:
-            sexo = "Fêmea"
-
-        data_nascimento = fake.date_between(start_date='-5y', end_date='today')
+NOMES_MACHOS = {
+    "Boi", "Touro", "Novilho", "Galo", "Bode", "Carneiro", "Cavalo", "Jumento",
+    "Pato", "Bezerro", "Leitão", "Cabrito", "Cordeiro", "Potro", "Porco",
+    "Marrano", "Cachaço", "Frango", "Pinto",
+}
 
-        if random.random() > 0.3:
-            data_aquisicao = fake.date_between(start_date=data_nascimento, end_date='today')
-            origem = random.choice(["Compra", "Nascimento Interno", "Doação"])
+# Faixas de valor de compra e peso inicial por espécie
+VALORES = {"Bovino": (800, 3000), "Equino": (1500, 5000), "Suíno": (200, 800),
+           "Caprino": (200, 800), "Ovino": (200, 800), "Aves": (10, 50)}
+PESOS = {"Bovino": (30, 80), "Suíno": (1, 5), "Caprino": (2, 8), "Ovino": (2, 8),
+         "Equino": (40, 100), "Aves": (0.1, 0.5)}
+
+ESPECIES = list(NOMES_ANIMAIS)
+# Base das datas de nascimento e aquisição: a mesma semente gera as mesmas datas em qualquer dia
+DATA_REFERENCIA = date(2025, 1, 1)
+DIAS_IDADE_MAXIMA = 5 * 365
+TAMANHO_POOL_TEXTOS = 500
+
+CAMPOS = (
+    "nome", "especie", "raca", "sexo", "data_nascimento", "numero_identificacao",
+    "finalidade", "peso_inicial", "observacoes", "data_aquisicao", "origem", "valor_compra",
+)
+
+
+def montar_pools(seed):
+    """Pré-calcula com o Faker os textos usados como observações."""
+    from faker import Faker
+
+    fake = Faker('pt_BR')
+    fake.seed_instance(seed)
+    return {"observacoes": [fake.text(max_nb_chars=100) for _ in range(TAMANHO_POOL_TEXTOS)]}
+
+
+def gerar_lote(seed, indice_lote, tamanho_lote, quantidade, pools, referencia):
+    """
+    Gera as linhas (tuplas na ordem de ``CAMPOS``) do lote ``indice_lote``.
+
+    Função pura, sem acesso ao banco, para poder rodar em outro processo.
+    """
+    rnd = random.Random(seed * 1_000_003 + indice_lote)
+    inicio = indice_lote * tamanho_lote
+    fim = min(inicio + tamanho_lote, quantidade)
+    observacoes = pools["observacoes"]
+    sufixo_seed = seed % 10000
+    linhas = []
+
+    for indice in range(inicio, fim):
+        especie = rnd.choice(ESPECIES)
+        nome = rnd.choice(NOMES_ANIMAIS[especie])
+        raca = rnd.choice(RACAS[especie])
+        sexo = "Macho" if nome in NOMES_MACHOS else "Fêmea"
+
+        idade = rnd.randint(0, DIAS_IDADE_MAXIMA)
+        data_nascimento = referencia - timedelta(days=idade)
+
+        if rnd.random() > 0.3:
+            data_aquisicao = referencia - timedelta(days=rnd.randint(0, idade))
+            origem = rnd.choice(["Compra", "Nascimento Interno", "Doação"])
         else:
             data_aquisicao = None
             origem = None
 
         if origem == "Compra":
-            if especie == "Bovino":
-                valor = random.uniform(800, 3000)
-            elif especie == "Equino":
-                valor = random.uniform(1500, 5000)
-            elif especie in ["Suíno", "Caprino", "Ovino"]:
-                valor = random.uniform(200, 800)
-            else:
-                valor = random.uniform(10, 50)
-            valor_compra = Decimal(valor).quantize(Decimal('0.01'))
+            valor_compra = Decimal(f"{rnd.uniform(*VALORES[especie]):.2f}")
         else:
-            valor_compra = Decimal('0.00')
+            valor_compra = Decimal("0.00")
 
         if especie == "Bovino" and sexo == "Fêmea":
-            finalidade = random.choice(["Leite", "Reprodução"])
+            finalidade = rnd.choice(["Leite", "Reprodução"])
         elif especie == "Aves" and sexo == "Fêmea":
-            finalidade = random.choice(["Reprodução", "Venda"])
+            finalidade = rnd.choice(["Reprodução", "Venda"])
         elif especie in ["Suíno", "Aves"]:
-            finalidade = random.choice(["Corte", "Reprodução"])
-        else:
-            finalidade = random.choice(["Corte", "Reprodução", "Venda"])
-
-        if especie == "Bovino":
-            peso_inicial = Decimal(random.uniform(30, 80))
-        elif especie == "Suíno":
-            peso_inicial = Decimal(random.uniform(1, 5))
-        elif especie in ["Caprino", "Ovino"]:
-            peso_inicial = Decimal(random.uniform(2, 8))
-        elif especie == "Equino":
-            peso_inicial = Decimal(random.uniform(40, 100))
+            finalidade = rnd.choice(["Corte", "Reprodução"])
         else:
-            peso_inicial = Decimal(random.uniform(0.1, 0.5))
-        peso_inicial = peso_inicial.quantize(Decimal('0.01'))
+            finalidade = rnd.choice(["Corte", "Reprodução", "Venda"])
 
-        numero_identificacao = f"{especie[:3].upper()}{fake.random_number(digits=6, fix_len=True)}"
+        peso_inicial = Decimal(f"{rnd.uniform(*PESOS[especie]):.2f}")
 
-        animal = Animal(
-            nome=nome,
-            especie=especie,
-            raca=raca,
-            sexo=sexo,
-            data_nascimento=data_nascimento,
-            numero_identificacao=numero_identificacao,
-            finalidade=finalidade,
-            peso_inicial=peso_inicial,
-            observacoes=fake.text(max_nb_chars=100) if random.random() > 0.7 else "",
-            data_aquisicao=data_aquisicao,
-            origem=origem,
-            valor_compra=valor_compra,
-            criado_por=fake.first_name()
-        )
+        # Único por (semente, índice): reexecutar a mesma semente não duplica
+        numero_identificacao = f"{especie[:3].upper()}{sufixo_seed:04d}{indice:08d}"
 
-        animal.save()
-        animais_criados.append(animal)
+        linhas.append((
+            nome, especie, raca, sexo, data_nascimento, numero_identificacao,
+            finalidade, peso_inicial,
+            rnd.choice(observacoes) if rnd.random() > 0.7 else "",
+            data_aquisicao, origem, valor_compra,
+        ))
 
-        if (i + 1) % 10 == 0:
-            print(f"Criados {i + 1} animais...")
+    return linhas
 
-    return animais_criados
+
+def _lotes(seed, quantidade, tamanho_lote, processos, referencia):
+    pools = montar_pools(seed)
+    total_lotes = (quantidade + tamanho_lote - 1) // tamanho_lote
+    argumentos = [(seed, i, tamanho_lote, quantidade, pools, referencia) for i in range(total_lotes)]
+
+    if processos <= 1:
+        for args in argumentos:
+            yield gerar_lote(*args)
+        return
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        # map preserva a ordem; os lotes são inseridos conforme ficam prontos
+        yield from executor.map(gerar_lote, *zip(*argumentos))
+
+
+def criar_animais(quantidade=50, seed=0, tamanho_lote=5000, processos=1, progresso=None,
+                  referencia=DATA_REFERENCIA):
+    """
+    Gera ``quantidade`` animais e grava com ``bulk_create`` em lotes, cada
+    lote na sua própria transação. ``progresso`` recebe quantos já foram
+    processados. Retorna quantos animais foram de fato inseridos (linhas já
+    existentes da mesma semente são ignoradas e não entram na conta).
+    """
+    from django.db import transaction
+
+    from apps.animal.models import Animal
+    from apps.animal.paginacao import invalidar_contagem
+
+    # bulk_create com ignore_conflicts não informa quantas linhas entraram
+    antes = Animal.objects.count()
+    processados = 0
+
+    for linhas in _lotes(seed, quantidade, tamanho_lote, processos, referencia):
+        animais = [Animal(**dict(zip(CAMPOS, linha))) for linha in linhas]
+        with transaction.atomic():
+            # ignore_conflicts torna a reexecução da mesma semente idempotente
+            Animal.objects.bulk_create(animais, batch_size=tamanho_lote, ignore_conflicts=True)
+        processados += len(animais)
+        if progresso:
+            progresso(processados)
+
+    invalidar_contagem()
+    return Animal.objects.count() - antes
 
 
 if __name__ == "__main__":
+    # ------------------ CONFIGURAÇÃO DO DJANGO ------------------
+    # Caminho base do projeto (onde está o manage.py)
+    BASE_DIR = Path(__file__).resolve().parent.parent
+    sys.path.append(str(BASE_DIR))
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "agromanager.settings")
+
+    import django
+    django.setup()
+    # ------------------------------------------------------------
+
+    quantidade = int(sys.argv[1]) if len(sys.argv) > 1 else 50
     print("🐄 Populando banco de dados com animais...")
-    animais = criar_animais(50)
-    print(f"✅ {len(animais)} animais criados com sucesso!")
+    total = criar_animais(quantidade, progresso=lambda n: print(f"Processados {n} animais..."))
+    print(f"✅ {total} animais criados com sucesso!")